@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+from importacao import importar_tardio
+from instrumentacao import medir
+from permutacao import teste_permutacao
+
+sparse = importar_tardio("scipy.sparse")
+
+# Número máximo de valores (permutações x bairros x vizinhos) sorteados de uma vez no Moran local
+MAXIMO_POR_BLOCO = 10_000_000
+
+# Quadrantes do Moran local: (valor do bairro acima da média, média dos vizinhos acima da média) -> rótulo
+CLUSTERS = {(True, True): "HH", (False, False): "LL", (True, False): "HL", (False, True): "LH"}
+SEM_VIZINHOS = "Sem Vizinhos"
+NAO_SIGNIFICATIVO = "Nao Significativo"
+
+def matriz_pesos(ids, origem, destino):
+    """
+    Matriz esparsa de vizinhança padronizada por linha (cada vizinho de um bairro pesa 1 / número de
+    vizinhos), nas posições de `ids`. Laços e arestas repetidas não contam, e os bairros sem vizinhos
+    (ilhas) ficam com a linha zerada em vez de dividir por zero.
+    """
+    posicoes = pd.Index(ids)
+    origem = posicoes.get_indexer(origem)
+    destino = posicoes.get_indexer(destino)
+    validas = (origem >= 0) & (destino >= 0) & (origem != destino)
+
+    n = len(ids)
+    linhas = np.concatenate([origem[validas], destino[validas]])
+    colunas = np.concatenate([destino[validas], origem[validas]])
+    matriz = sparse.csr_matrix((np.ones(len(linhas)), (linhas, colunas)), shape=(n, n))
+    # arestas repetidas viram entradas maiores que 1: a vizinhança é binária
+    matriz.data[:] = 1.0
+
+    vizinhos = np.diff(matriz.indptr)
+    escala = np.divide(1.0, vizinhos, out=np.zeros(n), where=vizinhos > 0)
+    return sparse.diags(escala) @ matriz
+
+def indice_moran(z, pesos):
+    # I = (n / S0) * (z' W z) / (z' z) de cada linha de valores centrados (uma permutação por linha),
+    # com a defasagem espacial de todas as linhas calculada por um único produto esparso
+    defasagem = (pesos @ z.T).T
+    return (z.shape[-1] / pesos.sum()) * (z * defasagem).sum(axis=-1) / (z * z).sum(axis=-1)
+
+@medir
+def moran_global(valores, pesos, n_permutacoes=999, semente=0, processos=1, significancia=0.05):
+    """
+    Moran's I global e o seu pseudo p-valor pelo motor de permutação (permutacao.teste_permutacao): o
+    p-valor é a fração das permutações pelo menos tão extremas quanto o observado, do lado do valor
+    esperado em que ele está, e o teste para antes quando a significância já está decidida.
+    Devolve o I, o valor esperado sem autocorrelação, o z das permutações, o p-valor e o número de permutações.
+    """
+    z = np.asarray(valores, dtype=float)
+    z = z - z.mean()
+    esperado = -1 / (len(z) - 1)
+    indice = indice_moran(z[None, :], pesos)[0]
+
+    teste = teste_permutacao(indice_moran, z, (pesos,), n_permutacoes, "maior" if indice >= esperado else "menor",
+                             semente, processos, significancia)
+    permutados = teste["estatisticas"]
+    z_indice = (indice - permutados.mean()) / permutados.std() if len(permutados) > 1 else np.nan
+    return indice, esperado, z_indice, teste["p_valor"], teste["permutacoes"]
+
+@medir
+def moran_local(valores, pesos, n_permutacoes=999, rng=None, significancia=0.05, maximo_por_bloco=MAXIMO_POR_BLOCO):
+    """
+    Moran local (LISA) de cada bairro, com pseudo p-valor por permutação condicional: o valor do bairro
+    fica fixo e os seus vizinhos são sorteados entre os outros bairros. Os sorteios são uma única matriz
+    (permutações x maior número de vizinhos) de posições distintas entre n - 1, deslocadas para pular o
+    próprio bairro, e os bairros com o mesmo número de vizinhos são calculados juntos.
+    Devolve uma tabela com a média dos vizinhos, o I local, o p-valor e o cluster (HH, LL, HL ou LH quando
+    p < significancia) de cada bairro.
+    """
+    rng = np.random.default_rng(rng)
+    valores = np.asarray(valores, dtype=float)
+    z = valores - valores.mean()
+    n = len(z)
+    m2 = (z * z).sum() / n
+    defasagem = pesos @ z
+    escala = 1 / m2 if m2 > 0 else 0.0
+    locais = z * defasagem * escala
+
+    # posições sorteadas: em cada permutação, `maior` posições distintas entre os outros n - 1 bairros
+    # (as primeiras de uma permutação aleatória, gerada em blocos de linhas)
+    vizinhos = np.diff(pesos.indptr)
+    maior = int(vizinhos.max()) if n else 0
+    sorteios = np.zeros((n_permutacoes, maior), dtype=np.int64)
+    linhas_bloco = max(1, maximo_por_bloco // max(n, 1))
+    for inicio in range(0, n_permutacoes if maior > 0 else 0, linhas_bloco):
+        fim = min(inicio + linhas_bloco, n_permutacoes)
+        sorteios[inicio:fim] = np.argsort(rng.random((fim - inicio, n - 1)), axis=1)[:, :maior]
+
+    maiores = np.zeros(n, dtype=np.int64)
+    for k in np.unique(vizinhos[vizinhos > 0]):
+        bairros = np.flatnonzero(vizinhos == k)
+        tamanho_bloco = max(1, maximo_por_bloco // (n_permutacoes * k))
+        for inicio in range(0, len(bairros), tamanho_bloco):
+            bloco = bairros[inicio:inicio + tamanho_bloco]
+            posicoes = sorteios[None, :, :k]
+            posicoes = posicoes + (posicoes >= bloco[:, None, None])
+            # pesos padronizados por linha: a defasagem sorteada é a média dos k vizinhos
+            permutados = z[bloco, None] * z[posicoes].mean(axis=2) * escala
+            maiores[bloco] = (permutados >= locais[bloco, None]).sum(axis=1)
+
+    extremos = np.minimum(maiores, n_permutacoes - maiores)
+    p_valor = (extremos + 1) / (n_permutacoes + 1)
+
+    cluster = np.array([CLUSTERS[(acima, vizinhos_acima)] for acima, vizinhos_acima in zip(z > 0, defasagem > 0)],
+                       dtype=object) if n else np.array([], dtype=object)
+    cluster[p_valor >= significancia] = NAO_SIGNIFICATIVO
+    cluster[vizinhos == 0] = SEM_VIZINHOS
+    p_valor = np.where(vizinhos > 0, p_valor, np.nan)
+    # defasagem espacial nos valores originais: a média dos vizinhos (sem vizinhos, nula)
+    media_vizinhos = np.where(vizinhos > 0, pesos @ valores, np.nan)
+    return pd.DataFrame({"Media Vizinhos": media_vizinhos, "Moran Local": locais, "P-valor": p_valor, "Cluster": cluster})
@@ -0,0 +1,123 @@
+import argparse
+import contextlib
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import data_prepocessing
+import modeling_data
+import modeling_graph
+from dados_sinteticos import gerar_arquivos
+from instrumentacao import etapa, registros_desde, total_registros
+
+CAMINHO_BENCHMARK = "datasets/output/relatorios/benchmark.csv"
+
+# Pastas de saída que as etapas esperam encontrar
+PASTAS_SAIDA = [
+    "datasets/output/dados/nodes-edges",
+    "datasets/output/dados/betweenness",
+    "datasets/output/dados/comunidades",
+    "datasets/output/graphs/gerais",
+]
+
+def executar_etapas():
+    # pré-processamento, construção do grafo e as métricas mais caras do grafo
+    with etapa("data_prepocessing"):
+        data_prepocessing.main()
+    with etapa("modeling_data"):
+        modeling_data.main()
+    with etapa("betweenness"):
+        modeling_graph.gerar_betweenness()
+    with etapa("comunidades"):
+        modeling_graph.gerar_comunidades()
+
+def medir_tamanho(n_casos, n_bairros, semente=0):
+    """
+    Gera os dados sintéticos de um tamanho em uma pasta temporária, executa as etapas nela e devolve
+    o tempo de cada etapa (somando as chamadas repetidas, ex.: grafico_comunidade).
+    """
+    raiz = tempfile.mkdtemp(prefix="benchmark_")
+    gerar_arquivos(raiz, n_casos, n_bairros, semente=semente)
+    for pasta in PASTAS_SAIDA:
+        os.makedirs(os.path.join(raiz, pasta), exist_ok=True)
+
+    diretorio = os.getcwd()
+    inicio = total_registros()
+    os.chdir(raiz)
+    try:
+        with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+            executar_etapas()
+    finally:
+        os.chdir(diretorio)
+        shutil.rmtree(raiz, ignore_errors=True)
+
+    # o tempo de importação das bibliotecas só aparece no primeiro tamanho e não depende dele
+    df = pd.DataFrame(registros_desde(inicio))
+    df = df[~df["etapa"].str.startswith("importar ")]
+    df = df.groupby("etapa", sort=False).agg(chamadas=("etapa", "size"), tempo_s=("tempo_s", "sum"), cpu_s=("cpu_s", "sum"),
+                                             rss_max_mb=("rss_max_mb", "max")).reset_index()
+    df.insert(0, "bairros", n_bairros)
+    df.insert(0, "casos", n_casos)
+    return df
+
+def expoentes(df):
+    """
+    Expoente de crescimento de cada etapa entre dois tamanhos consecutivos de casos (mesmo número de bairros):
+    log(t2 / t1) / log(n2 / n1). Perto de 1 a etapa é linear; perto de 2, quadrática.
+    """
+    df = df.sort_values(["etapa", "bairros", "casos"]).copy()
+    anterior = df.groupby(["etapa", "bairros"])[["casos", "tempo_s"]].shift()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        df["expoente"] = np.log(df["tempo_s"] / anterior["tempo_s"]) / np.log(df["casos"] / anterior["casos"])
+    return df["expoente"].round(2)
+
+def benchmark(casos, bairros, semente=0, limite=None, caminho=CAMINHO_BENCHMARK):
+    """
+    Mede as etapas para cada combinação de número de casos e de bairros, do menor para o maior.
+    Com `limite` (segundos), quando um tamanho demora mais que o limite os tamanhos maiores de casos
+    (e, se for o menor deles, os de bairros) não são executados.
+    """
+    resultados = []
+    for n_bairros in sorted(bairros):
+        for i, n_casos in enumerate(sorted(casos)):
+            inicio = time.perf_counter()
+            resultados.append(medir_tamanho(n_casos, n_bairros, semente))
+            duracao = time.perf_counter() - inicio
+            print(f"{n_casos} casos, {n_bairros} bairros: {duracao:.1f}s")
+
+            excedeu = limite is not None and duracao > limite
+            if excedeu:
+                print(f"Limite de {limite}s ultrapassado, tamanhos maiores não serão executados")
+                break
+        if excedeu and i == 0:
+            break
+
+    df = pd.concat(resultados, ignore_index=True)
+    df["expoente"] = expoentes(df)
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    df.to_csv(caminho, index=False)
+    print("Resultados do benchmark salvos em", caminho)
+    return df
+
+def imprimir_curvas(df, etapas=None):
+    # tabela com o tempo de cada etapa (linhas) em cada tamanho (colunas)
+    tabela = df.pivot_table(index="etapa", columns=["bairros", "casos"], values="tempo_s", sort=False)
+    if etapas:
+        tabela = tabela.loc[[nome for nome in etapas if nome in tabela.index]]
+    tabela = tabela.sort_values(by=tabela.columns[-1], ascending=False)
+    print(tabela.round(3).to_string())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo das etapas do pipeline em dados sintéticos de vários tamanhos")
+    parser.add_argument("--casos", type=int, nargs="+", default=[2_000, 4_000, 8_000], help="números de casos (ex.: 10000 100000 1000000 10000000)")
+    parser.add_argument("--bairros", type=int, nargs="+", default=[200], help="números de bairros (ex.: 200 1000 10000 100000)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do gerador de dados sintéticos")
+    parser.add_argument("--limite", type=float, default=None, help="não executa tamanhos maiores depois de um tamanho que demorar mais que este número de segundos")
+    parser.add_argument("--saida", default=CAMINHO_BENCHMARK, help="caminho da tabela de resultados em csv")
+    args = parser.parse_args()
+
+    df = benchmark(args.casos, args.bairros, semente=args.semente, limite=args.limite, caminho=args.saida)
+    imprimir_curvas(df)
@@ -0,0 +1,143 @@
+import argparse
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from modeling_data import CAMINHO_PESOS
+
+# Valores usados para sortear as colunas descritivas (no formato do arquivo original da SEJUSP)
+NATUREZAS = ["AMEAÇA", "ESTELIONATO", "FURTO", "VIAS DE FATO / AGRESSÃO", "LESÃO CORPORAL", "DIFAMAÇÃO", "DANO",
+             "INJÚRIA", "ROUBO", "ESTUPRO", "PERSEGUIÇÃO", "VIOLÊNCIA PSICOLÓGICA"]
+MEIOS = ["FALA", "AGRESSÃO FÍSICA SEM EMPREGO DE INSTRUMENTOS", "MEIO ELETRÔNICO (INTERNET OU SMS)", "FRAUDE",
+         "ABUSO DE CONFIANÇA", "MEIO DESCONHECIDO", "INST CONTUNDENTE/CORTANTE/PERFURANTE (ARMA BR", "ARMAS DE FOGO"]
+TENTADO_CONSUMADO = ["CONSUMADO"] * 19 + ["TENTADO"]
+RACAS = ["BRANCA", "PARDA", "PRETO", "AMARELA", "INDÍGENA"]
+ESCOLARIDADES = ["ENSINO MÉDIO COMPLETO (2º GRAU)", "SUPERIOR COMPLETO", "ALFABETIZADO",
+                 "ENSINO FUNDAMENTAL INCOMPLETO (8 ANOS ESTUDO)", "ENSINO MÉDIO INCOMPLETO (2º GRAU)",
+                 "SUPERIOR INCOMPLETO", "ENSINO FUNDAMENTAL COMPLETO (8 ANOS ESTUDO)"]
+LOCAIS = ["RESIDÊNCIA", "VIA PÚBLICA", "ESTABELECIMENTO COMERCIAL", "OUTROS"]
+GRUPOS = ["CRIMES CONTRA A PESSOA", "CRIMES C/ PATRIMÔNIO", "CRIMES CONTRA A DIGNIDADE SEXUAL"]
+CAUSAS = ["CIÚME", "ALCOOLISMO", "DESENTENDIMENTO", "OUTRAS"]
+RELACOES = ["CÔNJUGE/COMPANHEIRO", "EX-CÔNJUGE/EX-COMPANHEIRO", "NAMORADO", "PAI/MÃE", "OUTROS"]
+
+CIDADE = "Divinópolis"
+
+def nomes_bairros(n_bairros):
+    return [f"BAIRRO {i:06d}" for i in range(n_bairros)]
+
+def nomes_municipios(n_municipios):
+    return [CIDADE] + [f"Município {i:05d}" for i in range(n_municipios - 1)]
+
+def gerar_bairros(n_bairros):
+    """
+    Divisas entre bairros no formato do bairros_divinopolis.csv: os bairros ficam em uma grade e cada um
+    faz divisa com o vizinho da direita e o de baixo (cerca de 2 divisas por bairro, como no arquivo real).
+    """
+    nomes = np.array(nomes_bairros(n_bairros), dtype=object)
+    largura = int(np.ceil(np.sqrt(n_bairros)))
+    indices = np.arange(n_bairros)
+
+    direita = indices[(indices % largura != largura - 1) & (indices + 1 < n_bairros)]
+    abaixo = indices[indices + largura < n_bairros]
+    origem = np.concatenate([direita, abaixo])
+    destino = np.concatenate([direita + 1, abaixo + largura])
+
+    return pd.DataFrame({"bairro": nomes[origem], "bairro_divisa": nomes[destino]})
+
+def gerar_localidade(n_municipios, rng):
+    # nomes como no arquivo real de localidades, com acentos
+    return pd.DataFrame({
+        "Município": nomes_municipios(n_municipios),
+        "Latitude": np.round(rng.uniform(-22.9, -14.2, n_municipios), 4),
+        "Longitude": np.round(rng.uniform(-51.0, -39.9, n_municipios), 4),
+    })
+
+def gerar_crimes(n_casos, n_bairros, n_municipios, rng, fracao_cidade=0.5, inicio=0):
+    """
+    Gera `n_casos` registros com as colunas do arquivo de crimes original.
+    Uma fração `fracao_cidade` dos casos é de Divinópolis, distribuída entre os bairros sintéticos.
+    """
+    # no arquivo de crimes os municípios vêm em caixa alta e sem acento; uma pequena parte vem com erro
+    # de digitação, para exercitar a comparação de similaridade com os nomes do arquivo de localidades
+    municipios = pd.Series(nomes_municipios(n_municipios)).str.upper()
+    municipios = municipios.str.normalize("NFKD").str.encode("ascii", errors="ignore").str.decode("utf-8").to_numpy(dtype=object)
+    municipio = municipios[rng.integers(1, n_municipios, n_casos)]
+    com_erro = rng.random(n_casos) < 0.01
+    municipio[com_erro] = np.char.replace(municipio[com_erro].astype(str), "MUNICIPIO", "MUNICIPO")
+    municipio[rng.random(n_casos) < fracao_cidade] = municipios[0]
+
+    # bairros com frequências desiguais, como numa cidade real (alguns bairros concentram os casos)
+    bairros = np.array(nomes_bairros(n_bairros), dtype=object)
+    pesos = 1.0 / np.arange(1, n_bairros + 1) ** 0.8
+    bairro = bairros[rng.choice(n_bairros, n_casos, p=pesos / pesos.sum())]
+
+    datas = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 731, n_casos), unit="D")
+    datas = datas.strftime("%d/%m/%Y")
+    natureza = rng.choice(NATUREZAS, n_casos)
+
+    return pd.DataFrame({
+        "Número REDS": np.arange(inicio, inicio + n_casos) + 2023000000,
+        "Data Fato": datas,
+        "Ano Fato": datas.str[-4:],
+        "Mês Numérico Fato": datas.str[3:5],
+        "Município": municipio,
+        "UF - Sigla": "MG",
+        "Desc Longa Local Imediato": rng.choice(LOCAIS, n_casos),
+        "Bairro": bairro,
+        "Bairro Não Cadastrado": "",
+        "Qtde Envolvidos": 1,
+        "Grupo Tipo Envolvimento": "VITIMA",
+        "Descrição Grupo Natureza": rng.choice(GRUPOS, n_casos),
+        "Descrição Subclasse Natureza": natureza,
+        "Tentado/Consumado": rng.choice(TENTADO_CONSUMADO, n_casos),
+        "Tentado/Consumado Nat Principal": "CONSUMADO",
+        "Causa Presumida": rng.choice(CAUSAS, n_casos),
+        "Descrição Meio Utilizado": rng.choice(MEIOS, n_casos),
+        "Sexo": "FEMININO",
+        "Idade Aparente": np.clip(rng.normal(40, 16, n_casos).round(), 12, 95).astype(int),
+        "Raça/Cor": rng.choice(RACAS, n_casos),
+        "Escolaridade": rng.choice(ESCOLARIDADES, n_casos),
+        "Relação Vítima/Autor": rng.choice(RELACOES, n_casos),
+        "Bairro Envolvido": bairro,
+        "Bairro Envolvido Não Cadastrado": "",
+        "Município Envolvido": municipio,
+        "UF Envolvido - Sigla": "MG",
+        "Descrição Subclasse Nat Principal": natureza,
+    })
+
+def gerar_arquivos(raiz, n_casos, n_bairros, n_municipios=850, semente=0, tamanho_bloco=1_000_000, caminho_pesos=CAMINHO_PESOS):
+    """
+    Escreve em `raiz` os arquivos de entrada do pipeline (crimes.csv, localidade.csv e bairros_divinopolis.csv)
+    com `n_casos` registros e `n_bairros` bairros, e copia a tabela de pesos da classificação (`caminho_pesos`,
+    que não é sintética). Os crimes são gerados e escritos em blocos, para que tamanhos grandes (milhões de
+    casos) não precisem caber inteiros na memória.
+    """
+    rng = np.random.default_rng(semente)
+    pasta_crimes = os.path.join(raiz, "datasets/input/violencias")
+    pasta_localidade = os.path.join(raiz, "datasets/input/localidade")
+    os.makedirs(pasta_crimes, exist_ok=True)
+    os.makedirs(pasta_localidade, exist_ok=True)
+
+    gerar_localidade(n_municipios, rng).to_csv(os.path.join(pasta_localidade, "localidade.csv"), index=False)
+    gerar_bairros(n_bairros).to_csv(os.path.join(pasta_localidade, "bairros_divinopolis.csv"), sep=";", index=False)
+
+    destino_pesos = os.path.join(raiz, CAMINHO_PESOS)
+    os.makedirs(os.path.dirname(destino_pesos), exist_ok=True)
+    shutil.copyfile(caminho_pesos, destino_pesos)
+
+    caminho = os.path.join(pasta_crimes, "crimes.csv")
+    for inicio in range(0, n_casos, tamanho_bloco):
+        bloco = gerar_crimes(min(tamanho_bloco, n_casos - inicio), n_bairros, n_municipios, rng, inicio=inicio)
+        bloco.to_csv(caminho, mode="w" if inicio == 0 else "a", header=inicio == 0, index=False)
+    print(f"Dados sintéticos com {n_casos} casos e {n_bairros} bairros salvos em", raiz)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera arquivos de entrada sintéticos no formato dos dados reais")
+    parser.add_argument("destino", help="pasta onde a estrutura datasets/input será criada")
+    parser.add_argument("--casos", type=int, default=10_000, help="número de registros de crimes")
+    parser.add_argument("--bairros", type=int, default=200, help="número de bairros de Divinópolis")
+    parser.add_argument("--municipios", type=int, default=850, help="número de municípios no arquivo de localidades")
+    parser.add_argument("--semente", type=int, default=0, help="semente do gerador de números aleatórios")
+    parser.add_argument("--pesos", default=CAMINHO_PESOS, help="tabela de pesos da classificação copiada para o destino")
+    args = parser.parse_args()
+    gerar_arquivos(args.destino, args.casos, args.bairros, args.municipios, args.semente, caminho_pesos=args.pesos)
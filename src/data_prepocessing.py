@@ -1,22 +1,124 @@
 import pandas as pd
+import numpy as np
 from difflib import SequenceMatcher
 import warnings
-from itertools import combinations
+from collections import defaultdict
 import re
+import time
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import sys
+import io
+import contextlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from normalizacao import normalizar_unicos, padronizar_texto
+from esquema import ESQUEMA_CRIMES, FORMATO_DATA, aplicar_esquema, relatar_memoria
+from instrumentacao import etapa, medir
 
 # Ignorar todos os warnings
 warnings.filterwarnings("ignore")
 
+CAMINHO_CRIMES = "datasets/input/violencias/crimes.csv"
+CAMINHO_LOCALIDADE = "datasets/input/localidade/localidade.csv"
+CAMINHO_DADOS_PRE = "datasets/output/dados/dados_pre.csv"
+CAMINHO_CACHE = "datasets/output/dados/dados_pre_parquet"
+CAMINHO_MUNICIPIOS = "datasets/output/dados/municipios_padronizados.csv"
+CAMINHO_MARCA = "datasets/output/dados/dados_pre_marca.json"
+
+# Versão do cache: deve ser incrementada quando o processamento mudar o resultado
+VERSAO_CACHE = "2"
+
+# Colunas do arquivo de crimes usadas pelo pipeline (com os nomes já limpos) e seus tipos na leitura;
+# o texto descritivo já é lido como categoria e a data e a idade são convertidas depois (ver esquema.py)
+COLUNAS_CRIMES = {
+    "Data Fato": "str",
+    "Municipio": "category",
+    "Desc Longa Local Imediato": "category",
+    "Bairro": "category",
+    "Bairro Nao Cadastrado": "category",
+    "Descricao Grupo Natureza": "category",
+    "Descricao Subclasse Natureza": "category",
+    "Tentado Consumado": "category",
+    "Causa Presumida": "category",
+    "Descricao Meio Utilizado": "category",
+    "Idade Aparente": "float64",
+    "Raca Cor": "category",
+    "Escolaridade": "category",
+    "Relacao Vitima Autor": "category",
+    "Bairro Envolvido": "category",
+    "Bairro Envolvido Nao Cadastrado": "category",
+    "Municipio Envolvido": "category",
+    "UF Envolvido Sigla": "category",
+    "Descricao Subclasse Nat Principal": "category",
+}
+
+# Colunas de texto do arquivo de crimes que passam pela padronização
+COLUNAS_PADRONIZADAS = ["Desc Longa Local Imediato", "Bairro", "Descricao Grupo Natureza", "Descricao Subclasse Natureza", "Causa Presumida", "Descricao Meio Utilizado", "Raca Cor", "Escolaridade", "Relacao Vitima Autor", "Bairro Envolvido", "Bairro Envolvido Nao Cadastrado", "Municipio Envolvido", "Descricao Subclasse Nat Principal"]
+
+def nomes_colunas_crimes(caminho):
+    """
+    Lê apenas o cabeçalho do arquivo de crimes e relaciona os nomes originais das colunas usadas aos nomes limpos.
+    """
+    cabecalho = pd.read_csv(caminho, delimiter=',', encoding='utf-8', nrows=0).columns
+    nomes = {col: limpar_nomes_colunas(col) for col in cabecalho if limpar_nomes_colunas(col) in COLUNAS_CRIMES}
+
+    faltantes = set(COLUNAS_CRIMES) - set(nomes.values())
+    if faltantes:
+        print("Erro: colunas não encontradas no arquivo de crimes:", sorted(faltantes))
+    return nomes
+
+@medir
+def carregar_crimes(caminho, engine="c"):
+    """
+    Lê apenas as colunas usadas do arquivo de crimes, com os tipos já declarados e o parser compilado.
+    Os nomes das colunas são devolvidos já limpos.
+    """
+    inicio = time.perf_counter()
+
+    nomes = nomes_colunas_crimes(caminho)
+    df = pd.read_csv(caminho,
+                delimiter=',',
+                encoding='utf-8',
+                engine=engine,
+                usecols=list(nomes),
+                dtype={col: COLUNAS_CRIMES[limpo] for col, limpo in nomes.items()}
+                )
+    df.rename(columns=nomes, inplace=True)
+    df = aplicar_esquema(df, ESQUEMA_CRIMES)
+
+    tempo = time.perf_counter() - inicio
+    print(f"{len(df)} linhas lidas em {tempo:.2f}s ({len(df) / max(tempo, 1e-9):.0f} linhas/s)")
+    relatar_memoria(df, "a leitura")
+    return df
+
+def ler_crimes_em_blocos(caminho, tamanho_bloco, engine="c"):
+    """
+    Lê o arquivo de crimes em blocos de `tamanho_bloco` linhas, com as mesmas colunas e tipos de carregar_crimes.
+    O índice de cada bloco continua o do anterior, ou seja, é a posição da linha no arquivo.
+    """
+    nomes = nomes_colunas_crimes(caminho)
+    leitor = pd.read_csv(caminho,
+                delimiter=',',
+                encoding='utf-8',
+                engine=engine,
+                usecols=list(nomes),
+                dtype={col: COLUNAS_CRIMES[limpo] for col, limpo in nomes.items()},
+                chunksize=tamanho_bloco
+                )
+    for bloco in leitor:
+        bloco.rename(columns=nomes, inplace=True)
+        yield aplicar_esquema(bloco, ESQUEMA_CRIMES)
+
 # padronizar todos os dados do dataframe, removendo espaços extras, retirando os caracteres especiais e deixando tudo em caixa alta
+@medir
 def standardize_data(df):
     for column in df.columns:
-        # Converte a coluna para string, substituindo valores nulos por uma string vazia
-        df[column] = df[column].astype(str).fillna("")
-        # Remove espaços extras, coloca em caixa alta e remove caracteres especiais
-        df[column] = df[column].str.strip()
-        df[column] = df[column].str.upper()
-        df[column] = df[column].str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
-        df[column] = df[column].str.replace(r'[^a-zA-Z0-9 ]', ' ', regex=True)
+        # Normaliza cada valor distinto uma única vez e replica o resultado para as linhas
+        df[column] = normalizar_unicos(df[column], padronizar_texto, categorica=True)
     return df
 
 # remover coluna "Número REDS", "Qtde Envolvidos", "Ano Fato", "Mês Numérico Fato", "UF - Sigla", "Bairro Não Cadastrado", "Tentado/Consumado", "Grupo Tipo Envolvimento", "Sexo" e "Tentado/Consumado Nat Principal"
@@ -25,8 +127,9 @@ def remove_columns(df):
     return df
 
 # adicionar coluna de id
-def add_id_column(df):
-    df["ID"] = range(1, len(df) + 1)
+@medir
+def add_id_column(df, inicio=1):
+    df["ID"] = np.arange(inicio, inicio + len(df), dtype="int32")
 
     # coloca a coluna id na primeira posição
     cols = df.columns.tolist()
@@ -34,47 +137,168 @@ def add_id_column(df):
     df = df[cols]
     return df
 
-def identifica(df_nomes, threshold, df_crimes, df_localidade):
-    for i, j in combinations(range(len(df_nomes)), 2):
-        # Cidades comparadas
-        cidade1 = df_nomes['Município'].iloc[i]
-        cidade2 = df_nomes['Município'].iloc[j]
-        
-        # Verifica a similaridade entre as cidades
-        if similaridade_entre_cidades(cidade1, cidade2) > threshold and \
-           similaridade_entre_cidades(cidade1, cidade2) < 1:
-            # Checa se a cidade já está em ambos os dataframes
-            if (cidade1 in df_crimes['Município'].values and cidade1 in df_localidade['Município'].values) or \
-               (cidade2 in df_crimes['Município'].values and cidade2 in df_localidade['Município'].values):
+def ngramas(nome, n=3):
+    """
+    Retorna os n-gramas do nome, com espaços nas pontas para que nomes curtos também tenham n-gramas.
+    """
+    nome = " " + nome + " "
+    return {nome[i:i + n] for i in range(max(len(nome) - n + 1, 1))}
+
+def pares_candidatos(nomes, threshold, novos=None):
+    """
+    Gera, em ordem, os pares (i, j) de nomes que compartilham algum n-grama e cujo tamanho permite similaridade acima do threshold.
+    Se `novos` for informado, apenas os pares com pelo menos um nome novo são gerados.
+    """
+    # índice invertido n-grama -> nomes que o contêm
+    gramas = [ngramas(nome) for nome in nomes]
+    indice = defaultdict(list)
+    for i, conjunto in enumerate(gramas):
+        for grama in conjunto:
+            indice[grama].append(i)
+
+    for i, nome in enumerate(nomes):
+        candidatos = set()
+        for grama in gramas[i]:
+            candidatos.update(indice[grama])
+
+        for j in sorted(candidatos):
+            if j <= i:
+                continue
+            if novos is not None and nome not in novos and nomes[j] not in novos:
                 continue
+            # limite superior da similaridade pelo tamanho dos nomes
+            if 2 * min(len(nome), len(nomes[j])) / (len(nome) + len(nomes[j])) <= threshold:
+                continue
+            yield i, j
+
+def remapear_municipios(nomes, threshold, nomes_crimes, nomes_localidade, novos=None):
+    """
+    Calcula o nome padrão de cada município sem correspondência, sem alterar os DataFrames.
+    Segue a mesma regra de identifica: pares parecidos, que ainda não estão nos dois DataFrames, passam a usar o menor nome.
+    Retorna um dicionário {nome original: nome padrão} apenas com os nomes alterados.
+    """
+    nomes = list(nomes)
+    # nomes presentes em cada DataFrame, atualizados a cada troca
+    presentes = [set(nomes_crimes), set(nomes_localidade)]
+    remapeamento = {}
+    # nome atual -> nomes originais que passaram a usá-lo
+    grupos = {}
+
+    def originais(nome):
+        if nome in grupos:
+            return grupos.pop(nome)
+        return {nome} if remapeamento.get(nome, nome) == nome else set()
+
+    for i, j in pares_candidatos(nomes, threshold, novos):
+        # Cidades comparadas
+        cidade1 = nomes[i]
+        cidade2 = nomes[j]
+
+        # Verifica a similaridade entre as cidades, descartando antes pelos limites superiores
+        comparador = SequenceMatcher(None, cidade1, cidade2)
+        if comparador.real_quick_ratio() <= threshold or comparador.quick_ratio() <= threshold:
+            continue
+        similaridade = comparador.ratio()
+        if not (threshold < similaridade < 1):
+            continue
+
+        # Checa se a cidade já está em ambos os dataframes
+        if all(cidade1 in conjunto for conjunto in presentes) or all(cidade2 in conjunto for conjunto in presentes):
+            continue
+
+        # Define o nome padrão como o menor em termos de comprimento
+        nome_padrao = min(cidade1, cidade2, key=len)
+
+        for conjunto in presentes:
+            if cidade1 in conjunto or cidade2 in conjunto:
+                conjunto.difference_update((cidade1, cidade2))
+                conjunto.add(nome_padrao)
+
+        afetados = originais(cidade1) | originais(cidade2)
+        grupos[nome_padrao] = afetados
+        for nome in afetados:
+            if nome == nome_padrao:
+                remapeamento.pop(nome, None)
             else:
-                # Define o nome padrão como o menor em termos de comprimento
-                nome_padrao = min(cidade1, cidade2, key=len)
-                
-                # Atualiza os nomes nos dataframes
-                for df in [df_crimes, df_localidade]:
-                    df.loc[df['Município'] == cidade1, 'Município'] = nome_padrao
-                    df.loc[df['Município'] == cidade2, 'Município'] = nome_padrao
-    return df_crimes, df_localidade
-
-def merge(df_crimes, df_localidade, threshold=0.86):
-    # Merge inicial
-    df_merged = pd.merge(df_crimes, df_localidade, on='Município', how='outer', indicator=True)
-
-    # Identifica as cidades sem correspondência
-    cidades_sem_latlong = df_merged[df_merged['_merge'] != 'both']['Município'].dropna().unique()
-    
-    # Cria um DataFrame com as cidades faltantes
-    df_faltantes = pd.DataFrame({'Município': cidades_sem_latlong})
-    
-    # Trata as cidades faltantes usando a função identifica
-    df_crimes, df_localidade = identifica(df_faltantes, threshold, df_crimes, df_localidade)
-
-    # Reexecuta o merge após a padronização
+                remapeamento[nome] = nome_padrao
+
+    return remapeamento
+
+def aplicar_remapeamento(df, remapeamento):
+    """
+    Troca os nomes dos municípios pelos nomes padrão em uma única passada.
+    """
+    if remapeamento:
+        df["Município"] = normalizar_unicos(df["Município"], lambda nomes: nomes.replace(remapeamento))
+    return df
+
+def carregar_remapeamento(caminho=CAMINHO_MUNICIPIOS):
+    """
+    Lê os nomes padrão já calculados em execuções anteriores.
+    """
+    if not os.path.exists(caminho):
+        return {}
+    df = pd.read_csv(caminho, dtype=str, keep_default_na=False)
+    return dict(zip(df["Município"], df["Município Padrão"]))
+
+def salvar_remapeamento(remapeamento, caminho=CAMINHO_MUNICIPIOS):
+    df = pd.DataFrame({"Município": list(remapeamento), "Município Padrão": list(remapeamento.values())})
+    df.sort_values(by="Município").to_csv(caminho, index=False)
+
+def identifica(df_nomes, threshold, df_crimes, df_localidade, novos=None):
+    # Calcula os nomes padrão a partir dos nomes presentes em cada DataFrame
+    remapeamento = remapear_municipios(df_nomes['Município'], threshold,
+                                       df_crimes['Município'].dropna().unique(),
+                                       df_localidade['Município'].dropna().unique(), novos)
+
+    # Atualiza os nomes nos dataframes de uma só vez
+    for df in [df_crimes, df_localidade]:
+        aplicar_remapeamento(df, remapeamento)
+    return df_crimes, df_localidade, remapeamento
+
+@medir
+def padronizar_municipios(df_crimes, df_localidade, threshold=0.86, caminho_remapeamento=CAMINHO_MUNICIPIOS, nomes_anteriores=()):
+    """
+    Troca, nos dois DataFrames, os nomes de município pelos nomes padrão e salva o remapeamento.
+    Apenas os nomes ainda não vistos em execuções anteriores passam pela comparação de similaridade.
+    """
+    # Aplica os nomes padrão já conhecidos de execuções anteriores
+    remapeamento = carregar_remapeamento(caminho_remapeamento)
+    for df in [df_crimes, df_localidade]:
+        aplicar_remapeamento(df, remapeamento)
+
+    # Nomes presentes em cada DataFrame, incluindo os municípios de crimes já processados anteriormente
+    nomes_crimes = set(df_crimes['Município'].dropna().unique()) | {remapeamento.get(nome, nome) for nome in nomes_anteriores}
+    nomes_localidade = set(df_localidade['Município'].dropna().unique())
+
+    # Identifica as cidades sem correspondência (em ordem alfabética, como no merge externo)
+    cidades_sem_latlong = sorted(nomes_crimes ^ nomes_localidade)
+
+    # Trata apenas as cidades que ainda não foram vistas em execuções anteriores
+    novos = (nomes_crimes | nomes_localidade) - set(remapeamento)
+    if novos:
+        novos_nomes = remapear_municipios(cidades_sem_latlong, threshold, nomes_crimes, nomes_localidade, novos)
+        for df in [df_crimes, df_localidade]:
+            aplicar_remapeamento(df, novos_nomes)
+
+        # Salva todos os nomes vistos, mesmo os sem alteração, para não serem comparados de novo
+        remapeamento.update({nome: nome for nome in novos})
+        remapeamento = {nome: novos_nomes.get(padrao, padrao) for nome, padrao in remapeamento.items()}
+        remapeamento.update(novos_nomes)
+        salvar_remapeamento(remapeamento, caminho_remapeamento)
+
+@medir
+def merge(df_crimes, df_localidade, threshold=0.86, caminho_remapeamento=CAMINHO_MUNICIPIOS, nomes_anteriores=()):
+    padronizar_municipios(df_crimes, df_localidade, threshold, caminho_remapeamento, nomes_anteriores)
+
+    # Reexecuta o merge após a padronização (com a chave como texto, o merge a ordena alfabeticamente)
+    for df in [df_crimes, df_localidade]:
+        df["Município"] = df["Município"].astype(object)
     df_merged_final = pd.merge(df_crimes, df_localidade, on='Município', how='outer')
 
     # ordena o dataframe de acordo com a coluna "Data Fato"
-    df_merged_final.sort_values(by='Data Fato', ascending=True, inplace=True)   
+    # (ordenação estável: datas iguais ficam na ordem do merge, por município e linha original)
+    df_merged_final.sort_values(by='Data Fato', ascending=True, inplace=True, kind='stable')
 
     return df_merged_final
 
@@ -98,53 +322,149 @@ def limpar_nomes_colunas(nome):
     nome = re.sub(r'\s+', ' ', nome).strip()
     return nome
 
+@medir
 def remover_dados_irelevantes(df):
-    # se na coluna "Bairro" tiver "INVALIDO", deverá verificar se na coluna "Bairro Nao Cadastrado" tem algum valor diferente, se tiver, substituir o valor da coluna "Bairro" pelo valor da coluna "Bairro Nao Cadastrado" caso não tenha, essa linha deverá ser removida
-    df.loc[(df["Bairro"] == "INVALIDO") & (df["Bairro Nao Cadastrado"] != "NAN"), "Bairro"] = df["Bairro Nao Cadastrado"]
-    df = df.drop(df[(df["Bairro"] == "INVALIDO") & (df["Bairro Nao Cadastrado"] == "NAN")].index)
+    """
+    Monta uma única máscara com todas as regras de remoção e materializa o DataFrame filtrado uma só vez.
+    Cada linha é contada apenas na primeira regra que a remove, na ordem abaixo.
+    """
+    regras = {}
 
-    df.loc[(df["Bairro Envolvido"] == "INVALIDO") & (df["Bairro Envolvido Nao Cadastrado"] != "NAN"), "Bairro Envolvido"] = df["Bairro Envolvido Nao Cadastrado"]
-    df = df.drop(df[(df["Bairro Envolvido"] == "INVALIDO") & (df["Bairro Envolvido Nao Cadastrado"] == "NAN")].index)
+    # se na coluna "Bairro" tiver "INVALIDO", deverá verificar se na coluna "Bairro Nao Cadastrado" tem algum valor diferente, se tiver, substituir o valor da coluna "Bairro" pelo valor da coluna "Bairro Nao Cadastrado" caso não tenha, essa linha deverá ser removida
+    for coluna, alternativa in [("Bairro", "Bairro Nao Cadastrado"), ("Bairro Envolvido", "Bairro Envolvido Nao Cadastrado")]:
+        invalido = df[coluna] == "INVALIDO"
+        troca = invalido & df[alternativa].notna()
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            # os valores da coluna alternativa precisam existir como categorias antes da troca
+            novas = pd.Index(df.loc[troca, alternativa].unique()).difference(df[coluna].cat.categories)
+            df[coluna] = df[coluna].cat.add_categories(novas)
+        df.loc[troca, coluna] = df.loc[troca, alternativa].to_numpy(dtype=object)
+        regras[coluna + " INVALIDO sem alternativa"] = (invalido & df[alternativa].isna()).to_numpy()
 
     # retirar coluna "Bairro Nao Cadastrado" e "Bairro Envolvido Nao Cadastrado"
-    df.drop(columns=["Bairro Nao Cadastrado", "Bairro Envolvido Nao Cadastrado"], inplace=True)
+    colunas = [col for col in df.columns if col not in ("Bairro Nao Cadastrado", "Bairro Envolvido Nao Cadastrado")]
 
     # se tiver em qualquer uma das colunas a o valor "IGNORADO", "INVALIDO", "IGNORADA", "PREENCHIMENTO OPCIONAL", "SEM INFORMACAO" essa linha deverá ser removida
-    valores = ["IGNORADO", "INVALIDO", "IGNORADA", "PREENCHIMENTO OPCIONAL", "SEM INFORMACAO", "INEXISTENTE"]
-    for col in df.columns:
-        for valor in valores:
-            df = df.drop(df[df[col] == valor].index)
+    # guarda, para cada linha, o primeiro valor irrelevante encontrado (-1 se nenhum)
+    valores = pd.Index(["IGNORADO", "INVALIDO", "IGNORADA", "PREENCHIMENTO OPCIONAL", "SEM INFORMACAO", "INEXISTENTE"])
+    encontrado = np.full(len(df), -1)
+    for col in colunas:
+        serie = df[col]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            # busca apenas nas categorias; o código -1 (nulo) cai no último elemento, que também é -1
+            indices = np.append(valores.get_indexer(serie.cat.categories), -1)[serie.cat.codes.to_numpy()]
+        elif serie.dtype == object:
+            indices = valores.get_indexer(serie)
+        else:
+            continue
+        encontrado = np.where(encontrado == -1, indices, encontrado)
+    for i, valor in enumerate(valores):
+        regras[valor] = encontrado == i
 
     # retiras as linhas q possuem valores nulos
-    df = df.dropna()
+    # (nas colunas padronizadas o nulo é mantido como valor ausente, sem remover a linha)
+    nulos = np.zeros(len(df), dtype=bool)
+    for col in colunas:
+        if col not in COLUNAS_PADRONIZADAS:
+            nulos |= df[col].isna().to_numpy()
+    regras["valores nulos"] = nulos
 
-    return df
+    # combina as regras e conta quantas linhas cada uma removeu
+    removido = np.zeros(len(df), dtype=bool)
+    print("Linhas removidas por regra:")
+    for nome, mascara in regras.items():
+        print(f"  {nome}: {int((mascara & ~removido).sum())}")
+        removido |= mascara
 
+    return df.loc[~removido, colunas]
 
-if __name__ == '__main__':
-    # carregar os dados
-    df_crimes = pd.read_csv("datasets/input/violencias/crimes.csv", 
-                delimiter=',', # Especifica o delimitador correto
-                encoding='utf-8', # Especifica a codificação correta
-                engine='python' # Especifica o engine correto
-                )
-    df_localidade = pd.read_csv("datasets/input/localidade/localidade.csv",
+def hash_arquivos(caminhos):
+    """
+    Calcula um hash do conteúdo dos arquivos de entrada, usado como chave do cache.
+    """
+    sha = hashlib.sha256(VERSAO_CACHE.encode())
+    for caminho in caminhos:
+        with open(caminho, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+                sha.update(bloco)
+    return sha.hexdigest()
+
+def cache_valido(chave, diretorio=CAMINHO_CACHE):
+    """
+    Verifica se o cache colunar existe e foi gerado a partir das mesmas entradas.
+    """
+    manifesto = os.path.join(diretorio, "_manifesto.json")
+    if not os.path.exists(manifesto):
+        return False
+    with open(manifesto, encoding="utf-8") as arquivo:
+        return json.load(arquivo).get("chave") == chave
+
+@medir
+def salvar_cache(df, chave, diretorio=CAMINHO_CACHE, anexar=False):
+    """
+    Salva a tabela dados_pre em Parquet, particionada por município e ano do fato.
+    Com `anexar=True`, as linhas são acrescentadas em novos arquivos às partições já existentes.
+    """
+    manifesto = os.path.join(diretorio, "_manifesto.json")
+    linhas = 0
+    if anexar and os.path.exists(manifesto):
+        with open(manifesto, encoding="utf-8") as arquivo:
+            linhas = json.load(arquivo)["linhas"]
+    elif os.path.exists(diretorio):
+        shutil.rmtree(diretorio)
+
+    df = df.copy()
+    df["Ano"] = df["Data Fato"].dt.year
+    try:
+        # cada escrita usa nomes de arquivo únicos, então as partições existentes são preservadas
+        # (o pyarrow recusa mais de 1024 partições por escrita, e há cerca de 850 municípios por ano)
+        particoes = max(df.groupby(["Município", "Ano"], observed=True).ngroups, 1024)
+        df.to_parquet(diretorio, partition_cols=["Município", "Ano"], index=False, max_partitions=particoes)
+    except ImportError:
+        print("pyarrow não instalado, cache colunar não criado.")
+        return
+
+    # o manifesto começa com "_" para ser ignorado na leitura do dataset
+    with open(manifesto, "w", encoding="utf-8") as arquivo:
+        json.dump({"chave": chave, "colunas": [col for col in df.columns if col != "Ano"], "linhas": linhas + len(df)}, arquivo)
+    print("Cache colunar salvo em", diretorio)
+
+def carregar_cache(municipio=None, colunas=None, diretorio=CAMINHO_CACHE):
+    """
+    Lê o cache colunar, apenas com a partição do município e as colunas pedidas.
+    Retorna None se o cache não existir.
+    """
+    manifesto = os.path.join(diretorio, "_manifesto.json")
+    if not os.path.exists(manifesto):
+        return None
+    with open(manifesto, encoding="utf-8") as arquivo:
+        ordem = json.load(arquivo)["colunas"]
+
+    filtros = [("Município", "==", municipio)] if municipio is not None else None
+    df = pd.read_parquet(diretorio, columns=colunas, filters=filtros)
+
+    # as colunas de partição voltam como categorias e no fim da tabela, e as partições fora da ordem original
+    df["Município"] = df["Município"].astype(str).astype("category")
+    if "ID" in df.columns:
+        df = df.sort_values(by="ID").reset_index(drop=True)
+    return df[[col for col in ordem if col in df.columns]]
+
+def carregar_localidade(caminho=CAMINHO_LOCALIDADE):
+    return pd.read_csv(caminho,
                 delimiter=',', # Especifica o delimitador correto
                 encoding='utf-8',  # Especifica a codificação correta
-                engine='python' # Especifica o engine correto
+                dtype={"Município": "str", "Latitude": "float64", "Longitude": "float64"}
                 )
-    
-    # remover colunas
-    df_crimes = remove_columns(df_crimes)
-    print("Colunas removidas com sucesso!")
-    
-    # Aplicando a limpeza apenas na primeira linha
-    df_crimes.columns = [limpar_nomes_colunas(col) for col in df_crimes.columns]
 
+def processar(df_crimes, df_localidade, nomes_anteriores=()):
+    """
+    Padroniza, une com as localidades e remove os dados irrelevantes. Não atribui os IDs.
+    """
     # padronizar os dados das colunas "Desc Longa Local Imediato", "Bairro", "Descricao Grupo Natureza", "Descricao Subclasse Natureza", "Causa Presumida", "Descricao Meio Utilizado", "Raca Cor", "Escolaridade", "Relacao Vitima Autor", "Bairro Envolvido", "Bairro Envolvido Nao Cadastrado", "Municipio Envolvido", "Descricao Subclasse Nat Principal"
-    df_temp = df_crimes[["Desc Longa Local Imediato", "Bairro", "Descricao Grupo Natureza", "Descricao Subclasse Natureza", "Causa Presumida", "Descricao Meio Utilizado", "Raca Cor", "Escolaridade", "Relacao Vitima Autor", "Bairro Envolvido", "Bairro Envolvido Nao Cadastrado", "Municipio Envolvido", "Descricao Subclasse Nat Principal"]].copy()
+    df_temp = df_crimes[COLUNAS_PADRONIZADAS].copy()
     df_temp = standardize_data(df_temp)
-    df_crimes[["Desc Longa Local Imediato", "Bairro", "Descricao Grupo Natureza", "Descricao Subclasse Natureza", "Causa Presumida", "Descricao Meio Utilizado", "Raca Cor", "Escolaridade", "Relacao Vitima Autor", "Bairro Envolvido", "Bairro Envolvido Nao Cadastrado", "Municipio Envolvido", "Descricao Subclasse Nat Principal"]] = df_temp[["Desc Longa Local Imediato", "Bairro", "Descricao Grupo Natureza", "Descricao Subclasse Natureza", "Causa Presumida", "Descricao Meio Utilizado", "Raca Cor", "Escolaridade", "Relacao Vitima Autor", "Bairro Envolvido", "Bairro Envolvido Nao Cadastrado", "Municipio Envolvido", "Descricao Subclasse Nat Principal"]]
+    df_crimes[COLUNAS_PADRONIZADAS] = df_temp[COLUNAS_PADRONIZADAS]
+    relatar_memoria(df_crimes, "a padronização")
 
     df_temp = df_localidade[["Município"]].copy()
     df_temp = standardize_data(df_temp)
@@ -155,19 +475,255 @@ if __name__ == '__main__':
     df_crimes.rename(columns={"Municipio": "Município"}, inplace=True)
 
     # merge dos dataframes
-    df_merged = merge(df_crimes, df_localidade)
+    df_merged = merge(df_crimes, df_localidade, nomes_anteriores=nomes_anteriores)
+    df_merged = aplicar_esquema(df_merged, ESQUEMA_CRIMES)
     print("Dataframes unidos com sucesso!")
+    relatar_memoria(df_merged, "o merge")
 
     # remover dados irrelevantes
     df_merged = remover_dados_irelevantes(df_merged)
     print("Dados irrelevantes removidos com sucesso!")
+    relatar_memoria(df_merged, "a remoção")
+    return df_merged
+
+def silenciar_saida():
+    """
+    Inicializador dos processos auxiliares: descarta as mensagens de cada bloco.
+    """
+    sys.stdout = open(os.devnull, "w")
+
+def processar_bloco(argumentos):
+    df_crimes, df_localidade = argumentos
+    return processar(df_crimes, df_localidade)
+
+@medir
+def processar_em_blocos(df_crimes, df_localidade, processos, nomes_anteriores=()):
+    """
+    Divide as linhas de crimes em blocos e processa cada bloco em um processo separado.
+    O remapeamento dos municípios é calculado antes, uma única vez, sobre todos os nomes; assim
+    os blocos apenas aplicam os nomes padrão já salvos. O resultado tem a mesma ordem da execução serial.
+    """
+    inicio = time.time()
+
+    # remapeamento global dos municípios (salvo em municipios_padronizados.csv e lido pelos blocos);
+    # como em processar, só o município da localidade é padronizado antes da comparação
+    municipios = df_crimes[["Municipio"]].rename(columns={"Municipio": "Município"})
+    localidades = standardize_data(df_localidade[["Município"]].copy())
+    padronizar_municipios(municipios, localidades, nomes_anteriores=nomes_anteriores)
+
+    limites = np.linspace(0, len(df_crimes), processos + 1).astype(int)
+    blocos = [(df_crimes.iloc[a:b], df_localidade) for a, b in zip(limites[:-1], limites[1:]) if b > a]
+    with ProcessPoolExecutor(max_workers=processos, initializer=silenciar_saida) as executor:
+        partes = list(executor.map(processar_bloco, blocos))
+
+    # cada bloco já vem ordenado por data, município e linha; a ordenação estável do todo
+    # mantém os blocos na ordem original do arquivo, como no merge serial
+    # (as categorias diferem entre os blocos, então o esquema é reaplicado depois da concatenação)
+    df_merged = pd.concat(partes, ignore_index=True)
+    df_merged.sort_values(by=["Data Fato", "Município"], inplace=True, kind="stable")
+    df_merged = aplicar_esquema(df_merged, ESQUEMA_CRIMES)
+    print(f"{len(blocos)} blocos processados em {processos} processos ({time.time() - inicio:.2f}s)")
+    return df_merged
+
+def impressoes_digitais(df):
+    """
+    Calcula uma impressão digital (hash) de cada linha bruta do arquivo de crimes.
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+def calcular_marca(df_crimes):
+    """
+    Calcula a marca d'água do arquivo de crimes bruto: a última Data Fato, as impressões digitais
+    das linhas dessa data e os municípios já vistos. O último ID é preenchido depois do processamento.
+    """
+    datas = df_crimes["Data Fato"]
+    ultima_data = datas.max()
+    return {
+        "versao": VERSAO_CACHE,
+        "ultima_data": ultima_data.strftime(FORMATO_DATA),
+        "impressoes": [int(h) for h in impressoes_digitais(df_crimes[datas == ultima_data])],
+        "ultimo_id": 0,
+        "municipios": sorted(df_crimes["Municipio"].dropna().unique().tolist()),
+    }
+
+def salvar_marca(marca, caminho=CAMINHO_MARCA):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(marca, arquivo)
+
+def carregar_marca(caminho=CAMINHO_MARCA):
+    """
+    Lê a marca d'água da última execução. Marcas de outra versão do processamento são ignoradas,
+    pois as impressões digitais dependem dos tipos das colunas.
+    """
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding="utf-8") as arquivo:
+        marca = json.load(arquivo)
+    return marca if marca.get("versao") == VERSAO_CACHE else None
+
+def linhas_novas(df_crimes, marca):
+    """
+    Seleciona as linhas posteriores à marca d'água. As linhas com a mesma data da marca
+    são novas apenas se a impressão digital não tiver sido vista.
+    """
+    datas = df_crimes["Data Fato"]
+    ultima_data = pd.to_datetime(marca["ultima_data"], format=FORMATO_DATA)
+
+    novas = (datas > ultima_data).to_numpy()
+    mesma_data = (datas == ultima_data).to_numpy()
+    vistas = np.isin(impressoes_digitais(df_crimes[mesma_data]), np.array(marca["impressoes"], dtype=np.uint64))
+    novas[np.flatnonzero(mesma_data)[~vistas]] = True
+    return novas
+
+@medir
+def processar_incremental(df_crimes, df_localidade, marca, chave, processos=1):
+    """
+    Processa apenas as linhas novas desde a marca d'água e as acrescenta ao dados_pre.csv,
+    continuando a numeração dos IDs.
+    """
+    novas = linhas_novas(df_crimes, marca)
+    print(f"{int(novas.sum())} linhas novas desde {marca['ultima_data']}")
+
+    nova_marca = calcular_marca(df_crimes)
+    nova_marca["ultimo_id"] = marca["ultimo_id"]
+    if novas.any():
+        if processos > 1:
+            df_merged = processar_em_blocos(df_crimes[novas], df_localidade, processos, nomes_anteriores=marca["municipios"])
+        else:
+            df_merged = processar(df_crimes[novas].copy(), df_localidade, nomes_anteriores=marca["municipios"])
+
+        # continua a numeração a partir do último ID e acrescenta ao arquivo existente
+        df_merged = add_id_column(df_merged, inicio=marca["ultimo_id"] + 1)
+        nova_marca["ultimo_id"] += len(df_merged)
+        df_merged.to_csv(CAMINHO_DADOS_PRE, mode="a", header=False, index=False, date_format=FORMATO_DATA)
+        print(f"{len(df_merged)} linhas acrescentadas ao arquivo dados_pre.csv!")
+
+        salvar_cache(df_merged, chave, anexar=True)
+
+    salvar_marca(nova_marca)
+
+def combinar_marcas(marcas):
+    """
+    Junta as marcas d'água calculadas em cada bloco do arquivo em uma só, igual à do arquivo inteiro.
+    """
+    ultima_data = max(pd.to_datetime(m["ultima_data"], format=FORMATO_DATA) for m in marcas).strftime(FORMATO_DATA)
+    return {
+        "versao": VERSAO_CACHE,
+        "ultima_data": ultima_data,
+        "impressoes": [h for m in marcas if m["ultima_data"] == ultima_data for h in m["impressoes"]],
+        "ultimo_id": 0,
+        "municipios": sorted(set().union(*(m["municipios"] for m in marcas))),
+    }
+
+@medir
+def processar_em_fluxo(df_localidade, chave, tamanho_bloco, marca=None, caminho=CAMINHO_CRIMES):
+    """
+    Processa o arquivo de crimes sem carregá-lo inteiro na memória, em blocos de `tamanho_bloco` linhas.
+    1. Uma primeira leitura coleta apenas os nomes de município e a marca d'água, e calcula o remapeamento.
+    2. Na segunda, cada bloco é processado e as linhas mantidas são separadas por mês em arquivos temporários.
+    3. Cada mês é ordenado, numerado e acrescentado ao dados_pre.csv e ao cache colunar.
+    A memória usada depende do tamanho do bloco e do maior mês, e o resultado é igual ao do processamento
+    em memória. Com uma marca d'água, apenas as linhas novas são processadas e acrescentadas à saída existente.
+    """
+    inicio = time.time()
+
+    # primeira leitura: municípios (das linhas a processar) e a nova marca d'água
+    nomes, marcas = set(), []
+    for bloco in ler_crimes_em_blocos(caminho, tamanho_bloco):
+        marcas.append(calcular_marca(bloco))
+        if marca is not None:
+            bloco = bloco[linhas_novas(bloco, marca)]
+        nomes.update(bloco["Municipio"].dropna().unique())
+    nova_marca = combinar_marcas(marcas)
+
+    municipios = pd.DataFrame({"Município": sorted(nomes)})
+    localidades = standardize_data(df_localidade[["Município"]].copy())
+    padronizar_municipios(municipios, localidades, nomes_anteriores=marca["municipios"] if marca is not None else ())
+
+    temporario = tempfile.mkdtemp(prefix="dados_pre_")
+    try:
+        # segunda leitura: processa cada bloco (as mensagens de cada bloco são descartadas)
+        for i, bloco in enumerate(ler_crimes_em_blocos(caminho, tamanho_bloco)):
+            if marca is not None:
+                bloco = bloco[linhas_novas(bloco, marca)]
+            # a posição no arquivo desempata as linhas da mesma data e município, como no merge serial
+            bloco["Linha"] = bloco.index
+            with contextlib.redirect_stdout(io.StringIO()):
+                parte = processar(bloco, df_localidade.copy())
+            for mes, grupo in parte.groupby(parte["Data Fato"].dt.strftime("%Y-%m"), sort=False):
+                os.makedirs(os.path.join(temporario, mes), exist_ok=True)
+                grupo.to_pickle(os.path.join(temporario, mes, f"{i:06d}.pkl"))
+            print(f"Bloco {i + 1}: {len(bloco)} linhas lidas, {len(parte)} mantidas")
+
+        # ordena, numera e grava cada mês em ordem cronológica
+        proximo_id = marca["ultimo_id"] + 1 if marca is not None else 1
+        meses = sorted(os.listdir(temporario))
+        for j, mes in enumerate(meses):
+            pasta = os.path.join(temporario, mes)
+            df_mes = pd.concat([pd.read_pickle(os.path.join(pasta, arquivo)) for arquivo in sorted(os.listdir(pasta))], ignore_index=True)
+            df_mes = aplicar_esquema(df_mes, ESQUEMA_CRIMES)
+            df_mes.sort_values(by=["Data Fato", "Município", "Linha"], inplace=True, kind="stable")
+            df_mes = add_id_column(df_mes.drop(columns="Linha"), inicio=proximo_id)
+            proximo_id += len(df_mes)
+
+            primeiro = j == 0 and marca is None
+            df_mes.to_csv(CAMINHO_DADOS_PRE, mode="w" if primeiro else "a", header=primeiro, index=False, date_format=FORMATO_DATA)
+            # o manifesto só recebe a chave no último mês, para um cache incompleto nunca ser considerado válido
+            salvar_cache(df_mes, chave if j == len(meses) - 1 else None, anexar=not primeiro)
+    finally:
+        shutil.rmtree(temporario)
+
+    nova_marca["ultimo_id"] = proximo_id - 1
+    salvar_marca(nova_marca)
+    print(f"{nova_marca['ultimo_id'] - (marca['ultimo_id'] if marca is not None else 0)} linhas gravadas em dados_pre.csv ({time.time() - inicio:.2f}s)")
+
+def main(incremental=False, processos=1, tamanho_bloco=None):
+    chave = hash_arquivos([CAMINHO_CRIMES, CAMINHO_LOCALIDADE])
+    if cache_valido(chave) and os.path.exists(CAMINHO_DADOS_PRE):
+        print("Entradas inalteradas, usando o cache em", CAMINHO_CACHE)
+        return
+
+    # modo incremental: processa apenas as linhas acrescentadas desde a última execução
+    marca = carregar_marca() if incremental and os.path.exists(CAMINHO_DADOS_PRE) else None
+
+    # modo em fluxo: o arquivo de crimes é lido em blocos, sem ser carregado inteiro
+    df_localidade = carregar_localidade()
+    if tamanho_bloco:
+        processar_em_fluxo(df_localidade, chave, tamanho_bloco, marca)
+        return
+
+    # carregar os dados (apenas as colunas usadas, já com os nomes limpos)
+    df_crimes = carregar_crimes(CAMINHO_CRIMES)
+    if marca is not None:
+        processar_incremental(df_crimes, df_localidade, marca, chave, processos)
+        return
+
+    marca = calcular_marca(df_crimes)
+    if processos > 1:
+        df_merged = processar_em_blocos(df_crimes, df_localidade, processos)
+    else:
+        df_merged = processar(df_crimes, df_localidade)
 
     # adicionar coluna de id
     df_merged = add_id_column(df_merged)
     print("Coluna de id adicionada com sucesso!")
 
     # criar arquivo dados.csv
-    df_merged.to_csv("datasets/output/dados/dados_pre.csv", index=False)
+    with etapa("escrever dados_pre.csv") as registro:
+        df_merged.to_csv(CAMINHO_DADOS_PRE, index=False, date_format=FORMATO_DATA)
+        registro["linhas"] = len(df_merged)
     print("Arquivo dados_pre.csv criado com sucesso!")
 
-   
\ No newline at end of file
+    # salvar o cache colunar particionado e a marca d'água
+    salvar_cache(df_merged, chave)
+    marca["ultimo_id"] = len(df_merged)
+    salvar_marca(marca)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pré-processamento dos dados de violência contra a mulher")
+    parser.add_argument("--incremental", action="store_true", help="processa apenas as linhas novas desde a última execução")
+    parser.add_argument("--processos", type=int, default=1, help="número de processos para processar os blocos de linhas em paralelo")
+    parser.add_argument("--bloco", type=int, default=None, help="lê o arquivo de crimes em blocos com este número de linhas, sem carregá-lo inteiro na memória")
+    args = parser.parse_args()
+    main(incremental=args.incremental, processos=args.processos, tamanho_bloco=args.bloco)
@@ -0,0 +1,75 @@
+import pandas as pd
+
+# Formato das datas nos arquivos csv de entrada e de saída
+FORMATO_DATA = "%d/%m/%Y"
+
+# Tipos da tabela de crimes (dados_pre): texto descritivo como categoria, idade e ID como inteiros pequenos
+ESQUEMA_CRIMES = {
+    "ID": "int32",
+    "Data Fato": "datetime64[ns]",
+    "Município": "category",
+    "Desc Longa Local Imediato": "category",
+    "Bairro": "category",
+    "Descricao Grupo Natureza": "category",
+    "Descricao Subclasse Natureza": "category",
+    "Tentado Consumado": "category",
+    "Causa Presumida": "category",
+    "Descricao Meio Utilizado": "category",
+    "Idade Aparente": "Int16",
+    "Raca Cor": "category",
+    "Escolaridade": "category",
+    "Relacao Vitima Autor": "category",
+    "Bairro Envolvido": "category",
+    "Municipio Envolvido": "category",
+    "UF Envolvido Sigla": "category",
+    "Descricao Subclasse Nat Principal": "category",
+    "Latitude": "float64",
+    "Longitude": "float64",
+}
+
+# Tipos da tabela de nós: os contadores só existem para os bairros, por isso aceitam valores nulos
+# ("Bairro" fica como está: nome nos nós de bairro e ID do bairro nos nós de casos)
+ESQUEMA_NOS = {
+    "ID": "int32",
+    "Idade Aparente": "Int16",
+    "Raca Cor": "category",
+    "Escolaridade": "category",
+    "Classificacao": "category",
+    "Pontuacao": "Int16",
+    "Tipo": "int8",
+    "N de casos Total": "Int32",
+    "N de casos Fatais": "Int32",
+    "N de bairros Divisa": "Int32",
+}
+
+# Tipos da tabela de arestas
+ESQUEMA_ARESTAS = {
+    "Source": "int32",
+    "Target": "int32",
+    "Weight": "int8",
+}
+
+def aplicar_esquema(df, esquema):
+    """
+    Converte as colunas presentes no DataFrame para os tipos do esquema.
+    Datas em texto são lidas no formato dd/mm/aaaa; valores inválidos viram nulos.
+    """
+    for coluna, tipo in esquema.items():
+        if coluna not in df.columns or df[coluna].dtype == tipo:
+            continue
+        if tipo.startswith("datetime"):
+            df[coluna] = pd.to_datetime(df[coluna], format=FORMATO_DATA, errors="coerce")
+        elif tipo == "category":
+            df[coluna] = df[coluna].astype(tipo)
+        else:
+            df[coluna] = pd.to_numeric(df[coluna], errors="coerce").astype(tipo)
+    return df
+
+def memoria_mb(df):
+    """
+    Memória ocupada pelo DataFrame, incluindo o conteúdo dos textos, em MB.
+    """
+    return df.memory_usage(deep=True).sum() / 2**20
+
+def relatar_memoria(df, etapa):
+    print(f"Memória após {etapa}: {memoria_mb(df):.1f} MB ({len(df)} linhas)")
@@ -0,0 +1,195 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from esquema import FORMATO_DATA
+
+CAMINHO_GRAFO = "datasets/output/dados/nodes-edges/grafo.bin"
+
+# Formato do arquivo: MAGICO, tamanho do cabeçalho (uint64), cabeçalho em json e, a partir do primeiro
+# múltiplo de ALINHAMENTO, os arrays, cada um começando em um múltiplo de ALINHAMENTO
+MAGICO = b"GRAFOBIN"
+VERSAO = 1
+ALINHAMENTO = 64
+
+def _alinhar(n):
+    return -(-n // ALINHAMENTO) * ALINHAMENTO
+
+def _codificar_coluna(nome, serie, arrays, prefixo=""):
+    """
+    Guarda a coluna em `arrays` (com o nome `prefixo` + `nome`) no tipo em que ela está e devolve a sua
+    descrição para o cabeçalho. Textos (e categorias) viram códigos int32 com as categorias no cabeçalho;
+    os inteiros que aceitam nulos guardam também uma máscara com os nulos.
+    """
+    coluna = {"nome": nome, "array": prefixo + nome}
+    nome = prefixo + nome
+    if pd.api.types.is_bool_dtype(serie.dtype) and not serie.isna().any():
+        coluna["tipo"] = "logico"
+        arrays[nome] = serie.to_numpy(dtype=np.uint8)
+    elif pd.api.types.is_integer_dtype(serie.dtype):
+        coluna["tipo"] = "inteiro"
+        nulos = serie.isna().to_numpy()
+        tipo = serie.dtype.numpy_dtype if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) else serie.dtype
+        arrays[nome] = serie.to_numpy(dtype=tipo, na_value=0)
+        if nulos.any():
+            coluna["nulos"] = nome + " (nulos)"
+            arrays[coluna["nulos"]] = nulos.astype(np.uint8)
+    elif pd.api.types.is_float_dtype(serie.dtype):
+        coluna["tipo"] = "real"
+        arrays[nome] = serie.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        # textos como no csv: valores em str (datas no FORMATO_DATA) e nulos com código -1
+        coluna["tipo"] = "texto"
+        if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+            serie = serie.dt.strftime(FORMATO_DATA)
+        valores = serie.astype(object)
+        preenchidos = valores.notna().to_numpy()
+        codigos = np.full(len(serie), -1, dtype=np.int32)
+        codigos_preenchidos, categorias = pd.factorize(valores[preenchidos].astype(str))
+        codigos[preenchidos] = codigos_preenchidos
+        coluna["categorias"] = list(categorias)
+        arrays[nome] = codigos
+    return coluna
+
+def _adjacencia(ids, origem, destino, peso):
+    """
+    Adjacência CSR não direcionada, pelas posições dos nós: cada par de nós aparece uma vez (a última
+    aresta repetida define o peso, como no nx.Graph) e as arestas com nós fora da tabela são ignoradas.
+    """
+    posicoes = pd.Index(ids)
+    origem = posicoes.get_indexer(origem)
+    destino = posicoes.get_indexer(destino)
+    validas = (origem >= 0) & (destino >= 0)
+
+    pares = pd.DataFrame({"u": np.minimum(origem, destino), "v": np.maximum(origem, destino), "peso": peso})[validas]
+    pares = pares.drop_duplicates(subset=["u", "v"], keep="last")
+    laco = (pares["u"] == pares["v"]).to_numpy()
+
+    linhas = np.concatenate([pares["u"].to_numpy(), pares["v"].to_numpy()[~laco]])
+    colunas = np.concatenate([pares["v"].to_numpy(), pares["u"].to_numpy()[~laco]])
+    pesos = np.concatenate([pares["peso"].to_numpy(), pares["peso"].to_numpy()[~laco]])
+
+    ordem = np.lexsort((colunas, linhas))
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(linhas, minlength=len(ids)), out=indptr[1:])
+    return indptr, colunas[ordem].astype(np.int32), pesos[ordem]
+
+def salvar_grafo(df_nodes, df_edges, caminho=CAMINHO_GRAFO, colunas_bairros=None):
+    """
+    Salva os nós (todas as colunas), as arestas (na ordem original) e a adjacência CSR em um único
+    arquivo binário, que é lido sem parsing por GrafoBinario. `colunas_bairros` são as colunas da
+    tabela dos bairros (nós Tipo 2) devolvida por GrafoBinario.bairros.
+    """
+    arrays = {}
+    colunas_nos = [_codificar_coluna(nome, df_nodes[nome], arrays) for nome in df_nodes.columns]
+    colunas_arestas = [_codificar_coluna(nome, df_edges[nome], arrays, prefixo="arestas ") for nome in df_edges.columns]
+
+    indptr, indices, pesos = _adjacencia(df_nodes["ID"].to_numpy(), df_edges["Source"].to_numpy(),
+                                         df_edges["Target"].to_numpy(), df_edges["Weight"].to_numpy())
+    arrays.update({"indptr": indptr, "indices": indices, "pesos": pesos})
+
+    # posição de cada array na área de dados
+    descricoes = {}
+    inicio = 0
+    for nome, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[nome] = array
+        descricoes[nome] = {"dtype": array.dtype.str, "tamanho": len(array), "inicio": inicio}
+        inicio = _alinhar(inicio + array.nbytes)
+
+    cabecalho = json.dumps({
+        "versao": VERSAO,
+        "n_nos": len(df_nodes),
+        "n_arestas": len(df_edges),
+        "nos": colunas_nos,
+        "arestas": colunas_arestas,
+        "colunas_bairros": list(colunas_bairros) if colunas_bairros is not None else list(df_nodes.columns),
+        "arrays": descricoes,
+    }, ensure_ascii=False).encode("utf-8")
+    inicio_dados = _alinhar(len(MAGICO) + 8 + len(cabecalho))
+
+    # escreve em um arquivo temporário e troca no final, para nunca deixar um grafo pela metade
+    temporario = caminho + ".tmp"
+    with open(temporario, "wb") as arquivo:
+        arquivo.write(MAGICO)
+        arquivo.write(np.uint64(len(cabecalho)).tobytes())
+        arquivo.write(cabecalho)
+        for nome, array in arrays.items():
+            arquivo.seek(inicio_dados + descricoes[nome]["inicio"])
+            arquivo.write(array.tobytes())
+        arquivo.truncate(inicio_dados + inicio)
+    os.replace(temporario, caminho)
+    print("Grafo binário salvo em", caminho)
+
+class GrafoBinario:
+    """
+    Grafo salvo por salvar_grafo, com o arquivo mapeado em memória: os arrays (adjacência CSR e colunas)
+    são lidos direto do arquivo, sem cópia, e as tabelas de nós e de arestas são montadas com os mesmos
+    tipos que o pd.read_csv dos csv equivalentes daria.
+    """
+    def __init__(self, caminho=CAMINHO_GRAFO):
+        self.caminho = caminho
+        self._dados = np.memmap(caminho, dtype=np.uint8, mode="r")
+        if bytes(self._dados[:len(MAGICO)]) != MAGICO:
+            raise ValueError(f"{caminho} não é um grafo binário")
+        tamanho = int(self._dados[len(MAGICO):len(MAGICO) + 8].view(np.uint64)[0])
+        inicio = len(MAGICO) + 8
+        self.cabecalho = json.loads(bytes(self._dados[inicio:inicio + tamanho]).decode("utf-8"))
+        if self.cabecalho["versao"] != VERSAO:
+            raise ValueError(f"Versão {self.cabecalho['versao']} do grafo binário não suportada")
+        self._inicio_dados = _alinhar(inicio + tamanho)
+
+    def array(self, nome):
+        descricao = self.cabecalho["arrays"][nome]
+        tipo = np.dtype(descricao["dtype"])
+        inicio = self._inicio_dados + descricao["inicio"]
+        return self._dados[inicio:inicio + descricao["tamanho"] * tipo.itemsize].view(tipo)
+
+    @property
+    def indptr(self):
+        return self.array("indptr")
+
+    @property
+    def indices(self):
+        return self.array("indices")
+
+    @property
+    def pesos(self):
+        return self.array("pesos")
+
+    @property
+    def ids(self):
+        # ID do nó de cada linha da adjacência
+        return self.array("ID")
+
+    def _decodificar(self, coluna, linhas):
+        valores = self.array(coluna["array"])[linhas]
+        if coluna["tipo"] == "texto":
+            categorias = np.array(coluna["categorias"] + [np.nan], dtype=object)
+            return categorias[valores]
+        if coluna["tipo"] == "logico":
+            return valores.astype(bool)
+        if coluna["tipo"] == "real":
+            return np.array(valores, dtype=np.float64)
+        if "nulos" in coluna:
+            nulos = self.array(coluna["nulos"])[linhas].astype(bool)
+            if nulos.any():
+                return np.where(nulos, np.nan, valores)
+        return valores.astype(np.int64)
+
+    def _tabela(self, colunas, nomes=None, linhas=slice(None)):
+        if nomes is not None:
+            por_nome = {coluna["nome"]: coluna for coluna in colunas}
+            colunas = [por_nome[nome] for nome in nomes]
+        return pd.DataFrame({coluna["nome"]: self._decodificar(coluna, linhas) for coluna in colunas})
+
+    def nos(self, colunas=None):
+        return self._tabela(self.cabecalho["nos"], colunas)
+
+    def arestas(self):
+        return self._tabela(self.cabecalho["arestas"])
+
+    def bairros(self):
+        # nós dos bairros (Tipo 2) apenas com as colunas dos bairros, como no nodes_bairros.csv
+        tipo = self._tabela(self.cabecalho["nos"], ["Tipo"])["Tipo"].to_numpy()
+        return self._tabela(self.cabecalho["nos"], self.cabecalho["colunas_bairros"], np.flatnonzero(tipo == 2))
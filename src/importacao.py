@@ -0,0 +1,46 @@
+import importlib
+import time
+from instrumentacao import etapa
+
+# Tempo gasto para importar cada módulo carregado sob demanda, em segundos
+TEMPOS_IMPORTACAO = {}
+
+class ModuloTardio:
+    """
+    Representa um módulo que só é importado no primeiro acesso a um dos seus atributos.
+    Assim bibliotecas pesadas (networkx, matplotlib, igraph...) só são carregadas pelos comandos que as usam.
+    """
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importar(self._nome)
+        return getattr(self._modulo, atributo)
+
+    def __repr__(self):
+        estado = "carregado" if self._modulo is not None else "não carregado"
+        return f"<módulo tardio {self._nome} ({estado})>"
+
+def importar(nome):
+    """
+    Importa o módulo medindo o tempo como uma etapa ("importar <nome>").
+    """
+    inicio = time.perf_counter()
+    with etapa("importar " + nome):
+        modulo = importlib.import_module(nome)
+    TEMPOS_IMPORTACAO.setdefault(nome, round(time.perf_counter() - inicio, 4))
+    return modulo
+
+def importar_tardio(nome):
+    return ModuloTardio(nome)
+
+def imprimir_importacoes():
+    if not TEMPOS_IMPORTACAO:
+        print("Nenhuma biblioteca pesada foi importada")
+        return
+    total = sum(TEMPOS_IMPORTACAO.values())
+    print(f"Tempo de importação das bibliotecas: {total:.2f}s")
+    for nome, tempo in sorted(TEMPOS_IMPORTACAO.items(), key=lambda item: -item[1]):
+        print(f"  {nome}: {tempo:.2f}s")
@@ -0,0 +1,159 @@
+import cProfile
+import functools
+import inspect
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # não existe no Windows
+    resource = None
+
+CAMINHO_RELATORIO = "datasets/output/relatorios/execucao.json"
+PASTA_PERFIS = "datasets/output/relatorios"
+
+# Configuração e etapas medidas na execução atual
+_config = {"perfil": None}
+_registros = []
+_pilha = []
+_inicio = time.perf_counter()
+
+def configurar(perfil=None, memoria=False):
+    """
+    Define a etapa que terá o perfil do cProfile salvo e liga a medição do pico de memória com o
+    tracemalloc (que deixa o código Python mais lento, por isso é opcional).
+    """
+    _config["perfil"] = perfil
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def _rss_max_mb():
+    if resource is None:
+        return None
+    # no Linux o ru_maxrss é dado em KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+@contextmanager
+def etapa(nome):
+    """
+    Mede uma etapa do pipeline: tempo de parede, tempo de CPU e pico de memória.
+    O registro é devolvido para a etapa acrescentar suas contagens, ex.: registro["linhas"] = len(df).
+    Etapas podem ser aninhadas; o pico de memória de uma etapa inclui o das etapas internas.
+    """
+    registro = {"etapa": nome, "pai": _pilha[-1]["etapa"] if _pilha else None, "nivel": len(_pilha)}
+    medir_memoria = tracemalloc.is_tracing()
+    if medir_memoria:
+        # guarda o pico da etapa externa antes de zerá-lo para esta
+        if _pilha:
+            _pilha[-1]["_pico"] = max(_pilha[-1].get("_pico", 0), tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    perfil = cProfile.Profile() if nome == _config["perfil"] else None
+    _pilha.append(registro)
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    registro["inicio_s"] = round(inicio - _inicio, 4)
+    if perfil is not None:
+        perfil.enable()
+    try:
+        yield registro
+    finally:
+        if perfil is not None:
+            perfil.disable()
+        registro["tempo_s"] = round(time.perf_counter() - inicio, 4)
+        registro["cpu_s"] = round(time.process_time() - inicio_cpu, 4)
+        _pilha.pop()
+
+        if medir_memoria:
+            pico = max(registro.pop("_pico", 0), tracemalloc.get_traced_memory()[1])
+            registro["pico_memoria_mb"] = round(pico / 2**20, 2)
+            if _pilha:
+                _pilha[-1]["_pico"] = max(_pilha[-1].get("_pico", 0), pico)
+        registro["rss_max_mb"] = _rss_max_mb()
+
+        if perfil is not None:
+            os.makedirs(PASTA_PERFIS, exist_ok=True)
+            registro["perfil"] = os.path.join(PASTA_PERFIS, f"perfil_{nome}.prof")
+            perfil.dump_stats(registro["perfil"])
+            print("Perfil da etapa", nome, "salvo em", registro["perfil"])
+        _registros.append(registro)
+
+def _contar_linhas(valor):
+    if isinstance(valor, pd.DataFrame):
+        return len(valor)
+    if isinstance(valor, tuple):
+        contagens = [len(item) for item in valor if isinstance(item, pd.DataFrame)]
+        return contagens or None
+    return None
+
+def medir(funcao):
+    """
+    Decorador que mede a função como uma etapa com o nome dela e registra o número de linhas
+    dos DataFrames recebidos (ex.: nós e arestas) e devolvidos.
+    """
+    assinatura = inspect.signature(funcao)
+
+    @functools.wraps(funcao)
+    def funcao_medida(*args, **kwargs):
+        with etapa(funcao.__name__) as registro:
+            argumentos = assinatura.bind_partial(*args, **kwargs).arguments
+            entradas = {nome: len(valor) for nome, valor in argumentos.items() if isinstance(valor, pd.DataFrame)}
+            if entradas:
+                registro["linhas_entrada"] = entradas
+            resultado = funcao(*args, **kwargs)
+            saida = _contar_linhas(resultado)
+            if saida is not None:
+                registro["linhas_saida"] = saida
+            return resultado
+
+    return funcao_medida
+
+def total_registros():
+    return len(_registros)
+
+def registros_desde(inicio):
+    """
+    Etapas medidas a partir da posição `inicio`; usado para devolver ao processo principal
+    as medições feitas em um processo filho.
+    """
+    return _registros[inicio:]
+
+def incorporar_registros(registros):
+    _registros.extend(registros)
+
+def resumo():
+    """
+    Soma as medições das etapas com o mesmo nome (chamadas, tempo de parede e de CPU).
+    """
+    totais = {}
+    for registro in _registros:
+        total = totais.setdefault(registro["etapa"], {"chamadas": 0, "tempo_s": 0.0, "cpu_s": 0.0})
+        total["chamadas"] += 1
+        total["tempo_s"] = round(total["tempo_s"] + registro["tempo_s"], 4)
+        total["cpu_s"] = round(total["cpu_s"] + registro["cpu_s"], 4)
+    return dict(sorted(totais.items(), key=lambda item: -item[1]["tempo_s"]))
+
+def salvar_relatorio(caminho=CAMINHO_RELATORIO):
+    """
+    Salva as etapas medidas, em ordem de início, e o resumo por etapa em um arquivo json.
+    """
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    relatorio = {
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "tempo_total_s": round(time.perf_counter() - _inicio, 4),
+        "rss_max_mb": _rss_max_mb(),
+        "etapas": sorted(_registros, key=lambda registro: registro["inicio_s"]),
+        "resumo": resumo(),
+    }
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print("Relatório de execução salvo em", caminho)
+
+def imprimir_resumo(n=10):
+    print(f"Etapas mais demoradas (top {n}):")
+    for nome, total in list(resumo().items())[:n]:
+        print(f"  {nome}: {total['tempo_s']:.2f}s ({total['chamadas']} chamada(s), CPU {total['cpu_s']:.2f}s)")
@@ -1,15 +1,94 @@
-import os
-def main():
-    # exectar os comandos do sistema
+import argparse
+import data_prepocessing
+import modeling_data
+import modeling_graph
+from instrumentacao import CAMINHO_RELATORIO, configurar, imprimir_resumo, salvar_relatorio
+from grafo_binario import CAMINHO_GRAFO
+from importacao import imprimir_importacoes
+from orquestrador import CAMINHO_ESTADO, No, executar
 
-    # python3 src/data_preprocessing.py
-    os.system('python3 src/data_preprocessing.py')
+# Nomes dos algoritmos de comunidade na linha de comando (ex.: --algo leiden)
+ALGORITMOS = {name.lower().replace(" ", "-"): name for name in modeling_graph.ALGORITMOS_COMUNIDADE}
 
-    # python3 src/modeling_data.py
-    os.system('python3 src/modeling_data.py')
+def pipeline(exportar_csv=True, centralidade=None, permutacao=None):
+    """
+    Nós do pipeline completo: pré-processamento, construção do grafo (nós e arestas) e as etapas
+    de métricas e gráficos do modeling_graph.
+    """
+    pre_processamento = No("data_prepocessing", data_prepocessing.main,
+                           [data_prepocessing.CAMINHO_CRIMES, data_prepocessing.CAMINHO_LOCALIDADE],
+                           [data_prepocessing.CAMINHO_DADOS_PRE])
 
-    # python3 src/modeling_graph.py
-    os.system('python3 src/modeling_graph.py')
+    # o grafo binário é sempre gerado; os csv de nós e arestas só com exportar_csv
+    saidas = [
+        "datasets/output/graphs/gerais/top15_municipios.png",
+        modeling_graph.CAMINHO_DIVINOPOLIS,
+        "datasets/output/dados/bairros_possiveis.csv",
+        CAMINHO_GRAFO,
+    ]
+    if exportar_csv:
+        saidas += ["datasets/output/dados/nodes-edges/" + nome + ".csv"
+                   for nome in ["nodes_bairros", "nodes_casos", "edges_bairros", "edges_casos", "nodes", "edges"]]
+    modelagem_dados = No("modeling_data", modeling_data.main,
+                         [data_prepocessing.CAMINHO_DADOS_PRE, "datasets/input/localidade/bairros_divinopolis.csv",
+                          modeling_data.CAMINHO_PESOS], saidas, argumentos=[exportar_csv])
+    return [pre_processamento, modelagem_dados] + modeling_graph.etapas(centralidade, permutacao)
+
+def selecionar(comando, only=None, algo=None):
+    """
+    Nomes dos nós executados por um subcomando; None executa o pipeline inteiro.
+    """
+    if comando is None:
+        return None
+    if comando == "preprocess":
+        return ["data_prepocessing"]
+    if comando == "build-graph":
+        return ["modeling_data"]
+    if comando == "metrics":
+        return [nome for metrica in (only or modeling_graph.METRICAS) for nome in modeling_graph.METRICAS[metrica]]
+    if comando == "communities":
+        algoritmos = [ALGORITMOS[nome] for nome in algo] if algo else modeling_graph.ALGORITMOS_COMUNIDADE
+        return ["comunidades"] + [prefixo + name for name in algoritmos for prefixo in ("grafo_comunidade_", "graficos_comunidade_")]
+    # charts: todas as etapas do grafo que não calculam métricas nem detectam comunidades
+    calculos = {nome for nomes in modeling_graph.METRICAS.values() for nome in nomes} | {"comunidades"}
+    return [no.nome for no in modeling_graph.etapas() if no.nome not in calculos]
+
+def main(perfil=None, memoria=False, relatorio=CAMINHO_RELATORIO, forcar=False, estado=CAMINHO_ESTADO, processos=1, apenas=None,
+         exportar_csv=True, centralidade=None, permutacao=None):
+    # executa as etapas medindo cada uma e pulando as que não mudaram (em paralelo com processos > 1)
+    configurar(perfil=perfil, memoria=memoria)
+    executadas = executar(pipeline(exportar_csv, centralidade, permutacao), caminho_estado=estado, forcar=forcar, processos=processos, apenas=apenas)
+    print(f"{len(executadas)} etapa(s) executada(s)")
+
+    # relatório com tempo, CPU, memória e contagens de cada etapa
+    salvar_relatorio(relatorio)
+    imprimir_resumo()
+    imprimir_importacoes()
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description="Pipeline completo: pré-processamento, modelagem dos dados e do grafo. "
+                                                 "Sem subcomando, executa todas as etapas.")
+    parser.add_argument("--perfil", default=None, help="nome da etapa (função) que terá o perfil do cProfile salvo")
+    parser.add_argument("--memoria", action="store_true", help="mede o pico de memória de cada etapa com o tracemalloc (mais lento)")
+    parser.add_argument("--relatorio", default=CAMINHO_RELATORIO, help="caminho do relatório de execução em json")
+    parser.add_argument("--forcar", action="store_true", help="executa todas as etapas, mesmo as que não mudaram")
+    parser.add_argument("--estado", default=CAMINHO_ESTADO, help="arquivo json com o hash das entradas e saídas de cada etapa")
+    parser.add_argument("--processos", type=int, default=1, help="número de processos para executar as etapas independentes (métricas, gráficos) em paralelo")
+    parser.add_argument("--sem-csv", action="store_true", help="não exporta os nós e as arestas em csv (o modeling_graph lê apenas o grafo binário)")
+    modeling_graph.adicionar_argumentos_centralidade(parser)
+    modeling_graph.adicionar_argumentos_permutacao(parser)
+
+    subparsers = parser.add_subparsers(dest="comando")
+    subparsers.add_parser("preprocess", help="pré-processamento dos dados (dados_pre.csv)")
+    subparsers.add_parser("build-graph", help="nós e arestas do grafo (modeling_data)")
+    metricas = subparsers.add_parser("metrics", help="métricas do grafo de bairros")
+    metricas.add_argument("--only", nargs="+", choices=list(modeling_graph.METRICAS), help="calcula apenas estas métricas")
+    comunidades = subparsers.add_parser("communities", help="detecção de comunidades e seus gráficos")
+    comunidades.add_argument("--algo", nargs="+", choices=list(ALGORITMOS), help="gera os gráficos apenas destes algoritmos")
+    subparsers.add_parser("charts", help="gráficos gerais, das métricas e das médias por bairro")
+
+    args = parser.parse_args()
+    apenas = selecionar(args.comando, only=getattr(args, "only", None), algo=getattr(args, "algo", None))
+    main(perfil=args.perfil, memoria=args.memoria, relatorio=args.relatorio, forcar=args.forcar, estado=args.estado,
+         processos=args.processos, apenas=apenas, exportar_csv=not args.sem_csv, centralidade=modeling_graph.opcoes_centralidade(args),
+         permutacao=modeling_graph.opcoes_permutacao(args))
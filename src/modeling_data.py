@@ -1,11 +1,24 @@
 import pandas as pd
+import numpy as np
+import os
 import warnings
-import matplotlib.pyplot as plt
-import seaborn as sns
+from data_prepocessing import carregar_cache
+from importacao import importar_tardio
+from normalizacao import normalizar_unicos
+from instrumentacao import medir
+from esquema import ESQUEMA_ARESTAS, ESQUEMA_CRIMES, ESQUEMA_NOS, FORMATO_DATA, aplicar_esquema, relatar_memoria
+from grafo_binario import salvar_grafo
+
+# Bibliotecas de gráficos: só são importadas ao gerar o gráfico
+plt = importar_tardio("matplotlib.pyplot")
+sns = importar_tardio("seaborn")
+# Matrizes esparsas: só usadas para contar divisas a mais de um salto
+sparse = importar_tardio("scipy.sparse")
 
 # Ignorar todos os warnings
 warnings.filterwarnings("ignore")
 
+@medir
 def grafico_casos_bairros(df, n):
     # Contar o número de casos por município
     municipios_top = df["Município"].value_counts().head(n)
@@ -30,6 +43,7 @@ def grafico_casos_bairros(df, n):
     print("Gráfico salvo em", file_path)
 
 
+@medir
 def cutting_data(df, cidade):
     """
     Filtra o DataFrame para a cidade desejada e remove colunas indesejadas.
@@ -48,6 +62,7 @@ def cutting_data(df, cidade):
     return df
 
 
+@medir
 def arrumar_bairros_divinopolis(df):
     """
     Padroniza e corrige os nomes dos bairros no DataFrame.
@@ -76,8 +91,6 @@ def arrumar_bairros_divinopolis(df):
 
         return bairro
 
-    df["Bairro"] = df["Bairro"].apply(limpar_bairro)
-
     # Correções específicas para padronização dos nomes
     correcoes = {
         "XAVANTES": "XAVANTE",
@@ -94,7 +107,9 @@ def arrumar_bairros_divinopolis(df):
         "JOAO PAULO": "JOAO PAULO II",
         "DOM PEDRO": "DOM PEDRO II"
     }
-    df["Bairro"] = df["Bairro"].replace(correcoes)
+
+    # Limpa e corrige cada nome distinto uma única vez
+    df["Bairro"] = normalizar_unicos(df["Bairro"], lambda bairros: bairros.map(limpar_bairro).replace(correcoes), categorica=True)
 
     # Remove linhas com valores vazios ou NaN na coluna 'Bairro'
     df = df.dropna(subset=["Bairro"])
@@ -103,82 +118,61 @@ def arrumar_bairros_divinopolis(df):
     return df
 
 
-def classificar_casos(df):
-    """
-    Classifica os casos com base em pontuações definidas a partir de três colunas.
-    """
-    # Pesos para "Descricao Subclasse Natureza"
-    peso_natureza = {
-        "AMEACA": 1, "FURTO": 1, "VIAS DE FATO   AGRESSAO": 3, "ESTELIONATO": 1,
-        "LESAO CORPORAL": 4, "ESTUPRO DE VULNERAVEL": 5, "VIOLENCIA PSICOLOGICA": 1,
-        "DIFAMACAO": 1, "ROUBO": 3, "APROPRIACAO INDEBITA DE COISA ALHEIA MOVEL": 1,
-        "CALUNIA": 1, "DANO": 2, "IMPORTUNACAO SEXUAL": 3, "ESTUPRO": 5, "INJURIA": 1,
-        "ATO OBSCENO": 1, "APROPRIACAO DE COISA HAVIDA POR ERRO  COISA ACHADA": 1,
-        "INJURIA RACIAL": 2, "INVASAO DE DISPOSITIVO INFORMATICO": 1, "ASSEDIO SEXUAL": 3,
-        "PERSEGUICAO": 2, "VIOLACAO DE DOMICILIO": 3, "OUTRAS INFRACOES CONTRA O PATRIMONIO": 2,
-        "OUTRAS INFRACOES CONTRA DIGNIDADE SEXUAL E A FAMIL": 4,
-        "RACISMO   PRATICA INDUZ INCITA PRECONCEITO COR DIV": 2, "MAUS TRATOS": 4,
-        "OUTROS INFRACOES C  A PESSOA": 2, "APROPRIA DESV BEM PROVENTO PENSAO REND IDOSO": 2,
-        "ABANDONO DE INCAPAZ": 3, "RACISMO   IMPEDE CASAMENTO CONVIVENCIA FAMILIAR SO": 2,
-        "EXTORSAO": 3, "RECEPTACAO": 2, "DIVULGACAO CENA ESTUPRO E IMAGEM NUDEZ  SEXO OU PO": 2,
-        "PERIGO PARA A VIDA OU SAUDE DE OUTREM": 4, "SEQUESTRO E CARCERE PRIVADO": 5,
-        "ESBULHO POSSESSORIO": 2, "CONSTRANGIMENTO ILEGAL": 2,
-        "ZOMBA PERTUBA CERIMONIA SIMILAR INDIGENA": 1, "NEGAR SALDAR DESPESA": 1,
-        "TORTURA": 5, "REGISTRO NAO AUTORIZADO DA INTIMIDADE SEXUAL": 4,
-        "OUTRA INFRACAO REFERENTE A SUB  ENTORPECENTE": 4,
-        "OUTRAS INFRACOES DEMAIS LEIS ESPECIAIS": 2, "CONSTRANGE VEXAME MENOR DE IDADE SOB GUARDA": 3,
-        "FAVORECIMENTO DA PROSTITUICAO": 4, "OMISSAO DE SOCORRO": 5,
-        "FOTOG  PUBLICA CENA DE SEXO PORNO C MENOR ID": 3
-    }
-
-    # Pesos para "Descricao Meio Utilizado"
-    peso_meio = {
-        "FALA": 1, "ESCALADA": 1, "AGRESSAO FISICA SEM EMPREGO DE INSTRUMENTOS": 3,
-        "MEIO ELETRONICO  INTERNET OU SMS": 1, "OUTROS MEIOS  DESCREVER EM CAMPO ESPECIFICO": 2,
-        "ARROMBAMENTO ROMPIMENTO DE OBSTACULO": 3, "FRAUDE": 1, "ABUSO DE CONFIANCA": 1,
-        "RADIODIFUSAO  TELEVISAO  RADIO  SIMILARES": 1, "EMPREGO DE CHAVE FALSA   MICHA   GAZUA": 3,
-        "MEIO DESCONHECIDO": 2, "INST CONTUNDENTE CORTANTE PERFURANTE  ARMA BR": 5,
-        "ARMAS DE FOGO": 5, "SEM EMPREGO DE INSTRUMENTOS": 1, "MEDIANTE FRAUDE": 1,
-        "AGRESSAO FISICA COM EMPREGO DE INSTRUMENTOS": 4,
-        "ATO DE SUFOCAR  ENFORCAR  ESTRANGULAR OU ESGA": 5,
-        "CONHECIMENTO TECNICO ESPECIFICO": 1, "ESCRITA FISICA": 1, "VIOLENCIA OU VIAS DE FATO": 4,
-        "VIOLENCIA OU GRAVE AMEACA": 5, "VEICULO": 4, "SEM USO DE VIOLENCIA OU GRAVE AMEACA": 1,
-        "SUBST QUIMICA BIOLOGICA ENTORPECENTE ENVENENA": 5,
-        "OFERECIMENTO DE VANTAGEM A VITIMA": 1, "AMEACA": 2, "IMOBILIZACAO DA VITIMA": 4,
-        "AQUISICAO  ONEROSA OU GRATUITA  PRODUTO DE CR": 2,
-        "ARROMBAMENTO ROMPIMENTO DE OBSTACULO C EXPLOS": 4, "USO DE SINAIS  GESTOS OU IMAGENS": 1,
-        "TRAFICAR DROGAS": 4, "COACAO": 3, "SIMULACRO DE ARMA DE FOGO": 3,
-        "RECEBIMENTO  A QUALQUER TITULO  DE PROD  DE C": 2, "QUEDA": 3
-    }
-
-    # Pesos para "Tentado Consumado"
-    peso_tentado_consumado = {
-        "TENTADO": 0,
-        "CONSUMADO": 2
-    }
+# Tabela com o peso de cada valor das colunas usadas na classificação (colunas Coluna, Valor e Peso)
+CAMINHO_PESOS = "datasets/input/classificacao/pesos.csv"
 
-    def calcular_pontuacao(row):
-        descricao_natureza = str(row["Descricao Subclasse Natureza"]).upper().strip()
-        descricao_meio = str(row["Descricao Meio Utilizado"]).upper().strip()
-        tentado_consumado = str(row["Tentado Consumado"]).upper().strip()
+# Pontuação mínima de cada classe; casos abaixo de todos os limiares ficam com a CLASSE_PADRAO
+LIMIARES_CLASSIFICACAO = {"ALTO RISCO DE FATALIDADE": 11, "POSSIVEL FATAL": 5}
+CLASSE_PADRAO = "NAO FATAL"
 
-        pontos_natureza = peso_natureza.get(descricao_natureza, 0)
-        pontos_meio = peso_meio.get(descricao_meio, 0)
-        pontos_tentado_consumado = peso_tentado_consumado.get(tentado_consumado, 0)
+def carregar_pesos(caminho=CAMINHO_PESOS):
+    """
+    Lê a tabela de pesos como {coluna: {valor: peso}}.
+    """
+    if not os.path.exists(caminho):
+        raise FileNotFoundError(f"Tabela de pesos da classificação não encontrada: {caminho} (colunas Coluna, Valor e Peso; "
+                                f"a tabela original fica em {CAMINHO_PESOS} no repositório)")
+    df_pesos = pd.read_csv(caminho, delimiter=',', encoding='utf-8', keep_default_na=False)
+    return {coluna: dict(zip(grupo["Valor"], grupo["Peso"])) for coluna, grupo in df_pesos.groupby("Coluna", sort=False)}
 
-        pontuacao_total = pontos_natureza + pontos_meio + pontos_tentado_consumado
+def codificar_pesos(df, pesos):
+    """
+    Para cada coluna da tabela de pesos, devolve os códigos de categoria de cada caso e o vetor com o peso
+    de cada categoria. Os valores são comparados em caixa alta e sem espaços nas pontas; valores sem peso
+    contam 0, e a última posição do vetor (código -1, valores nulos) também.
+    """
+    codificadas = {}
+    for coluna, pesos_coluna in pesos.items():
+        serie = df[coluna].astype("category")
+        valores = serie.cat.categories.astype(str).str.upper().str.strip()
+        pesos_categorias = pd.Series(pesos_coluna).reindex(valores, fill_value=0).to_numpy()
+        codificadas[coluna] = (serie.cat.codes.to_numpy(), np.append(pesos_categorias, 0))
+    return codificadas
+
+def classificar_pontuacao(pontuacao, limiares=LIMIARES_CLASSIFICACAO):
+    # a primeira classe (da mais exigente para a menos) cujo limiar a pontuação alcança
+    classes = sorted(limiares.items(), key=lambda item: -item[1])
+    return np.select([pontuacao >= minimo for _, minimo in classes], [classe for classe, _ in classes], default=CLASSE_PADRAO)
+
+@medir
+def classificar_casos(df, pesos=None, limiares=LIMIARES_CLASSIFICACAO):
+    """
+    Classifica os casos com base em pontuações definidas a partir de três colunas.
+    A pontuação é a soma dos pesos (tabela em CAMINHO_PESOS) dos valores do caso em cada coluna.
+    """
+    if pesos is None:
+        pesos = carregar_pesos()
 
-        if pontuacao_total >= 11:
-            return "ALTO RISCO DE FATALIDADE"
-        elif pontuacao_total >= 5:
-            return "POSSIVEL FATAL"
-        else:
-            return "NAO FATAL"
+    pontuacao = np.zeros(len(df), dtype=int)
+    for codigos, pesos_categorias in codificar_pesos(df, pesos).values():
+        pontuacao = pontuacao + pesos_categorias[codigos]
 
-    df["Classificacao"] = df.apply(calcular_pontuacao, axis=1)
+    df["Classificacao"] = classificar_pontuacao(pontuacao, limiares)
+    df["Pontuacao"] = pontuacao
     return df
 
 
+@medir
 def possible_bairros(df_bairros, df, df_edges):
     """
     Indexa os bairros a partir dos dados de bairros e atualiza os DataFrames dos casos e das arestas.
@@ -200,74 +194,88 @@ def possible_bairros(df_bairros, df, df_edges):
     for bairro in df["Bairro"].unique():
         if bairro not in bairro_to_id:
             print(f"Bairro não encontrado: {bairro}")
-    df["Bairro"] = df["Bairro"].map(bairro_to_id).fillna(-1).astype(int)
+    df["Bairro"] = df["Bairro"].astype(object).map(bairro_to_id).fillna(-1).astype("int32")
 
     # Atualiza o DataFrame de arestas com os IDs dos bairros
-    df_edges["bairro"] = df_bairros["bairro"].map(bairro_to_id).fillna(-1).astype(int)
-    df_edges["bairro_divisa"] = df_bairros["bairro_divisa"].map(bairro_to_id).fillna(-1).astype(int)
+    df_edges["bairro"] = df_bairros["bairro"].map(bairro_to_id).fillna(-1).astype("int32")
+    df_edges["bairro_divisa"] = df_bairros["bairro_divisa"].map(bairro_to_id).fillna(-1).astype("int32")
 
     return df_bairros_possiveis, df, df_edges
 
-def calcular_casos_total(df_nodes, df_aux):
-    """
-    Calcula o número total de casos para um bairro.
-    """
-    for i in range(len(df_aux)):
-        n_casos_total = 0
-        for j in range(len(df_nodes)):
-            if df_nodes.at[j, "Tipo"] == 1:
-                id_caso = df_nodes.at[j, "ID"]
-                bairro = df_nodes.at[j, "Bairro"]
-                if bairro == df_aux.at[i, "ID"]:
-                    n_casos_total += 1
-        df_aux.at[i, "N de casos Total"] = n_casos_total
-
-    df_aux["N de casos Total"] = df_aux["N de casos Total"].fillna(0).astype(int)
-        
-    return df_aux
-        
-def calcular_casos_fatais(df_nodes, df_aux):
+# Contadores de casos de cada bairro: nome da coluna -> (coluna, valor) que o caso precisa ter para ser
+# contado, ou None para contar todos os casos do bairro. Um novo contador é só mais uma linha aqui.
+CONTADORES_BAIRRO = {
+    "N de casos Total": None,
+    "N de casos Fatais": ("Classificacao", "ALTO RISCO DE FATALIDADE"),
+    "N de casos Possivel Fatal": ("Classificacao", "POSSIVEL FATAL"),
+    "N de casos Nao Fatal": ("Classificacao", "NAO FATAL"),
+}
+
+# Colunas dos nós dos bairros (nodes_bairros.csv)
+COLUNAS_BAIRROS = ["ID", "Bairro", "Classificacao", "Tipo"] + list(CONTADORES_BAIRRO) + ["N de bairros Divisa"]
+
+@medir
+def contar_casos_bairros(df_nodes, df_aux, contadores=CONTADORES_BAIRRO):
     """
-    Calcula o número de casos fatais para um bairro.
+    Calcula todos os contadores de casos dos bairros em uma única passada agrupada pelo ID do bairro.
     """
-    n_casos_fatais = 0
-    for i in range(len(df_aux)):
-        n_casos_total = 0
-        for j in range(len(df_nodes)):
-            if df_nodes.at[j, "Tipo"] == 1:
-                id_caso = df_nodes.at[j, "ID"]
-                bairro = df_nodes.at[j, "Bairro"]
-                if bairro == df_aux.at[i, "ID"] and df_nodes.at[j, "Classificacao"] == "ALTO RISCO DE FATALIDADE":
-                    n_casos_total += 1
-        df_aux.at[i, "N de casos Fatais"] = n_casos_total
-
-    df_aux["N de casos Fatais"] = df_aux["N de casos Fatais"].fillna(0).astype(int)
+    casos = df_nodes[df_nodes["Tipo"] == 1]
+
+    # Uma coluna 0/1 por contador, somadas por bairro de uma só vez
+    indicadores = pd.DataFrame(index=casos.index)
+    for coluna, condicao in contadores.items():
+        if condicao is None:
+            indicadores[coluna] = 1
+        else:
+            campo, valor = condicao
+            indicadores[coluna] = (casos[campo] == valor).astype(int)
+    contagens = indicadores.groupby(casos["Bairro"].to_numpy()).sum()
+
+    # Bairros sem nenhum caso ficam com 0 (casos com bairro -1 não pertencem a nenhum bairro)
+    contagens = contagens.reindex(df_aux["ID"].to_numpy(), fill_value=0)
+    for coluna in contadores:
+        df_aux[coluna] = contagens[coluna].to_numpy().astype(int)
 
     return df_aux
-        
 
-def calcular_bairros_divisa(df_bairros, df_aux):
+
+@medir
+def calcular_bairros_divisa(df_bairros, df_aux, saltos=1, coluna="N de bairros Divisa"):
     """
-    Calcula o número de bairros divisa para um bairro.
+    Calcula o número de bairros divisa de cada bairro direto da lista de divisas.
+    Laços (um bairro em divisa com ele mesmo, como aparecem os bairros isolados) não contam e uma divisa
+    repetida, em qualquer sentido, conta uma vez. Com `saltos` > 1 conta os bairros a até `saltos` divisas.
     """
-    for i in range(len(df_aux)):
-        n_bairros_divisa = 0
-        for j in range(len(df_bairros)):
-            bairro = df_bairros.at[j, "bairro"]
-            bairro_divisa = df_bairros.at[j, "bairro_divisa"]
-            if bairro == df_aux.at[i, "Bairro"]:
-                n_bairros_divisa += 1
-            if bairro_divisa == df_aux.at[i, "Bairro"]:
-                n_bairros_divisa += 1
-            if bairro == df_aux.at[i, "Bairro"] and bairro_divisa == df_aux.at[i, "Bairro"]:
-                n_bairros_divisa = 0                
-        df_aux.at[i, "N de bairros Divisa"] = n_bairros_divisa
-
-    df_aux["N de bairros Divisa"] = df_aux["N de bairros Divisa"].fillna(0).astype(int)
+    # Codifica os nomes pela posição do bairro em df_aux (-1 para bairros que não estão lá)
+    codigos = pd.Index(df_aux["Bairro"])
+    origem = codigos.get_indexer(df_bairros["bairro"])
+    destino = codigos.get_indexer(df_bairros["bairro_divisa"])
+    validas = (origem >= 0) & (destino >= 0) & (origem != destino)
+
+    # Cada divisa como um par (menor, maior), sem repetições
+    pares = np.unique(np.sort(np.column_stack([origem[validas], destino[validas]]), axis=1), axis=0)
+    n_bairros = len(codigos)
+
+    if saltos == 1:
+        grau = np.bincount(pares.ravel(), minlength=n_bairros)
+    else:
+        # Bairros alcançáveis em até `saltos` passos, expandindo a matriz de adjacência (esparsa)
+        linhas = np.concatenate([pares[:, 0], pares[:, 1]])
+        colunas = np.concatenate([pares[:, 1], pares[:, 0]])
+        adjacencia = sparse.csr_matrix((np.ones(len(linhas)), (linhas, colunas)), shape=(n_bairros, n_bairros))
+        alcance = adjacencia.copy()
+        for _ in range(saltos - 1):
+            alcance = alcance + alcance @ adjacencia
+            alcance.data[:] = 1
+        # O próprio bairro é alcançado de volta a partir de 2 saltos e não é contado
+        grau = alcance.getnnz(axis=1) - (alcance.diagonal() > 0)
+
+    df_aux[coluna] = grau.astype(int)
 
     return df_aux
 
-def add_possible_bairros(df_nodes, df_aux, df_bairros):
+@medir
+def add_possible_bairros(df_nodes, df_aux, df_bairros, exportar_csv=True):
     """
     Cria um DataFrame com os bairros possíveis e os integra com os casos existentes.
     """
@@ -276,8 +284,7 @@ def add_possible_bairros(df_nodes, df_aux, df_bairros):
     df_aux["Classificacao"] = "Bairro"
     df_aux["Tipo"] = 2
     # Cria DataFrame para os bairros com a mesma estrutura dos nós de casos
-    df_aux = calcular_casos_total(df_nodes, df_aux)
-    df_aux = calcular_casos_fatais(df_nodes, df_aux)
+    df_aux = contar_casos_bairros(df_nodes, df_aux)
     df_aux = calcular_bairros_divisa(df_bairros, df_aux)
     # Substituir valores NaN por -1 e converter para inteiro
     df_aux["ID"] = df_aux["ID"].fillna(-1).astype(int)
@@ -289,29 +296,32 @@ def add_possible_bairros(df_nodes, df_aux, df_bairros):
         print("Bairros não encontrados e removidos.")
 
     # Salva os nós referentes aos bairros
-    df_aux.to_csv("datasets/output/dados/nodes-edges/nodes_bairros.csv", index=False)
+    if exportar_csv:
+        df_aux.to_csv("datasets/output/dados/nodes-edges/nodes_bairros.csv", index=False)
 
     # Define o tipo para os nós de casos e salva separadamente
 
-    df_nodes["N de casos Total"] = None
-    df_nodes["N de casos Fatais"] = None
-    df_nodes["N de bairros Divisa"] = None
-    df_nodes.to_csv("datasets/output/dados/nodes-edges/nodes_casos.csv", index=False)
+    contadores = list(CONTADORES_BAIRRO) + ["N de bairros Divisa"]
+    for coluna in contadores:
+        df_nodes[coluna] = None
+    if exportar_csv:
+        df_nodes.to_csv("datasets/output/dados/nodes-edges/nodes_casos.csv", index=False, date_format=FORMATO_DATA)
 
     df_aux2 = pd.DataFrame(columns=df_nodes.columns)
     df_aux2["ID"] = df_aux["ID"]
     df_aux2["Bairro"] = df_aux["Bairro"]
     df_aux2["Classificacao"] = df_aux["Classificacao"]
     df_aux2["Tipo"] = df_aux["Tipo"]
-    df_aux2["N de casos Total"] = df_aux["N de casos Total"]
-    df_aux2["N de casos Fatais"] = df_aux["N de casos Fatais"]
-    df_aux2["N de bairros Divisa"] = df_aux["N de bairros Divisa"]
+    for coluna in contadores:
+        df_aux2[coluna] = df_aux[coluna]
 
     # Concatena os DataFrames para formar o conjunto final de nós
     df_nodes = pd.concat([df_aux2, df_nodes], ignore_index=True)
 
-    return df_nodes
+    # Os contadores novos seguem o mesmo tipo dos que já estão no esquema
+    return aplicar_esquema(df_nodes, {**dict.fromkeys(CONTADORES_BAIRRO, "Int32"), **ESQUEMA_NOS})
 
+@medir
 def nodes(df):
     """
     Processa o DataFrame removendo colunas desnecessárias e criando um identificador único.
@@ -322,39 +332,58 @@ def nodes(df):
     ]
     df = df.drop(columns=colunas_remover)
     df.reset_index(drop=True, inplace=True)
-    df["ID"] = df.index
+    df["ID"] = np.arange(len(df), dtype="int32")
     return df
 
 
-def edges(df_edges, df_nodes):
+@medir
+def edges(df_edges, df_nodes, caminho=None, tamanho_bloco=1_000_000, exportar_csv=True):
     """
     Cria e atualiza os DataFrames de arestas para representar as conexões entre bairros e casos.
+    Com `caminho`, as arestas são escritas direto nesse arquivo em blocos de `tamanho_bloco` casos, sem
+    montar a tabela completa na memória, e nada é retornado.
     """
     # Define o peso para as arestas entre bairros
     df_edges["Weight"] = 2
     df_edges = df_edges.rename(columns={"bairro": "Source", "bairro_divisa": "Target"})
-    df_edges.to_csv("datasets/output/dados/nodes-edges/edges_bairros.csv", index=False)
-
-    # Cria arestas entre casos e bairros
-    df_aux = pd.DataFrame(columns=["Source", "Target", "Weight"])
-    for i in range(len(df_nodes)):
-        if df_nodes.at[i, "Tipo"] == 1:  # Casos são Tipo 1
-            id_caso = df_nodes.at[i, "ID"]
-            bairro = df_nodes.at[i, "Bairro"]
-            
-            linha = {"Source": bairro, "Target": id_caso, "Weight": 1}
-            df_aux = pd.concat([df_aux, pd.DataFrame([linha])], ignore_index=True)
-            df_edges = pd.concat([df_edges, pd.DataFrame([linha])], ignore_index=True)
-
-    df_aux.to_csv("datasets/output/dados/nodes-edges/edges_casos.csv", index=False)
-    return df_edges
-
-
-def main():
-    # Carregar os dados
-    df = pd.read_csv("datasets/output/dados/dados_pre.csv", delimiter=',', encoding='utf-8', engine='python')
-
-    grafico_casos_bairros(df, 15)
+    if exportar_csv or caminho is not None:
+        df_edges.to_csv("datasets/output/dados/nodes-edges/edges_bairros.csv", index=False)
+
+    # Cria arestas entre casos e bairros: uma por caso (Tipo 1), do bairro para o caso
+    casos = df_nodes[df_nodes["Tipo"] == 1]
+    origem = casos["Bairro"].to_numpy()
+    destino = casos["ID"].to_numpy()
+
+    def arestas_casos(inicio, fim):
+        df_aux = pd.DataFrame({"Source": origem[inicio:fim], "Target": destino[inicio:fim], "Weight": 1})
+        return aplicar_esquema(df_aux, ESQUEMA_ARESTAS)
+
+    caminho_casos = "datasets/output/dados/nodes-edges/edges_casos.csv"
+    if caminho is None:
+        df_aux = arestas_casos(0, len(casos))
+        if exportar_csv:
+            df_aux.to_csv(caminho_casos, index=False)
+        return aplicar_esquema(pd.concat([df_edges, df_aux], ignore_index=True), ESQUEMA_ARESTAS)
+
+    # Arestas entre bairros primeiro e depois as dos casos, na mesma ordem da tabela completa
+    aplicar_esquema(df_edges, ESQUEMA_ARESTAS).to_csv(caminho, index=False)
+    arestas_casos(0, 0).to_csv(caminho_casos, index=False)
+    for inicio in range(0, len(casos), tamanho_bloco):
+        bloco = arestas_casos(inicio, inicio + tamanho_bloco)
+        bloco.to_csv(caminho_casos, mode="a", header=False, index=False)
+        bloco.to_csv(caminho, mode="a", header=False, index=False)
+
+
+def main(exportar_csv=True):
+    # Carregar os dados: com o cache colunar, lê apenas a partição de DIVINOPOLIS
+    df = carregar_cache(municipio="DIVINOPOLIS")
+    if df is not None:
+        grafico_casos_bairros(carregar_cache(colunas=["Município"]), 15)
+    else:
+        df = pd.read_csv("datasets/output/dados/dados_pre.csv", delimiter=',', encoding='utf-8', engine='python')
+        df = aplicar_esquema(df, ESQUEMA_CRIMES)
+        grafico_casos_bairros(df, 15)
+    relatar_memoria(df, "a leitura")
 
     # Filtrar e cortar os dados para a cidade DIVINOPOLIS
     df = cutting_data(df, "DIVINOPOLIS")
@@ -366,10 +395,10 @@ def main():
 
     # Reiniciar os índices e criar coluna de ID
     df.reset_index(drop=True, inplace=True)
-    df["ID"] = df.index
+    df["ID"] = np.arange(len(df), dtype="int32")
 
     # Salvar dados processados
-    df.to_csv("datasets/output/dados/dados_divinopolis.csv", index=False)
+    df.to_csv("datasets/output/dados/dados_divinopolis.csv", index=False, date_format=FORMATO_DATA)
     print("Arquivo dados_divinopolis.csv criado com sucesso!")
 
     # Carregar arquivo com os bairros
@@ -391,18 +420,23 @@ def main():
     df_aux.to_csv("datasets/output/dados/bairros_possiveis.csv", index=False)
 
     # Adicionar os possíveis bairros aos nós e salvar separadamente
-    df_nodes = add_possible_bairros(df_nodes, df_aux, df_bairros)
+    df_nodes = add_possible_bairros(df_nodes, df_aux, df_bairros, exportar_csv)
     print("Possíveis bairros adicionados com sucesso!")
 
-    # Processar e salvar os nós finais
+    # Processar os nós e as arestas finais
     df_nodes = nodes(df_nodes)
-    df_nodes.to_csv("datasets/output/dados/nodes-edges/nodes.csv", index=False)
-    print("Arquivo nodes.csv criado com sucesso!")
-
-    # Processar e salvar as arestas finais
-    df_edges = edges(df_edges, df_nodes)
-    df_edges.to_csv("datasets/output/dados/nodes-edges/edges.csv", index=False)
-    print("Arquivo edges.csv criado com sucesso!")
+    relatar_memoria(df_nodes, "a criação dos nós")
+    df_edges = edges(df_edges, df_nodes, exportar_csv=exportar_csv)
+
+    # Salvar nós, arestas e adjacência no grafo binário, que é o que o modeling_graph lê
+    salvar_grafo(df_nodes, df_edges, colunas_bairros=COLUNAS_BAIRROS)
+
+    # Exportações em csv (opcionais)
+    if exportar_csv:
+        df_nodes.to_csv("datasets/output/dados/nodes-edges/nodes.csv", index=False, date_format=FORMATO_DATA)
+        print("Arquivo nodes.csv criado com sucesso!")
+        df_edges.to_csv("datasets/output/dados/nodes-edges/edges.csv", index=False)
+        print("Arquivo edges.csv criado com sucesso!")
 
 
 if __name__ == '__main__':
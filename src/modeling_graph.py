@@ -1,20 +1,32 @@
+import argparse
+import heapq
+import time
 import pandas as pd
-import matplotlib.pyplot as plt
-import networkx as nx
 import numpy as np
-import community.community_louvain as community_louvain
-from networkx.algorithms.community import girvan_newman
-from fa2_modified import ForceAtlas2 
-import matplotlib
-from scipy.stats import pearsonr
 import sys
 import os
-import igraph as ig
-from leidenalg import find_partition, ModularityVertexPartition
-from networkx.algorithms.community import asyn_lpa_communities  
-import seaborn as sns
 import warnings
-import statsmodels.api as sm
+from autocorrelacao import matriz_pesos, moran_global, moran_local
+from grafo_binario import CAMINHO_GRAFO, GrafoBinario
+from importacao import importar_tardio
+from instrumentacao import medir
+from orquestrador import No, executar
+from permutacao import correlacao_pearson, teste_permutacao
+
+# Bibliotecas pesadas: só são importadas quando uma etapa as usa
+plt = importar_tardio("matplotlib.pyplot")
+matplotlib = importar_tardio("matplotlib")
+nx = importar_tardio("networkx")
+comunidades_nx = importar_tardio("networkx.algorithms.community")
+community_louvain = importar_tardio("community.community_louvain")
+fa2_modified = importar_tardio("fa2_modified")
+stats = importar_tardio("scipy.stats")
+sparse = importar_tardio("scipy.sparse")
+csgraph = importar_tardio("scipy.sparse.csgraph")
+ig = importar_tardio("igraph")
+leidenalg = importar_tardio("leidenalg")
+sns = importar_tardio("seaborn")
+sm = importar_tardio("statsmodels.api")
 
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
@@ -27,6 +39,7 @@ class HiddenPrints:
         sys.stdout.close()
         sys.stdout = self._original_stdout
 
+@medir
 def grafico_bairro_casos(df_bairros, n):
     # Ordenar por número de casos
     df_bairros = df_bairros.sort_values(by="N de casos Total", ascending=False)
@@ -48,6 +61,7 @@ def grafico_bairro_casos(df_bairros, n):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_idade_casos(df_nodes):
     # plotar aas idades de cada caso de acordo com o seu respectivo bairro
     plt.figure(figsize=(10,7))
@@ -66,6 +80,7 @@ def grafico_idade_casos(df_nodes):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_distribuicao_idade(df_divinopolis):
     
     # Converter a coluna de idade para numérica (caso haja valores não numéricos)
@@ -90,6 +105,7 @@ def grafico_distribuicao_idade(df_divinopolis):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_cor_casos(df_nodes):
     df_nodes = df_nodes[df_nodes["Tipo"] == 1]
     # plotar aas cores de cada caso de acordo com o seu respectivo bairro
@@ -108,6 +124,7 @@ def grafico_cor_casos(df_nodes):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_distribuicao_cor(df_divinopolis):
     # Contar a frequência de cada categoria de raça/cor
     raca_cor_counts = df_divinopolis["Raca Cor"].value_counts()
@@ -135,6 +152,7 @@ def grafico_distribuicao_cor(df_divinopolis):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_escolaridade_casos(df_nodes):
     df_nodes = df_nodes[df_nodes["Tipo"] == 1]
     # plotar aas escolaridades de cada caso de acordo com o seu respectivo bairro
@@ -153,6 +171,7 @@ def grafico_escolaridade_casos(df_nodes):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_distribuicao_escolaridade(df_divinopolis):
     # Contar a frequência de cada categoria de escolaridade
     escolaridade_counts = df_divinopolis["Escolaridade"].value_counts()
@@ -180,6 +199,7 @@ def grafico_distribuicao_escolaridade(df_divinopolis):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_classificacao_casos(df_nodes):
     df_nodes = df_nodes[df_nodes["Tipo"] == 1]
     # plotar aas classificacoes de cada caso de acordo com o seu respectivo bairro
@@ -198,6 +218,7 @@ def grafico_classificacao_casos(df_nodes):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_media_idade_casos(df_idade, df_bairros, color_map):
     df_idade = df_idade.reset_index(drop=True)
     df_bairros = df_bairros.reset_index(drop=True)
@@ -272,6 +293,7 @@ def grafico_media_idade_casos(df_idade, df_bairros, color_map):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_media_cor_casos(df_cor, df_nodes, color_map):
     df_cor = df_cor.reset_index(drop=True)
     df_nodes = df_nodes.reset_index(drop=True)
@@ -345,6 +367,7 @@ def grafico_media_cor_casos(df_cor, df_nodes, color_map):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_media_escolaridade_casos(df_escolaridade, df_nodes, color_map):
     df_escolaridade = df_escolaridade.reset_index(drop=True)
     df_nodes = df_nodes.reset_index(drop=True)
@@ -418,6 +441,7 @@ def grafico_media_escolaridade_casos(df_escolaridade, df_nodes, color_map):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_media_classificacao_casos(df_classificacao, df_nodes, color_map):
     df_classificacao = df_classificacao.reset_index(drop=True)
     df_nodes = df_nodes.reset_index(drop=True)
@@ -491,33 +515,41 @@ def grafico_media_classificacao_casos(df_classificacao, df_nodes, color_map):
     plt.close()
     print("Gráfico salvo em", file_path)
 
-def betweenness_centrality(df_nodes, df_edges):
-    # 📌 2. Criar o Grafo
-    G = nx.Graph()
-
-    # Adicionar nós (bairros e casos)
-    for _, row in df_nodes.iterrows():
-        G.add_node(row["ID"], tipo=row["Tipo"])  # Tipo 2 = Bairro, Tipo 1 = Caso
-
-    # Adicionar arestas com pesos
-    for _, row in df_edges.iterrows():
-        G.add_edge(row["Source"], row["Target"], weight=row["Weight"])
-
-    # 📌 3. Calcular a Centralidade Betweenness para os bairros
-    betweenness = nx.betweenness_centrality(G, weight="weight")
+@medir
+def betweenness_centrality(df_nodes, df_edges, modo="folhas", erro=0.01, confianca=0.95, orcamento=None, semente=0):
+    # 📌 2. Grafo com bairros e casos (Tipo 2 = Bairro, Tipo 1 = Caso) e arestas com pesos
+    G = grafo_completo(df_nodes, df_edges)
+
+    # 📌 3. Calcular a Centralidade Betweenness para os bairros: no modo "folhas" os casos entram só
+    # como multiplicidades dos seus bairros (mesmo resultado); no modo "networkx" o grafo todo é usado;
+    # no modo "amostragem" ela é aproximada por pivôs (ver centralidades_amostradas), com o limite do erro
+    erros = None
+    if modo == "folhas":
+        betweenness = betweenness_folhas(df_nodes, df_edges)
+    elif modo == "amostragem":
+        amostragem = centralidades_amostradas(df_nodes, df_edges, erro, confianca, orcamento, semente)
+        betweenness, erros = amostragem["betweenness"], amostragem["erro_betweenness"]
+    elif modo == "networkx":
+        betweenness = nx.betweenness_centrality(G, weight="weight")
+    else:
+        raise ValueError(f"Modo de centralidade desconhecido: {modo}")
 
     # Criar um DataFrame com os resultados apenas para bairros (Tipo 2)
-    bairros_betweenness = pd.DataFrame([
-        {"ID": node, "Bairro": df_nodes.loc[df_nodes["ID"] == node, "Bairro"].values[0], 
-        "Betweenness": betweenness[node]}
-        for node in G.nodes if G.nodes[node]["tipo"] == 2
-    ])
+    bairros = [node for node in G.nodes if G.nodes[node]["tipo"] == 2]
+    bairros_betweenness = pd.DataFrame({
+        "ID": bairros,
+        "Bairro": atributo_nos(df_nodes, df_edges, "Bairro", bairros),
+        "Betweenness": [betweenness[node] for node in bairros],
+    })
+    if erros is not None:
+        bairros_betweenness["Erro Betweenness"] = [erros[node] for node in bairros]
 
     # 📌 4. Salvar ou visualizar os resultados
     file_path = "datasets/output/dados/betweenness/bairros_betweenness.csv"
     bairros_betweenness.to_csv(file_path, index=False)
     print("Centralidade Betweenness salva em", file_path)
 
+@medir
 def grafico_betweenness(df_bairros, n):
     # Ordenar por número de casos
     df_bairros = df_bairros.sort_values(by="Betweenness", ascending=False)
@@ -539,6 +571,7 @@ def grafico_betweenness(df_bairros, n):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_betweenness_casos(df_betweenness, df_bairros):
     # 📌 2. Unir os DataFrames de Betweenness e Número de Casos
     df_betweenness = df_betweenness.merge(df_bairros, how="left", left_on="ID", right_on="ID")
@@ -559,33 +592,39 @@ def grafico_betweenness_casos(df_betweenness, df_bairros):
     plt.close()
     print("Gráfico salvo em", file_path)
 
-def closeness_centrality(df_nodes, df_edges):
-    # 📌 2. Criar o Grafo
-    G = nx.Graph()
-
-    # Adicionar nós (bairros e casos)
-    for _, row in df_nodes.iterrows():
-        G.add_node(row["ID"], tipo=row["Tipo"])  # Tipo 2 = Bairro, Tipo 1 = Caso
-
-    # Adicionar arestas com pesos
-    for _, row in df_edges.iterrows():
-        G.add_edge(row["Source"], row["Target"], weight=row["Weight"])
-
-    # 📌 3. Calcular a Centralidade Closeness para os bairros
-    closeness = nx.closeness_centrality(G, distance="weight")
+@medir
+def closeness_centrality(df_nodes, df_edges, modo="folhas", erro=0.01, confianca=0.95, orcamento=None, semente=0):
+    # 📌 2. Grafo com bairros e casos (Tipo 2 = Bairro, Tipo 1 = Caso) e arestas com pesos
+    G = grafo_completo(df_nodes, df_edges)
+
+    # 📌 3. Calcular a Centralidade Closeness para os bairros (modos como na betweenness)
+    erros = None
+    if modo == "folhas":
+        closeness = closeness_folhas(df_nodes, df_edges)
+    elif modo == "amostragem":
+        amostragem = centralidades_amostradas(df_nodes, df_edges, erro, confianca, orcamento, semente)
+        closeness, erros = amostragem["closeness"], amostragem["erro_closeness"]
+    elif modo == "networkx":
+        closeness = nx.closeness_centrality(G, distance="weight")
+    else:
+        raise ValueError(f"Modo de centralidade desconhecido: {modo}")
 
     # Criar um DataFrame com os resultados apenas para bairros (Tipo 2)
-    bairros_closeness = pd.DataFrame([
-        {"ID": node, "Bairro": df_nodes.loc[df_nodes["ID"] == node, "Bairro"].values[0], 
-        "Closeness": closeness[node]}
-        for node in G.nodes if G.nodes[node]["tipo"] == 2
-    ])
+    bairros = [node for node in G.nodes if G.nodes[node]["tipo"] == 2]
+    bairros_closeness = pd.DataFrame({
+        "ID": bairros,
+        "Bairro": atributo_nos(df_nodes, df_edges, "Bairro", bairros),
+        "Closeness": [closeness[node] for node in bairros],
+    })
+    if erros is not None:
+        bairros_closeness["Erro Closeness"] = [erros[node] for node in bairros]
 
     # 📌 4. Salvar ou visualizar os resultados
     file_path = "datasets/output/dados/closeness/bairros_closeness.csv"
     bairros_closeness.to_csv(file_path, index=False)
     print("Centralidade Closeness salva em", file_path)
 
+@medir
 def grafico_closeness(df_bairros, n):
     # Ordenar por número de casos
     df_bairros = df_bairros.sort_values(by="Closeness", ascending=False)
@@ -607,6 +646,7 @@ def grafico_closeness(df_bairros, n):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_closeness_casos(df_closeness, df_bairros):
     # 📌 2. Unir os DataFrames de Closeness e Número de Casos
     df_closeness = df_closeness.merge(df_bairros, how="left", left_on="ID", right_on="ID")
@@ -627,65 +667,56 @@ def grafico_closeness_casos(df_closeness, df_bairros):
     plt.close()
     print("Gráfico salvo em", file_path)
 
-def calcular_morans_i(df_nodes, df_edges):
-    # 📌 2. Criar o Grafo de bairros
-    G = nx.Graph()
-
-    # Adicionar nós (apenas bairros)
-    for _, row in df_nodes.iterrows():
-        if row["Tipo"] == 2:  # Tipo 2 = Bairro
-            G.add_node(row["ID"], casos=row["N de casos Total"])
-
-    # Adicionar arestas (apenas conexões entre bairros, peso 2)
-    for _, row in df_edges.iterrows():
-        if row["Weight"] == 2:
-            G.add_edge(row["Source"], row["Target"])
-
-    # 📌 3. Criar a matriz de adjacência normalizada
-    matriz_adj = nx.to_numpy_array(G, nodelist=sorted(G.nodes()))  # Matriz de vizinhança
-    matriz_pesos = matriz_adj / matriz_adj.sum(axis=1, keepdims=True)  # Normaliza pelos vizinhos
-
-    # 📌 4. Criar vetor de casos de violência
-    casos = np.array([G.nodes[n]["casos"] for n in sorted(G.nodes())])
-
-    # 📌 5. Calcular Moran's I
-    N = len(casos)
-    media_casos = np.mean(casos)
-
-    numerador = 0
-    for i in range(N):
-        for j in range(N):
-            numerador += matriz_pesos[i, j] * (casos[i] - media_casos) * (casos[j] - media_casos)
-
-    denominador = np.sum((casos - media_casos) ** 2)
-
-    morans_i = (N / matriz_pesos.sum()) * (numerador / denominador)
-
-    print(f"Moran’s I calculado: {morans_i:.4f}")
-    
-    if morans_i > 0.6:
-        print("Autocorrelação espacial positiva e significativa.")
-    elif morans_i > 0 and morans_i < 0.6:
-        print("Autocorrelação espacial positiva, mas não significativa.")
-    elif morans_i < 0:
-        print("Autocorrelação espacial negativa, ou seja os bairros com mais casos estão rodeados por bairros com menos casos.")
-
+@medir
+def calcular_morans_i(df_nodes, df_edges, n_permutacoes=999, semente=0, significancia=0.05, processos=1):
+    # 📌 2. Grafo de bairros (apenas conexões entre bairros, peso 2)
+    G = projecao_bairros(df_nodes, df_edges)
+    bairros = list(G.nodes)
+
+    # 📌 3. Matriz de vizinhança esparsa padronizada por linha (bairros sem vizinhos ficam zerados)
+    origem, destino = zip(*G.edges) if G.number_of_edges() else ((), ())
+    pesos = matriz_pesos(bairros, list(origem), list(destino))
+
+    # 📌 4. Vetor de casos de violência
+    casos_bairros = [G.nodes[n]["casos"] for n in bairros]
+    casos = np.array(casos_bairros, dtype=float)
+
+    # 📌 5. Moran's I global com o p-valor das permutações
+    semente_global, semente_local = np.random.SeedSequence(semente).spawn(2)
+    morans_i, esperado, z_morans, p_valor, feitas = moran_global(casos, pesos, n_permutacoes, semente_global, processos,
+                                                                 significancia)
+    print(f"Moran’s I calculado: {morans_i:.4f} (esperado sem autocorrelação: {esperado:.4f}, z = {z_morans:.2f}, "
+          f"p-valor com {feitas} permutações: {p_valor:.4f})")
+
+    if p_valor >= significancia:
+        print("Autocorrelação espacial não significativa.")
+    elif morans_i > esperado:
+        print("Autocorrelação espacial positiva e significativa: bairros com muitos casos ficam perto de bairros com muitos casos.")
+    else:
+        print("Autocorrelação espacial negativa e significativa, ou seja os bairros com mais casos estão rodeados por bairros com menos casos.")
+
+    # 📌 6. Moran local (LISA): bairros quentes (HH), frios (LL) e discrepantes (HL, LH)
+    bairros_lisa = pd.DataFrame({
+        "ID": bairros,
+        "Bairro": [G.nodes[n]["bairro"] for n in bairros],
+        "Casos": casos_bairros,
+    })
+    rng = np.random.default_rng(semente_local)
+    bairros_lisa = pd.concat([bairros_lisa, moran_local(casos, pesos, n_permutacoes, rng, significancia)], axis=1)
+
+    file_path = CAMINHO_LISA
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    bairros_lisa.to_csv(file_path, index=False)
+    print("Moran local salvo em", file_path)
+    print(bairros_lisa["Cluster"].value_counts().to_string())
+
+@medir
 def calcular_pagerank(df_nodes, df_edges, damping=0.85, max_iter=100, tol=1e-6):
-    # 📌 2. Criar o Grafo de bairros
-    G = nx.Graph()
-
-    # Adicionar nós (somente bairros)
-    for _, row in df_nodes.iterrows():
-        if row["Tipo"] == 2:  # Tipo 2 = Bairro
-            G.add_node(row["ID"], bairro=row["Bairro"])
+    # 📌 2. Grafo de bairros (somente conexões entre bairros, peso 2)
+    G = projecao_bairros(df_nodes, df_edges)
 
-    # Adicionar arestas (somente conexões entre bairros, peso 2)
-    for _, row in df_edges.iterrows():
-        if row["Weight"] == 2:
-            G.add_edge(row["Source"], row["Target"])
-
-    # 📌 3. Calcular PageRank
-    pagerank = nx.pagerank(G, alpha=damping, max_iter=max_iter, tol=tol)
+    # 📌 3. Calcular PageRank (sem pesos: todas as divisas valem o mesmo)
+    pagerank = nx.pagerank(G, alpha=damping, max_iter=max_iter, tol=tol, weight=None)
 
     # Criar um DataFrame com os resultados
     pagerank_df = pd.DataFrame([
@@ -698,6 +729,7 @@ def calcular_pagerank(df_nodes, df_edges, damping=0.85, max_iter=100, tol=1e-6):
     pagerank_df.to_csv(file_path, index=False)
     print(f"PageRank calculado e salvo em: {file_path}")
 
+@medir
 def grafico_pagerank(df_pagerank, n):
     # Ordenar por PageRank
     df_pagerank = df_pagerank.sort_values(by="PageRank", ascending=False)
@@ -719,6 +751,7 @@ def grafico_pagerank(df_pagerank, n):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_pagerank_casos(df_pagerank, df_bairros):
     # 📌 2. Unir os DataFrames de PageRank e Número de Casos
     df_pagerank = df_pagerank.merge(df_bairros, how="left", left_on="ID", right_on="ID")
@@ -739,26 +772,17 @@ def grafico_pagerank_casos(df_pagerank, df_bairros):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def pearson_correlation_coefficient(df_nodes, df_edges):
-    # 📌 1. Criar o Grafo
-    G = nx.Graph()
-
-    # Adicionar nós (bairros apenas)
-    for _, row in df_nodes.iterrows():
-        if row["Tipo"] == 2:  # Apenas bairros
-            G.add_node(row["ID"], tipo="bairro", casos=row["N de casos Total"])
-
-    # Adicionar arestas (somente entre bairros - peso 2)
-    for _, row in df_edges.iterrows():
-        if row["Weight"] == 2:
-            G.add_edge(row["Source"], row["Target"], weight=row["Weight"])
+    # 📌 1. Grafo de bairros (somente arestas entre bairros - peso 2)
+    G = projecao_bairros(df_nodes, df_edges)
 
     # 📌 2. Criar um dicionário para armazenar a média de casos dos vizinhos
     media_casos_vizinhos = {}
     desvio_casos_vizinhos = {}
 
     for bairro in G.nodes:
-        vizinhos = [n for n in G.neighbors(bairro) if G.nodes[n]["tipo"] == "bairro"]
+        vizinhos = list(G.neighbors(bairro))
         if vizinhos:
             casos_vizinhos = [G.nodes[v]["casos"] for v in vizinhos]
             media_casos_vizinhos[bairro] = np.mean(casos_vizinhos)
@@ -770,7 +794,7 @@ def pearson_correlation_coefficient(df_nodes, df_edges):
     # Criar um DataFrame com os resultados individuais por bairro
     bairros_df = pd.DataFrame([
         {"ID": bairro, 
-         "Bairro": df_nodes.loc[df_nodes["ID"] == bairro, "Bairro"].values[0],
+         "Bairro": G.nodes[bairro]["bairro"],
          "Casos": G.nodes[bairro]["casos"], 
          "Media Casos Vizinhos": media_casos_vizinhos[bairro],
          "Desvio Casos Vizinhos": desvio_casos_vizinhos[bairro],
@@ -785,6 +809,7 @@ def pearson_correlation_coefficient(df_nodes, df_edges):
     bairros_df.to_csv(file_path, index=False)
     print("Assortatividade salva em", file_path)
 
+@medir
 def grafico_assortatividade(df_bairros, n):
     # Ordenar por diferença percentual
     df_bairros = df_bairros.sort_values(by="Diferenca Percentual", ascending=False)
@@ -806,6 +831,7 @@ def grafico_assortatividade(df_bairros, n):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_assortatividade_casos(df_assortatividade):
     # 📌 3. Criar o gráfico de dispersão
     plt.figure(figsize=(8, 8))
@@ -823,6 +849,7 @@ def grafico_assortatividade_casos(df_assortatividade):
     plt.close()
     print("Gráfico salvo em", file_path)
 
+@medir
 def calcular_pvalor_assortatividade(df_assortatividade):
     """
     Lê a correlação de Pearson já calculada e salva no arquivo bairros_assortatividade.csv,
@@ -839,65 +866,53 @@ def calcular_pvalor_assortatividade(df_assortatividade):
     media_casos_vizinhos = df_assortatividade["Media Casos Vizinhos"].values
 
     # 📌 2. Calcular a correlação de Pearson e o p-valor
-    correlacao, p_valor = pearsonr(casos_bairros, media_casos_vizinhos)
+    correlacao, p_valor = stats.pearsonr(casos_bairros, media_casos_vizinhos)
     
     return correlacao, p_valor
 
-def teste_permutacao_assortatividade(df_assortatividade, n_permutacoes=1000):
+@medir
+def teste_permutacao_assortatividade(df_assortatividade, n_permutacoes=1000, semente=0, processos=1):
     """
     Testa se a correlação observada entre os casos nos bairros e seus vizinhos é estatisticamente significativa
-    usando um teste de permutação.
+    usando um teste de permutação (permutacao.teste_permutacao: as permutações são avaliadas em blocos, podem
+    ser divididas entre processos e o teste para antes quando a significância já está decidida).
 
     Parâmetros:
     - df_assortatividade: DataFrame contendo os valores já calculados.
-    - n_permutacoes: número de permutações para o teste.
+    - n_permutacoes: número máximo de permutações para o teste.
+    - semente: semente das permutações.
+    - processos: número de processos que dividem as permutações.
 
     Retorno:
     - p-valor da permutação.
     """
-    # 📌 1. Obter a correlação real já calculada
-    correlacao_real, _ = calcular_pvalor_assortatividade(df_assortatividade)
-
-    # 📌 2. Teste de Permutação
-    permutacoes = []
-    
-    for _ in range(n_permutacoes):
-        # Embaralhar os valores dos casos entr  e os bairros
-        casos_embaralhados = np.random.permutation(df_assortatividade["Casos"].values)
-
-        # Calcular a correlação de Pearson na permutação
-        permutacao_corr, _ = pearsonr(casos_embaralhados, df_assortatividade["Media Casos Vizinhos"].values)
-        permutacoes.append(permutacao_corr)
-
-    # 📌 3. Calcular p-valor da permutação
-    p_valor_perm = np.sum(np.abs(permutacoes) >= np.abs(correlacao_real)) / n_permutacoes
-
-    print(f"P-valor do teste de permutação: {p_valor_perm:.4f}")
-
-    # 📌 4. Interpretar o resultado
+    # 📌 1. Embaralhar os casos entre os bairros e recalcular a correlação de Pearson com a média dos vizinhos
+    teste = teste_permutacao(correlacao_pearson, df_assortatividade["Casos"].values,
+                             (df_assortatividade["Media Casos Vizinhos"].values,), n_permutacoes,
+                             semente=semente, processos=processos)
+
+    # 📌 2. p-valor da permutação (|correlação| pelo menos tão grande quanto a real)
+    p_valor_perm = teste["p_valor"]
+    inferior, superior = teste["intervalo"]
+    print(f"P-valor do teste de permutação: {p_valor_perm:.4f} ({teste['permutacoes']} permutações, "
+          f"intervalo de 99%: {inferior:.4f} a {superior:.4f})")
+
+    # 📌 3. Interpretar o resultado
     if p_valor_perm < 0.05:
         print("A correlação é estatisticamente significativa com o teste de permutação (p < 0.05).")
     else:
         print("A correlação NÃO é estatisticamente significativa com o teste de permutação (p >= 0.05).")
+    return p_valor_perm
 
+@medir
 def detectar_comunidades(df_nodes, df_edges):
-    # 📌 1. Criar o Grafo
-    G = nx.Graph()
-
-    # Adicionar nós (bairros apenas)
-    for _, row in df_nodes.iterrows():
-        if row["Tipo"] == 2:  # Apenas bairros
-            G.add_node(row["ID"], tipo="bairro", bairro=row["Bairro"])
-
-    # Adicionar arestas (somente entre bairros - peso 2)
-    for _, row in df_edges.iterrows():
-        if row["Weight"] == 2:
-            G.add_edge(row["Source"], row["Target"], weight=row["Weight"])
+    # 📌 1. Grafo de bairros (somente arestas entre bairros - peso 2)
+    G = projecao_bairros(df_nodes, df_edges)
 
     # 📌 2. Aplicar diferentes métodos de detecção de comunidade
 
     ## 2.1 Girvan-Newman (Baseado em remoção de arestas)
-    comp_gn = girvan_newman(G)  # Agora chamando do lugar correto
+    comp_gn = comunidades_nx.girvan_newman(G)  # Agora chamando do lugar correto
     first_level_gn = next(comp_gn, None)
     if first_level_gn:
         communities_gn = {node: i for i, community in enumerate(first_level_gn) for node in community}
@@ -909,7 +924,7 @@ def detectar_comunidades(df_nodes, df_edges):
     partition_louvain = community_louvain.best_partition(G)
     
     ## 2.3 Label Propagation (Baseado em propagação de rótulos)
-    communities_lp = {node: i for i, community in enumerate(asyn_lpa_communities(G)) for node in community}
+    communities_lp = {node: i for i, community in enumerate(comunidades_nx.asyn_lpa_communities(G)) for node in community}
 
     ## 2.4 Leiden (Baseado em modularidade, similar ao Louvain, mas mais eficiente)
     # Converter NetworkX para iGraph (Leiden precisa dessa estrutura)
@@ -925,7 +940,7 @@ def detectar_comunidades(df_nodes, df_edges):
     node_mapping = {i: nodes_list[i] for i in range(len(nodes_list))}
 
     # Aplicar Leiden
-    partition_leiden = find_partition(ig_G, ModularityVertexPartition)
+    partition_leiden = leidenalg.find_partition(ig_G, leidenalg.ModularityVertexPartition)
 
     # Converter as comunidades do Leiden de volta para os IDs originais
     communities_leiden = {node_mapping[node]: i for i, community in enumerate(partition_leiden) for node in community}
@@ -948,54 +963,358 @@ def detectar_comunidades(df_nodes, df_edges):
     comunidades_df.to_csv(file_path, index=False)
     print("Comunidades salvas em", file_path)
 
-def grafo_por_comunidade(df_nodes, df_edges, df_communities, name):
-    # 📌 2. Criar o Grafo Geral
-    G = nx.Graph()
+# Grafos já construídos para cada par de tabelas de nós e arestas (ver _grafos)
+_GRAFOS = {}
 
-    # Criar um dicionário para armazenar o número de casos de cada bairro
-    casos_por_bairro = {row["ID"]: row["N de casos Total"] for _, row in df_nodes.iterrows() if row["Tipo"] == 2}
-
-    # Normalizar o tamanho dos nós (evita valores muito grandes ou pequenos)
-    min_size = 50   # Tamanho mínimo do nó
-    max_size = 2000  # Tamanho máximo do nó
-
-    if casos_por_bairro:
-        max_casos = max(casos_por_bairro.values())
-        min_casos = min(casos_por_bairro.values())
-
-        # Ajustar tamanho proporcional (evitar divisão por zero)
-        tamanho_nos = {
-            node: min_size + ((casos - min_casos) / (max_casos - min_casos + 1e-6)) * (max_size - min_size)
-            for node, casos in casos_por_bairro.items()
-        }
-    else:
-        tamanho_nos = {node: min_size for node in G.nodes()}  # Caso não haja dados
-
-    # Adicionar nós ao grafo
-    for _, row in df_nodes.iterrows():
-        if row["Tipo"] == 2:  # Apenas bairros
-            G.add_node(row["ID"], bairro=row["Bairro"])
-
-    # Adicionar arestas (somente entre bairros - peso 2)
-    for _, row in df_edges.iterrows():
-        if row["Weight"] == 2:
-            G.add_edge(row["Source"], row["Target"])
-
-    # 📌 3. Mapear comunidades Girvan-Newman
+def _grafos(df_nodes, df_edges):
+    """
+    Entrada do cache para o par de tabelas: os grafos construídos a partir delas e o índice ID -> linha
+    dos nós. As próprias tabelas ficam guardadas, para que os seus id() não sejam reaproveitados.
+    """
+    chave = (id(df_nodes), id(df_edges))
+    if chave not in _GRAFOS:
+        if len(_GRAFOS) >= 4:
+            _GRAFOS.pop(next(iter(_GRAFOS)))
+        _GRAFOS[chave] = {"tabelas": (df_nodes, df_edges), "indice": pd.Index(df_nodes["ID"])}
+    return _GRAFOS[chave]
+
+def atributo_nos(df_nodes, df_edges, coluna, ids):
+    # valores da coluna para os nós com esses IDs, pelo índice ID -> linha (sem varrer a tabela)
+    linhas = _grafos(df_nodes, df_edges)["indice"].get_indexer(ids)
+    return df_nodes[coluna].to_numpy()[linhas]
+
+@medir
+def grafo_completo(df_nodes, df_edges):
+    """
+    Grafo com bairros e casos (atributo tipo) e todas as arestas com peso, na ordem das tabelas.
+    É construído uma vez para cada par de tabelas e reaproveitado pelas métricas: não deve ser alterado.
+    """
+    cache = _grafos(df_nodes, df_edges)
+    if "completo" not in cache:
+        G = nx.Graph()
+        G.add_nodes_from(zip(df_nodes["ID"].tolist(), ({"tipo": tipo} for tipo in df_nodes["Tipo"].tolist())))
+        G.add_weighted_edges_from(zip(df_edges["Source"].tolist(), df_edges["Target"].tolist(), df_edges["Weight"].tolist()))
+        cache["completo"] = G
+    return cache["completo"]
+
+@medir
+def projecao_bairros(df_nodes, df_edges):
+    """
+    Grafo só com os bairros (Tipo 2, com os atributos bairro e casos) e as divisas entre eles (arestas
+    de peso 2), na ordem das tabelas. Também é compartilhado: para alterar, use grafo_bairros.
+    """
+    cache = _grafos(df_nodes, df_edges)
+    if "bairros" not in cache:
+        bairros = df_nodes[df_nodes["Tipo"] == 2]
+        divisas = df_edges[df_edges["Weight"] == 2]
+        atributos = ({"bairro": bairro, "casos": casos}
+                     for bairro, casos in zip(bairros["Bairro"].tolist(), bairros["N de casos Total"].tolist()))
+        G = nx.Graph()
+        G.add_nodes_from(zip(bairros["ID"].tolist(), atributos))
+        G.add_weighted_edges_from(zip(divisas["Source"].tolist(), divisas["Target"].tolist(), divisas["Weight"].tolist()))
+        cache["bairros"] = G
+    return cache["bairros"]
+
+def grafo_bairros(df_nodes, df_edges):
+    # cópia do grafo de bairros, para quem remove nós dele (ex.: filtrar_comunidades)
+    return projecao_bairros(df_nodes, df_edges).copy()
+
+@medir
+def comprimir_folhas(df_nodes, df_edges):
+    """
+    Grafo completo sem os casos folha (Tipo 1, grau 1, ligados a um nó que não é caso): cada nó que
+    sobra (o núcleo, praticamente só os bairros) guarda quantas folhas tinha e a soma dos pesos das
+    arestas até elas. Nenhum caminho mínimo passa por uma folha, então as centralidades do grafo
+    completo saem do núcleo somando a contribuição das folhas (ver betweenness_folhas e closeness_folhas).
+    """
+    cache = _grafos(df_nodes, df_edges)
+    if "folhas" not in cache:
+        G = grafo_completo(df_nodes, df_edges)
+        tipos = nx.get_node_attributes(G, "tipo")
+
+        folhas = {}
+        for no, vizinhos in G.adj.items():
+            if tipos.get(no) == 1 and len(vizinhos) == 1:
+                vizinho, atributos = next(iter(vizinhos.items()))
+                if vizinho != no and tipos.get(vizinho) != 1:
+                    folhas[no] = (vizinho, atributos.get("weight", 1))
+
+        nucleo = [no for no in G if no not in folhas]
+        posicoes = {no: i for i, no in enumerate(nucleo)}
+        multiplicidade = np.zeros(len(nucleo))
+        peso_folhas = np.zeros(len(nucleo))
+        for vizinho, peso in folhas.values():
+            multiplicidade[posicoes[vizinho]] += 1
+            peso_folhas[posicoes[vizinho]] += peso
+
+        # adjacência do núcleo por posição, na ordem do grafo completo, também como matriz esparsa
+        adjacencia = [[(posicoes[vizinho], atributos.get("weight", 1)) for vizinho, atributos in G.adj[no].items()
+                       if vizinho not in folhas] for no in nucleo]
+        linhas = [i for i, vizinhos in enumerate(adjacencia) for _ in vizinhos]
+        colunas = [j for vizinhos in adjacencia for j, _ in vizinhos]
+        pesos = [peso for vizinhos in adjacencia for _, peso in vizinhos]
+        matriz = sparse.csr_matrix((pesos, (linhas, colunas)), shape=(len(nucleo), len(nucleo)))
+
+        # menor peso de aresta do grafo completo (sem os laços), a menor distância entre dois nós
+        peso_minimo = min((peso for u, v, peso in G.edges(data="weight", default=1) if u != v), default=1)
+        cache["folhas"] = {"nucleo": nucleo, "adjacencia": adjacencia, "matriz": matriz, "multiplicidade": multiplicidade,
+                           "peso_folhas": peso_folhas, "peso_minimo": peso_minimo, "n_nos": len(G)}
+    return cache["folhas"]
+
+def _dependencias(adjacencia, grupo, origem):
+    """
+    Dijkstra a partir de `origem` contando os caminhos mínimos (como no Brandes do networkx) e acumulando
+    as dependências com cada nó valendo `grupo` destinos (ele e as suas folhas).
+    Devolve os nós alcançados (em ordem de distância), a dependência e a distância de cada um.
+    """
+    ordem, antecessores, sigma, distancia = [], {}, {origem: 1.0}, {}
+    vistos = {origem: 0}
+    fila = [(0, 0, origem, origem)]
+    contador = 1
+    while fila:
+        dist, _, antecessor, v = heapq.heappop(fila)
+        if v in distancia:
+            continue
+        if v != origem:
+            sigma[v] += sigma[antecessor]
+        ordem.append(v)
+        distancia[v] = dist
+        for w, peso in adjacencia[v]:
+            dist_w = dist + peso
+            if w not in distancia and (w not in vistos or dist_w < vistos[w]):
+                vistos[w] = dist_w
+                heapq.heappush(fila, (dist_w, contador, v, w))
+                contador += 1
+                sigma[w] = 0.0
+                antecessores[w] = [v]
+            elif dist_w == vistos.get(w):
+                sigma[w] += sigma[v]
+                antecessores[w].append(v)
+
+    delta = dict.fromkeys(ordem, 0.0)
+    for w in reversed(ordem):
+        coeficiente = (grupo[w] + delta[w]) / sigma[w]
+        for v in antecessores.get(w, ()):
+            delta[v] += sigma[v] * coeficiente
+    return ordem, delta, distancia
+
+def _pares_folhas(componente, multiplicidade):
+    # pares ordenados (s, t) do componente, sem o próprio nó, com s ou t entre as suas folhas:
+    # todos os caminhos entre eles passam pelo nó
+    outros = componente - 1
+    return outros * (outros - 1) - (outros - multiplicidade) * (outros - multiplicidade - 1)
+
+@medir
+def betweenness_folhas(df_nodes, df_edges):
+    """
+    Betweenness normalizada do grafo completo (igual a nx.betweenness_centrality com weight="weight")
+    calculada só no núcleo de comprimir_folhas. Os pares entre grupos (um nó do núcleo e as suas folhas)
+    entram no Brandes com peso: origem e destino valem o tamanho dos seus grupos. Todo caminho que sai
+    ou chega em uma folha passa pelo seu nó, que ganha esses pares inteiros.
+    """
+    compressao = comprimir_folhas(df_nodes, df_edges)
+    adjacencia, multiplicidade = compressao["adjacencia"], compressao["multiplicidade"]
+    grupo = 1 + multiplicidade
+    n = compressao["n_nos"]
+
+    betweenness = np.zeros(len(grupo))
+    componente = np.zeros(len(grupo))
+    for origem in range(len(grupo)):
+        ordem, delta, _ = _dependencias(adjacencia, grupo, origem)
+        for w in ordem:
+            if w != origem:
+                betweenness[w] += grupo[origem] * delta[w]
+        # nós do grafo completo no componente da origem
+        componente[origem] = grupo[ordem].sum()
+
+    betweenness += _pares_folhas(componente, multiplicidade)
+
+    # normalização do networkx: pares ordenados (s, t) que podem passar por um nó
+    if n > 2:
+        betweenness *= 1 / ((n - 1) * (n - 2))
+    return dict(zip(compressao["nucleo"], betweenness.tolist()))
+
+@medir
+def closeness_folhas(df_nodes, df_edges, tamanho_bloco=1000):
+    """
+    Closeness do grafo completo (igual a nx.closeness_centrality com distance="weight") para os nós do
+    núcleo de comprimir_folhas: a distância até uma folha é a distância até o seu nó mais o peso da
+    aresta dela. As distâncias do núcleo são calculadas em blocos de origens pelo Dijkstra do scipy.
+    """
+    compressao = comprimir_folhas(df_nodes, df_edges)
+    grupo = 1 + compressao["multiplicidade"]
+    peso_folhas = compressao["peso_folhas"]
+    n = compressao["n_nos"]
+    n_nucleo = len(grupo)
+
+    closeness = np.zeros(n_nucleo)
+    for inicio in range(0, n_nucleo, tamanho_bloco):
+        origens = np.arange(inicio, min(inicio + tamanho_bloco, n_nucleo))
+        distancias = csgraph.dijkstra(compressao["matriz"], directed=True, indices=origens)
+        alcancados = np.isfinite(distancias)
+        # soma das distâncias até os nós do núcleo (cada um com as suas folhas) e nós alcançados
+        total = np.where(alcancados, distancias, 0) @ grupo + alcancados @ peso_folhas
+        alcancaveis = alcancados @ grupo
+
+        bloco = np.zeros(len(origens))
+        validos = (total > 0) & (n > 1)
+        bloco[validos] = (alcancaveis[validos] - 1.0) / total[validos]
+        bloco[validos] *= (alcancaveis[validos] - 1.0) / (n - 1)
+        closeness[origens] = bloco
+    return dict(zip(compressao["nucleo"], closeness.tolist()))
+
+def _limite_media(soma, soma_quadrados, k, alcance, n_nos, falha):
+    """
+    Meia largura do intervalo de confiança da média de k amostras de cada nó, com valores em [0, alcance]:
+    o menor entre o de Hoeffding e o de Bernstein empírico (que usa a variância das amostras e é bem mais
+    estreito para os nós com pouca variação), cada um com metade da falha. Vale ao mesmo tempo para os
+    n_nos nós e para todo k (a falha de cada k é falha / (k (k + 1)), que somam falha), então a
+    amostragem pode parar em qualquer k.
+    """
+    log = np.log(2 * n_nos * k * (k + 1) / falha)
+    hoeffding = alcance * np.sqrt((log + np.log(2)) / (2 * k))
+    if k < 2:
+        # um limite por nó, mesmo com alcance escalar
+        return np.full_like(soma, hoeffding, dtype=float)
+    variancia = np.maximum(soma_quadrados - soma ** 2 / k, 0) / (k - 1)
+    bernstein = np.sqrt(2 * variancia * (log + np.log(4)) / k) + 7 * alcance * (log + np.log(4)) / (3 * (k - 1))
+    return np.minimum(hoeffding, bernstein)
+
+@medir
+def centralidades_amostradas(df_nodes, df_edges, erro=0.01, confianca=0.95, orcamento=None, semente=0):
+    """
+    Betweenness e closeness aproximadas do grafo completo por amostragem de pivôs: nós do grafo completo
+    sorteados com reposição (com a semente), cada um entrando pelo seu nó do núcleo de comprimir_folhas.
+    Cada pivô é um Dijkstra, que atualiza as duas estimativas e os seus limites de erro (com probabilidade
+    `confianca`, todos os erros ficam abaixo dos limites). A amostragem para quando o maior limite fica
+    abaixo de `erro` ou quando passa de `orcamento` segundos. Como tantos pivôs quanto nós no núcleo custam o
+    mesmo que o cálculo exato, calcula as centralidades exatas (erro 0) quando a amostragem chega a esse número
+    de pivôs ou, se o erro não puder ser atingido antes dele, quando o orçamento restante cobre esses pivôs.
+    Devolve, para cada métrica, os valores e os limites de erro de cada nó do núcleo.
+    """
+    if erro is None and orcamento is None:
+        raise ValueError("Informe o erro máximo ou o orçamento de tempo da amostragem")
+    chave = ("amostragem", erro, confianca, orcamento, semente)
+    cache = _grafos(df_nodes, df_edges)
+    if chave in cache:
+        return cache[chave]
+
+    compressao = comprimir_folhas(df_nodes, df_edges)
+    nucleo, adjacencia, multiplicidade = compressao["nucleo"], compressao["adjacencia"], compressao["multiplicidade"]
+    grupo = 1 + multiplicidade
+    media_folhas = compressao["peso_folhas"] / grupo
+    n = compressao["n_nos"]
+    n_nucleo = len(grupo)
+    # a falha permitida é dividida entre as duas métricas
+    falha = (1 - confianca) / 2
+    # cada amostra da betweenness normalizada é escala * dependência, em [0, n / (n - 1)]
+    escala = n / ((n - 1) * (n - 2)) if n > 2 else 0.0
+    alcance_betweenness = n / (n - 1) if n > 2 else 0.0
+
+    def exatas():
+        betweenness, closeness = betweenness_folhas(df_nodes, df_edges), closeness_folhas(df_nodes, df_edges)
+        zeros = dict.fromkeys(nucleo, 0.0)
+        return {"betweenness": betweenness, "erro_betweenness": zeros, "closeness": closeness,
+                "erro_closeness": zeros, "pivos": n_nucleo}
+
+    # nem sem variância nenhuma o limite de Bernstein chegaria ao erro com n_nucleo pivôs
+    melhor_limite = _limite_media(np.zeros(1), np.zeros(1), n_nucleo, alcance_betweenness, n_nucleo, falha)[0]
+    inalcancavel = erro is None or melhor_limite > erro
+    if orcamento is None and inalcancavel:
+        print("O erro pedido precisa de mais pivôs do que nós no núcleo: centralidades exatas")
+        cache[chave] = exatas()
+        return cache[chave]
+
+    # componentes do núcleo: o número de nós alcançáveis de cada nó é exato
+    n_componentes, rotulos = csgraph.connected_components(compressao["matriz"], directed=True, connection="weak")
+    alcancaveis = np.bincount(rotulos, weights=grupo, minlength=n_componentes)[rotulos]
+    pares_folhas = _pares_folhas(alcancaveis, multiplicidade)
+    maior_media_folhas = np.zeros(n_componentes)
+    np.maximum.at(maior_media_folhas, rotulos, media_folhas)
+    # menor excentricidade dos pivôs de cada componente: as distâncias nele são no máximo o dobro dela
+    excentricidade = np.full(n_componentes, np.inf)
+    minimo = (alcancaveis - 1) * max(compressao["peso_minimo"], 0)
+
+    def fechamento(total):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            valores = (alcancaveis - 1.0) ** 2 / ((n - 1) * total) if n > 1 else np.zeros(n_nucleo)
+        return np.where(alcancaveis > 1, valores, 0.0)
+
+    def estimativas(k):
+        limite = _limite_media(escala * soma_dependencias, escala ** 2 * quadrados_dependencias, k,
+                               alcance_betweenness, n_nucleo, falha)
+        betweenness = (n * soma_dependencias / k + pares_folhas) / ((n - 1) * (n - 2)) if n > 2 else np.zeros(n_nucleo)
+
+        # soma das distâncias até os nós do componente: cada amostra é n (distância até o pivô), em
+        # [0, n (diâmetro + peso médio das folhas)], e a closeness é uma função decrescente dela
+        alcance = n * (2 * excentricidade + maior_media_folhas)[rotulos]
+        largura = _limite_media(n * soma_distancias, n ** 2 * quadrados_distancias, k, alcance, n_nucleo, falha)
+        soma = np.maximum(n * soma_distancias / k, minimo)
+        closeness = fechamento(soma)
+        erro_closeness = np.maximum(fechamento(np.maximum(soma - largura, minimo)) - closeness,
+                                    closeness - fechamento(soma + largura))
+        return betweenness, limite, closeness, erro_closeness
+
+    rng = np.random.default_rng(semente)
+    probabilidades = grupo / grupo.sum()
+    soma_dependencias, quadrados_dependencias = np.zeros(n_nucleo), np.zeros(n_nucleo)
+    soma_distancias, quadrados_distancias = np.zeros(n_nucleo), np.zeros(n_nucleo)
+    pivos = []
+    inicio = time.perf_counter()
+    k = 0
+    while True:
+        if not pivos:
+            pivos = rng.choice(n_nucleo, size=1024, p=probabilidades).tolist()[::-1]
+        pivo = pivos.pop()
+        ordem, delta, distancia = _dependencias(adjacencia, grupo, pivo)
+        alcancados = np.fromiter(ordem, dtype=np.int64, count=len(ordem))
+        dependencias = np.fromiter((delta[w] for w in ordem), dtype=float, count=len(ordem))
+        dependencias[alcancados == pivo] = 0.0
+        soma_dependencias[alcancados] += dependencias
+        quadrados_dependencias[alcancados] += dependencias ** 2
+        # um pivô folha está à distância do seu nó mais o peso da sua aresta (em média no grupo)
+        distancias = np.fromiter((distancia[w] for w in ordem), dtype=float, count=len(ordem)) + media_folhas[pivo]
+        soma_distancias[alcancados] += distancias
+        quadrados_distancias[alcancados] += distancias ** 2
+        excentricidade[rotulos[pivo]] = min(excentricidade[rotulos[pivo]], distancias.max() - media_folhas[pivo])
+        k += 1
+
+        decorrido = time.perf_counter() - inicio
+        if orcamento is not None and decorrido >= orcamento:
+            break
+        if erro is not None and k % 16 == 0:
+            _, limite, _, erro_closeness = estimativas(k)
+            if max(limite.max(), erro_closeness.max()) <= erro:
+                break
+        if k >= n_nucleo:
+            print("A amostragem chegou ao número de nós do núcleo sem atingir o erro: centralidades exatas")
+            cache[chave] = exatas()
+            return cache[chave]
+        # pelo tempo médio dos pivôs até aqui, o orçamento restante cobre um pivô por nó do núcleo
+        if orcamento is not None and inalcancavel and k % 16 == 0 and decorrido / k * n_nucleo <= orcamento - decorrido:
+            print("O orçamento cobre tantos pivôs quanto nós no núcleo: centralidades exatas")
+            cache[chave] = exatas()
+            return cache[chave]
+
+    betweenness, erro_betweenness, closeness, erro_closeness = estimativas(k)
+    print(f"Centralidades aproximadas com {k} pivôs ({n_nucleo} nós no núcleo): erro máximo "
+          f"{erro_betweenness.max():.2e} na betweenness e {erro_closeness.max():.2e} na closeness")
+    cache[chave] = {"betweenness": dict(zip(nucleo, betweenness.tolist())),
+                    "erro_betweenness": dict(zip(nucleo, erro_betweenness.tolist())),
+                    "closeness": dict(zip(nucleo, closeness.tolist())),
+                    "erro_closeness": dict(zip(nucleo, erro_closeness.tolist())), "pivos": k}
+    return cache[chave]
+
+@medir
+def filtrar_comunidades(G, df_communities, min_nos_por_comunidade=10):
+    """
+    Remove do grafo e marca com -1 em df_communities os bairros de comunidades com poucos nós.
+    Retorna o mapa de cores das comunidades válidas e o mapa {nó: comunidade} filtrado.
+    """
+    # 📌 3. Mapear comunidades
     comunidade_map = dict(zip(df_communities["ID"], df_communities["Comunidade"]))
 
-    # 📌 4. Criar subgrafos por comunidade
-    unique_communities = set(comunidade_map.values())
-    color_map = {
-        community: matplotlib.colormaps.get_cmap("tab10")(i / len(unique_communities)) 
-        for i, community in enumerate(unique_communities)
-    }
-
-    # Criar um dicionário {ID: Nome do Bairro}
-    label_map = {row["ID"]: row["Bairro"] for _, row in df_nodes.iterrows() if row["Tipo"] == 2}
-
     # 📌 3.1 Remover comunidades isoladas com poucos nós
-    min_nos_por_comunidade = 10  # Defina um valor adequado
     contagem_por_comunidade = {}
 
     # Contar quantos nós existem em cada comunidade
@@ -1025,12 +1344,42 @@ def grafo_por_comunidade(df_nodes, df_edges, df_communities, name):
     }
 
     # colocar -1 para os bairros que as suas comunidades foram tiradas, em df_communities
-    for _, row in df_communities.iterrows():
-        if row["Comunidade"] not in comunidades_validas:
-            df_communities.at[_, "Comunidade"] = -1
+    df_communities.loc[~df_communities["Comunidade"].isin(comunidades_validas), "Comunidade"] = -1
+
+    return color_map, comunidade_map_filtrado
+
+@medir
+def grafo_por_comunidade(df_nodes, df_edges, df_communities, name):
+    # Criar um dicionário para armazenar o número de casos de cada bairro
+    bairros = df_nodes[df_nodes["Tipo"] == 2]
+    casos_por_bairro = dict(zip(bairros["ID"].tolist(), bairros["N de casos Total"].tolist()))
+
+    # Normalizar o tamanho dos nós (evita valores muito grandes ou pequenos)
+    min_size = 50   # Tamanho mínimo do nó
+    max_size = 2000  # Tamanho máximo do nó
+
+    if casos_por_bairro:
+        max_casos = max(casos_por_bairro.values())
+        min_casos = min(casos_por_bairro.values())
+
+        # Ajustar tamanho proporcional (evitar divisão por zero)
+        tamanho_nos = {
+            node: min_size + ((casos - min_casos) / (max_casos - min_casos + 1e-6)) * (max_size - min_size)
+            for node, casos in casos_por_bairro.items()
+        }
+    else:
+        tamanho_nos = {}  # Caso não haja dados
+
+    G = grafo_bairros(df_nodes, df_edges)
+
+    # Criar um dicionário {ID: Nome do Bairro}
+    label_map = dict(zip(bairros["ID"].tolist(), bairros["Bairro"].tolist()))
+
+    # Manter apenas as comunidades com nós suficientes
+    color_map, comunidade_map_filtrado = filtrar_comunidades(G, df_communities)
 
     # 📌 6. Aplicar ForceAtlas2 no Grafo Geral
-    forceatlas2_global = ForceAtlas2(
+    forceatlas2_global = fa2_modified.ForceAtlas2(
         outboundAttractionDistribution=True,
         jitterTolerance=20.0,  # Deixa os nós mais espalhados
         barnesHutOptimize=True,
@@ -1071,6 +1420,7 @@ def grafo_por_comunidade(df_nodes, df_edges, df_communities, name):
 
     return color_map, df_communities
 
+@medir
 def grafico_comunidade(df_communities, df_aux, name, coluna):
     # 📌 2. Unir os DataFrames de Comunidade e Número de Casos
     df_communities = df_communities.merge(df_aux, how="left", left_on="ID", right_on="ID")
@@ -1093,7 +1443,8 @@ def grafico_comunidade(df_communities, df_aux, name, coluna):
     plt.close()
     print("Gráfico salvo em", file_path)
 
-def normalizar_bairros(df_bairros):
+@medir
+def normalizar_bairros(df_bairros, salvar=True):
     # Tirar bairros estremos, ou com 0 casos ou com muito altos, ou seja muito maior do q a maioria
     # 📌 1. Normalizar os dados
     df_bairros = df_bairros[(df_bairros["N de casos Total"] > 0)]
@@ -1105,12 +1456,14 @@ def normalizar_bairros(df_bairros):
     df_bairros = df_bairros[(df_bairros["N de casos Total"] < 5 * media)]
 
     # 📌 2. Salvar 
-    file_path = "datasets/output/dados/bairros_normalizados.csv"
-    df_bairros.to_csv(file_path, index=False)
-    print("Bairros normalizados salvos em", file_path)
+    if salvar:
+        file_path = "datasets/output/dados/bairros_normalizados.csv"
+        df_bairros.to_csv(file_path, index=False)
+        print("Bairros normalizados salvos em", file_path)
 
     return df_bairros
 
+@medir
 def media_idade(df_nodes, df_aux):
     """
     Calcula a média e o desvio padrão da idade para cada bairro, garantindo que os IDs sejam inteiros e comparáveis.
@@ -1156,6 +1509,7 @@ def media_idade(df_nodes, df_aux):
 
     return df_aux
 
+@medir
 def media_cor(df_nodes, df_aux):
     """
     Calcula a cor predominante e o desvio padrão da distribuição de cores para um bairro.
@@ -1209,6 +1563,7 @@ def media_cor(df_nodes, df_aux):
 
     return df_aux
 
+@medir
 def media_escolaridade(df_nodes, df_aux):
     """
     Calcula a escolaridade predominante e o desvio padrão da distribuição de escolaridade para um bairro.
@@ -1262,6 +1617,7 @@ def media_escolaridade(df_nodes, df_aux):
 
     return df_aux
 
+@medir
 def media_classificacao(df_nodes, df_aux):
     # Garantir que os IDs dos bairros em df_aux sejam inteiros e bem formatados
     df_aux["ID"] = df_aux["ID"].astype(str).str.strip().astype(int)
@@ -1311,6 +1667,7 @@ def media_classificacao(df_nodes, df_aux):
 
     return df_aux
 
+@medir
 def grafico_idade_grau_casos(df_nodes):
     # Filtrar apenas as pessoas (Tipo == 1)
     df_pessoas = df_nodes[df_nodes["Tipo"] == 1]
@@ -1332,6 +1689,7 @@ def grafico_idade_grau_casos(df_nodes):
 
     print("Gráfico salvo em", file_path)
 
+@medir
 def grafico_media_idade_grau_casos(df_idade, df_classificacao):
     # Ordenar por média de idade
     df_idade = df_idade.sort_values(by="Media Idade", ascending=False)
@@ -1353,52 +1711,126 @@ def grafico_media_idade_grau_casos(df_idade, df_classificacao):
 
     print("Gráfico salvo em", file_path)
     
-def main():
-    df_divinopolis = pd.read_csv("datasets/output/dados/dados_divinopolis.csv")
+# Arquivos lidos e escritos pelas etapas do grafo
+CAMINHO_DIVINOPOLIS = "datasets/output/dados/dados_divinopolis.csv"
+CAMINHO_BAIRROS_NORMALIZADOS = "datasets/output/dados/bairros_normalizados.csv"
+CAMINHO_BETWEENNESS = "datasets/output/dados/betweenness/bairros_betweenness.csv"
+CAMINHO_CLOSENESS = "datasets/output/dados/closeness/bairros_closeness.csv"
+CAMINHO_LISA = "datasets/output/dados/autocorrelacao/bairros_lisa.csv"
+CAMINHO_PAGERANK = "datasets/output/dados/pagerank/bairros_pagerank.csv"
+CAMINHO_ASSORTATIVIDADE = "datasets/output/dados/assortatividade/bairros_assortatividade.csv"
+CAMINHO_COMUNIDADES = "datasets/output/dados/comunidades/bairros_comunidades.csv"
+CAMINHO_MEDIAS = {
+    "idade": "datasets/output/dados/media/media_idade.csv",
+    "cor": "datasets/output/dados/media/media_cor.csv",
+    "escolaridade": "datasets/output/dados/media/media_escolaridade.csv",
+    "classificacao": "datasets/output/dados/media/media_classificacao.csv",
+}
+
+ALGORITMOS_COMUNIDADE = ["Girvan-Newman", "Louvain", "Label Propagation", "Leiden"]
+
+# Nós de cada métrica (o teste de significância da assortatividade depende do resultado dela)
+METRICAS = {
+    "betweenness": ["betweenness"],
+    "closeness": ["closeness"],
+    "morans_i": ["morans_i"],
+    "pagerank": ["pagerank"],
+    "assortatividade": ["assortatividade", "teste_assortatividade"],
+}
+COLUNAS_COMUNIDADE = ["N de casos Total", "Betweenness", "Closeness", "PageRank", "Media Casos Vizinhos"]
+
+# Tabelas de nós e arestas já lidas, pelo estado do arquivo do grafo (ver ler_grafo)
+_TABELAS = {}
+
+def ler_grafo():
+    # Carregar os nós e as arestas do grafo binário salvo pelo modeling_data. Enquanto o arquivo não
+    # muda as mesmas tabelas são devolvidas, e com elas os grafos já construídos (grafo_completo...)
+    estado = os.stat(CAMINHO_GRAFO)
+    chave = (os.path.abspath(CAMINHO_GRAFO), estado.st_mtime_ns, estado.st_size)
+    if chave not in _TABELAS:
+        _TABELAS.clear()
+        grafo = GrafoBinario(CAMINHO_GRAFO)
+        _TABELAS[chave] = (grafo.nos(), grafo.arestas())
+    return _TABELAS[chave]
+
+def ler_bairros():
+    # Nós dos bairros, com as colunas do nodes_bairros.csv
+    return GrafoBinario(CAMINHO_GRAFO).bairros()
+
+def comunidades_algoritmo(name):
+    df_comunidades = pd.read_csv(CAMINHO_COMUNIDADES)
+    df_aux = pd.DataFrame()
+    df_aux["ID"] = df_comunidades["ID"]
+    df_aux["Bairro"] = df_comunidades["Bairro"]
+    # name é o algoritmo de comunidade
+    df_aux["Comunidade"] = df_comunidades["Comunidade " + name]
+    return df_aux
+
+def gerar_graficos_gerais():
+    df_divinopolis = pd.read_csv(CAMINHO_DIVINOPOLIS)
     grafico_distribuicao_idade(df_divinopolis)
     grafico_distribuicao_cor(df_divinopolis)
     grafico_distribuicao_escolaridade(df_divinopolis)
 
-    # Carregar os dados do arquivo nodes.csv
-    df_bairros = pd.read_csv("datasets/output/dados/nodes-edges/nodes_bairros.csv") 
+    # Carregar os nós do grafo
+    grafo = GrafoBinario(CAMINHO_GRAFO)
+    df_bairros = grafo.bairros()
     grafico_bairro_casos(df_bairros, 10)
-    
+
+    df_nodes = grafo.nos()
+    grafico_idade_casos(df_nodes)
+    grafico_cor_casos(df_nodes)
+    grafico_escolaridade_casos(df_nodes)
+    grafico_classificacao_casos(df_nodes)
+
+def gerar_bairros_normalizados():
     # estudo da dispersão dos casos em relação a idadae, raca/cor e escolaridade
     # primeiro tirar bairros com numeros muito estremos de casos, ou 0 ou muito alto
-    df_bairros = normalizar_bairros(df_bairros)
-
-    # Carregar os dados dos arquivos nodes.csv e edges.csv
-    df_nodes = pd.read_csv("datasets/output/dados/nodes-edges/nodes.csv")
-    df_edges = pd.read_csv("datasets/output/dados/nodes-edges/edges.csv")
+    normalizar_bairros(ler_bairros())
 
-    # 📌 1. Calcular Métricas
+def gerar_betweenness(centralidade=None):
     # centralidade de betweenness para entender a importância dos bairros
-    betweenness_centrality(df_nodes, df_edges)
-    df_betweenness = pd.read_csv("datasets/output/dados/betweenness/bairros_betweenness.csv")
+    betweenness_centrality(*ler_grafo(), **(centralidade or {}))
+
+def gerar_graficos_betweenness():
+    df_betweenness = pd.read_csv(CAMINHO_BETWEENNESS)
     grafico_betweenness(df_betweenness, 10)
-    grafico_betweenness_casos(df_betweenness, df_bairros)
+    grafico_betweenness_casos(df_betweenness, pd.read_csv(CAMINHO_BAIRROS_NORMALIZADOS))
 
+def gerar_closeness(centralidade=None):
     # centralidade de closeness para entender a proximidade dos bairros de acordo com a quantidade de casos
-    closeness_centrality(df_nodes, df_edges)
-    df_closeness = pd.read_csv("datasets/output/dados/closeness/bairros_closeness.csv")
+    closeness_centrality(*ler_grafo(), **(centralidade or {}))
+
+def gerar_graficos_closeness():
+    df_closeness = pd.read_csv(CAMINHO_CLOSENESS)
     grafico_closeness(df_closeness, 10)
-    grafico_closeness_casos(df_closeness, df_bairros)
-    
+    grafico_closeness_casos(df_closeness, pd.read_csv(CAMINHO_BAIRROS_NORMALIZADOS))
+
+def gerar_morans_i(permutacao=None):
     # morans i para entender a autocorrelação espacial dos casos
-    calcular_morans_i(df_nodes, df_edges)
+    calcular_morans_i(*ler_grafo(), **(permutacao or {}))
 
+def gerar_pagerank():
     # pagerank para entender a importância dos bairros
-    calcular_pagerank(df_nodes, df_edges)
-    df_pagerank = pd.read_csv("datasets/output/dados/pagerank/bairros_pagerank.csv")
+    calcular_pagerank(*ler_grafo())
+
+def gerar_graficos_pagerank():
+    df_pagerank = pd.read_csv(CAMINHO_PAGERANK)
     grafico_pagerank(df_pagerank, 10)
-    grafico_pagerank_casos(df_pagerank, df_bairros)
+    grafico_pagerank_casos(df_pagerank, pd.read_csv(CAMINHO_BAIRROS_NORMALIZADOS))
 
+def gerar_assortatividade():
     # coeficiente de correlação de Pearson para entender a relação entre a quantidade de casos dos bairros e seus vizinhos
-    pearson_correlation_coefficient(df_nodes, df_edges)
-    df_assortatividade = pd.read_csv("datasets/output/dados/assortatividade/bairros_assortatividade.csv")
+    pearson_correlation_coefficient(*ler_grafo())
+
+def gerar_graficos_assortatividade():
+    df_assortatividade = pd.read_csv(CAMINHO_ASSORTATIVIDADE)
     grafico_assortatividade(df_assortatividade, 10)
     grafico_assortatividade_casos(df_assortatividade)
 
+def testar_assortatividade(permutacao=None):
+    df_assortatividade = pd.read_csv(CAMINHO_ASSORTATIVIDADE)
+
     # p-valor para entender a significância estatística da correlação de Pearson
     correlacao, p_valor = calcular_pvalor_assortatividade(df_assortatividade)
     print(f"Correlação de Pearson: {correlacao:.4f}")
@@ -1410,54 +1842,58 @@ def main():
         print("A correlação NÃO é estatisticamente significativa (p >= 0.05).")
 
     # teste de permutação para entender a significância estatística da correlação de Pearson
-    teste_permutacao_assortatividade(df_assortatividade)
-    
+    teste_permutacao_assortatividade(df_assortatividade, **(permutacao or {}))
+
+def gerar_comunidades():
     # 📌 2. Detectar Comunidades
-    detectar_comunidades(df_nodes, df_edges)
-    df_comunidades = pd.read_csv("datasets/output/dados/comunidades/bairros_comunidades.csv")
-    # gerar gráficos para cada modelo de comunidade
-
-    color_map = {}
-    for df in [df_comunidades["Comunidade Girvan-Newman"], df_comunidades["Comunidade Louvain"], df_comunidades["Comunidade Label Propagation"], df_comunidades["Comunidade Leiden"]]:
-        df_aux = pd.DataFrame()
-        df_aux["ID"] = df_comunidades["ID"]
-        df_aux["Bairro"] = df_comunidades["Bairro"]
-        df_aux["Comunidade"] = df
-        # name é o algoritmo de comunidade
-        name = "Girvan-Newman" if df is df_comunidades["Comunidade Girvan-Newman"] else "Louvain" if df is df_comunidades["Comunidade Louvain"] else "Label Propagation" if df is df_comunidades["Comunidade Label Propagation"] else "Leiden"
-        aux, df_aux1 = grafo_por_comunidade(df_nodes, df_edges, df_aux, name)
-
-        if name == "Leiden":
-            color_map = aux
-            df_bairros["Comunidade"] = df_aux1["Comunidade"]
-        
-        i = 0
-        for df_aux1 in [df_nodes[df_nodes["Tipo"] == 2], df_betweenness, df_closeness, df_pagerank, df_assortatividade]:
-            coluna = "N de casos Total" if i == 0 else "Media Casos Vizinhos" if i == 4 else df_aux1.columns[2]
-            print(coluna)   
-            grafico_comunidade(df_aux, df_aux1, name, coluna)
-            i += 1
+    detectar_comunidades(*ler_grafo())
 
-    # Definir a cor branca para a comunidade -1
-    color_map[-1] = (1.0, 1.0, 1.0, 1.0)  # Branco em formato RGBA
+def gerar_grafo_comunidade(name):
+    # grafo geral com o layout ForceAtlas2, a parte mais demorada dos gráficos de comunidade
+    df_nodes, df_edges = ler_grafo()
+    grafo_por_comunidade(df_nodes, df_edges, comunidades_algoritmo(name), name)
+
+def gerar_graficos_comunidade(name):
+    df_nodes, df_edges = ler_grafo()
+    df_aux = comunidades_algoritmo(name)
+
+    # as comunidades com poucos nós ficam com -1, como no grafo geral
+    filtrar_comunidades(grafo_bairros(df_nodes, df_edges), df_aux)
+
+    df_metricas = [df_nodes[df_nodes["Tipo"] == 2], pd.read_csv(CAMINHO_BETWEENNESS), pd.read_csv(CAMINHO_CLOSENESS),
+                   pd.read_csv(CAMINHO_PAGERANK), pd.read_csv(CAMINHO_ASSORTATIVIDADE)]
+    for df_aux1, coluna in zip(df_metricas, COLUNAS_COMUNIDADE):
+        print(coluna)
+        grafico_comunidade(df_aux, df_aux1, name, coluna)
+
+def gerar_medias():
+    df_nodes = GrafoBinario(CAMINHO_GRAFO).nos()
+    df_bairros = pd.read_csv(CAMINHO_BAIRROS_NORMALIZADOS)
 
     df_aux = pd.DataFrame()
     df_aux["ID"] = df_bairros["ID"]
     df_aux["Bairro"] = df_bairros["Bairro"]
-    df_idade = media_idade(df_nodes, df_aux)
-    df_cor = media_cor(df_nodes, df_aux)
-    df_escolaridade = media_escolaridade(df_nodes, df_aux)
-    df_classificacao = media_classificacao(df_nodes, df_aux)
+    media_idade(df_nodes, df_aux)
+    media_cor(df_nodes, df_aux)
+    media_escolaridade(df_nodes, df_aux)
+    media_classificacao(df_nodes, df_aux)
 
-    df_idade = pd.read_csv("datasets/output/dados/media/media_idade.csv")
-    df_cor = pd.read_csv("datasets/output/dados/media/media_cor.csv")
-    df_escolaridade = pd.read_csv("datasets/output/dados/media/media_escolaridade.csv")
-    df_classificacao = pd.read_csv("datasets/output/dados/media/media_classificacao.csv")
+def gerar_graficos_medias():
+    df_nodes, df_edges = ler_grafo()
 
-    grafico_idade_casos(df_nodes)
-    grafico_cor_casos(df_nodes)
-    grafico_escolaridade_casos(df_nodes)
-    grafico_classificacao_casos(df_nodes)
+    # as cores são as das comunidades do Leiden, sem as comunidades com poucos nós
+    df_bairros = normalizar_bairros(ler_bairros(), salvar=False)
+    df_aux1 = comunidades_algoritmo("Leiden")
+    color_map, _ = filtrar_comunidades(grafo_bairros(df_nodes, df_edges), df_aux1)
+    df_bairros["Comunidade"] = df_aux1["Comunidade"]
+
+    # Definir a cor branca para a comunidade -1
+    color_map[-1] = (1.0, 1.0, 1.0, 1.0)  # Branco em formato RGBA
+
+    df_idade = pd.read_csv(CAMINHO_MEDIAS["idade"])
+    df_cor = pd.read_csv(CAMINHO_MEDIAS["cor"])
+    df_escolaridade = pd.read_csv(CAMINHO_MEDIAS["escolaridade"])
+    df_classificacao = pd.read_csv(CAMINHO_MEDIAS["classificacao"])
 
     # grafico idade e numero de casos
     grafico_media_idade_casos(df_idade, df_bairros, color_map)
@@ -1470,6 +1906,113 @@ def main():
 
     # grafico classificacao predominante e numero de casos
     grafico_media_classificacao_casos(df_classificacao, df_bairros, color_map)
+
+def etapas(centralidade=None, permutacao=None):
+    """
+    Etapas do grafo como nós do pipeline, com os arquivos que cada uma lê e escreve.
+    Cada métrica e cada família de gráficos é um nó, para que uma alteração refaça apenas o que depende dela.
+    `centralidade` são as opções da betweenness e da closeness (modo, erro, confianca, orcamento, semente) e
+    `permutacao` as dos testes de permutação do Moran's I e da assortatividade (n_permutacoes, processos, semente).
+    """
+    centralidade = centralidade or {}
+    permutacao = permutacao or {}
+    grafo = [CAMINHO_GRAFO]
+    normalizados = [CAMINHO_BAIRROS_NORMALIZADOS]
+    nos = [
+        No("graficos_gerais", gerar_graficos_gerais, [CAMINHO_DIVINOPOLIS, CAMINHO_GRAFO], [
+            "datasets/output/graphs/gerais/grafico_distribuicao_idade.png",
+            "datasets/output/graphs/gerais/grafico_distribuicao_cor.png",
+            "datasets/output/graphs/gerais/grafico_distribuicao_escolaridade.png",
+            "datasets/output/graphs/gerais/grafico_bairro_casos_10.png",
+            "datasets/output/graphs/gerais/grafico_idade_casos.png",
+            "datasets/output/graphs/gerais/grafico_cor_casos.png",
+            "datasets/output/graphs/gerais/grafico_escolaridade_casos.png",
+            "datasets/output/graphs/gerais/grafico_classificacao_casos.png",
+        ]),
+        No("bairros_normalizados", gerar_bairros_normalizados, [CAMINHO_GRAFO], normalizados),
+        No("betweenness", gerar_betweenness, grafo, [CAMINHO_BETWEENNESS], argumentos=[centralidade]),
+        No("graficos_betweenness", gerar_graficos_betweenness, [CAMINHO_BETWEENNESS] + normalizados, [
+            "datasets/output/graphs/betweenness/grafico_betweenness_10.png",
+            "datasets/output/graphs/betweenness/grafico_betweenness_casos.png",
+        ]),
+        No("closeness", gerar_closeness, grafo, [CAMINHO_CLOSENESS], argumentos=[centralidade]),
+        No("graficos_closeness", gerar_graficos_closeness, [CAMINHO_CLOSENESS] + normalizados, [
+            "datasets/output/graphs/closeness/grafico_closeness_10.png",
+            "datasets/output/graphs/closeness/grafico_closeness_casos.png",
+        ]),
+        No("morans_i", gerar_morans_i, grafo, [CAMINHO_LISA], argumentos=[permutacao]),
+        No("pagerank", gerar_pagerank, grafo, [CAMINHO_PAGERANK]),
+        No("graficos_pagerank", gerar_graficos_pagerank, [CAMINHO_PAGERANK] + normalizados, [
+            "datasets/output/graphs/pagerank/grafico_pagerank_10.png",
+            "datasets/output/graphs/pagerank/grafico_pagerank_casos.png",
+        ]),
+        No("assortatividade", gerar_assortatividade, grafo, [CAMINHO_ASSORTATIVIDADE]),
+        No("graficos_assortatividade", gerar_graficos_assortatividade, [CAMINHO_ASSORTATIVIDADE], [
+            "datasets/output/graphs/assortatividade/grafico_assortatividade_10.png",
+            "datasets/output/graphs/assortatividade/grafico_assortatividade_casos.png",
+        ]),
+        No("teste_assortatividade", testar_assortatividade, [CAMINHO_ASSORTATIVIDADE], argumentos=[permutacao]),
+        No("comunidades", gerar_comunidades, grafo, [CAMINHO_COMUNIDADES]),
+    ]
+
+    metricas = [CAMINHO_BETWEENNESS, CAMINHO_CLOSENESS, CAMINHO_PAGERANK, CAMINHO_ASSORTATIVIDADE]
+    for name in ALGORITMOS_COMUNIDADE:
+        pasta = "datasets/output/graphs/comunidades/" + name
+        nos.append(No("grafo_comunidade_" + name, gerar_grafo_comunidade, grafo + [CAMINHO_COMUNIDADES],
+                      [pasta + "/grafo_geral_" + name + ".png"], argumentos=[name]))
+        nos.append(No("graficos_comunidade_" + name, gerar_graficos_comunidade, grafo + [CAMINHO_COMUNIDADES] + metricas,
+                      [pasta + "/grafico_Comunidade " + name + "_" + coluna + ".png" for coluna in COLUNAS_COMUNIDADE],
+                      argumentos=[name]))
+
+    nos.append(No("medias", gerar_medias, grafo + normalizados, list(CAMINHO_MEDIAS.values())))
+    nos.append(No("graficos_medias", gerar_graficos_medias, grafo + [CAMINHO_COMUNIDADES] + list(CAMINHO_MEDIAS.values()), [
+        "datasets/output/graphs/media/grafico_media_" + nome + "_casos.png" for nome in CAMINHO_MEDIAS
+    ] + [
+        "datasets/output/graphs/desvio-padrao/grafico_desvio_padrao_" + nome + "_casos.png" for nome in CAMINHO_MEDIAS
+    ]))
+    return nos
+
+def adicionar_argumentos_centralidade(parser):
+    # opções da betweenness e da closeness na linha de comando (ver opcoes_centralidade)
+    parser.add_argument("--centralidade", choices=["folhas", "networkx", "amostragem"], default="folhas",
+                        help="cálculo da betweenness e da closeness: exato comprimindo os casos (folhas), exato no grafo "
+                             "completo (networkx) ou aproximado por pivôs (amostragem)")
+    parser.add_argument("--erro", type=float, default=0.01, help="erro máximo das centralidades aproximadas")
+    parser.add_argument("--confianca", type=float, default=0.95, help="probabilidade de o erro ficar abaixo do limite informado")
+    parser.add_argument("--orcamento", type=float, default=None, help="tempo máximo em segundos da amostragem de pivôs")
+    parser.add_argument("--semente", type=int, default=0, help="semente do sorteio dos pivôs")
+
+def opcoes_centralidade(args):
+    # só a amostragem usa o erro, o orçamento e a semente
+    if args.centralidade != "amostragem":
+        return {"modo": args.centralidade}
+    return {"modo": "amostragem", "erro": args.erro, "confianca": args.confianca, "orcamento": args.orcamento,
+            "semente": args.semente}
+
+def adicionar_argumentos_permutacao(parser):
+    # opções dos testes de permutação na linha de comando (ver opcoes_permutacao)
+    parser.add_argument("--permutacoes", type=int, default=None,
+                        help="número máximo de permutações dos testes do Moran's I e da assortatividade (ex.: 100000)")
+    parser.add_argument("--processos-permutacao", type=int, default=1,
+                        help="número de processos que dividem as permutações de cada teste")
+    parser.add_argument("--semente-permutacao", type=int, default=0, help="semente das permutações")
+
+def opcoes_permutacao(args):
+    # sem --permutacoes, cada teste usa o seu número padrão de permutações
+    opcoes = {"processos": args.processos_permutacao, "semente": args.semente_permutacao}
+    if args.permutacoes is not None:
+        opcoes["n_permutacoes"] = args.permutacoes
+    return opcoes
+
+def main(processos=1, centralidade=None, permutacao=None):
+    # executa todas as etapas do grafo, sem pular nenhuma; com mais de um processo as métricas
+    # independentes rodam em paralelo e os gráficos começam assim que as suas métricas terminam
+    executar(etapas(centralidade, permutacao), forcar=True, processos=processos)
                                    
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Métricas, comunidades e gráficos do grafo de bairros")
+    parser.add_argument("--processos", type=int, default=1, help="número de processos para executar as métricas independentes em paralelo")
+    adicionar_argumentos_centralidade(parser)
+    adicionar_argumentos_permutacao(parser)
+    args = parser.parse_args()
+    main(processos=args.processos, centralidade=opcoes_centralidade(args), permutacao=opcoes_permutacao(args))
\ No newline at end of file
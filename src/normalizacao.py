@@ -0,0 +1,29 @@
+import pandas as pd
+
+def padronizar_texto(valores):
+    """
+    Remove espaços extras, coloca em caixa alta, retira acentos e troca caracteres especiais por espaço.
+    Valores nulos continuam nulos.
+    """
+    nulos = valores.isna()
+    valores = valores.astype(str).str.strip().str.upper()
+    valores = valores.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('utf-8')
+    return valores.str.replace(r'[^a-zA-Z0-9 ]', ' ', regex=True).mask(nulos)
+
+def normalizar_unicos(serie, funcao, categorica=False):
+    """
+    Aplica a normalização apenas uma vez por valor distinto da série e devolve o resultado para todas as linhas.
+    `funcao` recebe uma Series com os valores distintos (incluindo o nulo, se houver) e devolve outra do mesmo tamanho.
+    Com `categorica=True` o resultado é mantido como categorias; caso contrário volta a ser texto.
+    """
+    # códigos de cada linha e valores distintos (o nulo também é um valor distinto)
+    codigos, unicos = pd.factorize(serie, use_na_sentinel=False)
+    normalizados = funcao(pd.Series(unicos, dtype=object)).to_numpy(dtype=object)
+
+    # valores distintos diferentes podem virar o mesmo valor normalizado
+    codigos_normalizados, categorias = pd.factorize(normalizados)
+    resultado = pd.Categorical.from_codes(codigos_normalizados[codigos], categories=categorias)
+
+    if not categorica:
+        resultado = resultado.astype(object)
+    return pd.Series(resultado, index=serie.index, name=serie.name)
@@ -0,0 +1,221 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from instrumentacao import etapa, incorporar_registros, registros_desde, total_registros
+
+CAMINHO_ESTADO = "datasets/output/relatorios/orquestrador.json"
+
+class No:
+    """
+    Nó do pipeline: a função que executa a etapa, os argumentos dela e os arquivos que ela lê e escreve.
+    """
+    def __init__(self, nome, funcao, entradas=(), saidas=(), argumentos=()):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = list(entradas)
+        self.saidas = list(saidas)
+        self.argumentos = tuple(argumentos)
+
+    def executar(self):
+        return self.funcao(*self.argumentos)
+
+def ordenar(nos):
+    """
+    Ordena os nós de forma que cada um venha depois dos nós que escrevem as suas entradas.
+    Entre nós independentes a ordem da lista é mantida.
+    """
+    produtor = {}
+    for no in nos:
+        for saida in no.saidas:
+            if saida in produtor:
+                raise ValueError(f"O arquivo {saida} é escrito pelos nós {produtor[saida].nome} e {no.nome}")
+            produtor[saida] = no
+
+    ordem, visitados, visitando = [], set(), set()
+
+    def visitar(no):
+        if no.nome in visitados:
+            return
+        if no.nome in visitando:
+            raise ValueError(f"Ciclo no pipeline passando pelo nó {no.nome}")
+        visitando.add(no.nome)
+        for entrada in no.entradas:
+            if entrada in produtor:
+                visitar(produtor[entrada])
+        visitando.discard(no.nome)
+        visitados.add(no.nome)
+        ordem.append(no)
+
+    for no in nos:
+        visitar(no)
+    return ordem
+
+def _importados(caminho):
+    # nomes dos módulos importados em qualquer ponto do arquivo (inclusive dentro de funções)
+    with open(caminho, encoding="utf-8") as arquivo:
+        arvore = ast.parse(arquivo.read(), caminho)
+    for no in ast.walk(arvore):
+        if isinstance(no, ast.Import):
+            yield from (nome.name for nome in no.names)
+        elif isinstance(no, ast.ImportFrom) and no.module and not no.level:
+            yield no.module
+
+def modulos_projeto(funcao):
+    """
+    Arquivos dos módulos do projeto que a função pode alcançar: o do módulo dela e, transitivamente, os
+    dos módulos da mesma pasta que eles importam. Alterar qualquer coisa nesses arquivos (uma função
+    auxiliar, uma constante do módulo) invalida o nó.
+    """
+    inicio = os.path.abspath(inspect.getsourcefile(inspect.unwrap(funcao)))
+    pasta = os.path.dirname(inicio)
+    arquivos, pendentes = set(), [inicio]
+    while pendentes:
+        caminho = pendentes.pop()
+        if caminho in arquivos:
+            continue
+        arquivos.add(caminho)
+        for nome in _importados(caminho):
+            candidato = os.path.join(pasta, nome.split(".")[0] + ".py")
+            if os.path.isfile(candidato):
+                pendentes.append(candidato)
+    return sorted(arquivos)
+
+def hash_arquivo(caminho, memo=None):
+    """
+    Hash do conteúdo do arquivo, ou None se ele não existir.
+    O memo evita ler de novo um arquivo que não mudou (mesmo tamanho e data de modificação).
+    """
+    if not os.path.isfile(caminho):
+        return None
+    info = os.stat(caminho)
+    chave = (caminho, info.st_size, info.st_mtime_ns)
+    if memo is not None and chave in memo:
+        return memo[chave]
+
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b""):
+            sha.update(bloco)
+    if memo is not None:
+        memo[chave] = sha.hexdigest()
+    return sha.hexdigest()
+
+def assinatura(no, memo=None):
+    """
+    Hash que identifica uma execução do nó: código dos módulos do projeto, argumentos e conteúdo das entradas.
+    """
+    sha = hashlib.sha256()
+    for caminho in modulos_projeto(no.funcao):
+        sha.update(f"{os.path.basename(caminho)}={hash_arquivo(caminho, memo)}".encode())
+    sha.update(repr(no.argumentos).encode())
+    for entrada in no.entradas:
+        sha.update(f"{entrada}={hash_arquivo(entrada, memo)}".encode())
+    return sha.hexdigest()
+
+def carregar_estado(caminho=CAMINHO_ESTADO):
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
+
+def salvar_estado(estado, caminho=CAMINHO_ESTADO):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(estado, arquivo, indent=2, ensure_ascii=False)
+
+def atualizado(no, registro, assinatura_atual, memo=None):
+    """
+    O nó pode ser pulado se a assinatura não mudou e as saídas ainda são as que ele escreveu.
+    """
+    if not registro or registro["assinatura"] != assinatura_atual:
+        return False
+    for saida in no.saidas:
+        hash_saida = hash_arquivo(saida, memo)
+        if hash_saida is None or hash_saida != registro["saidas"].get(saida):
+            return False
+    return True
+
+def _executar_em_processo(no):
+    # roda o nó em um processo filho e devolve as medições feitas nele
+    inicio = total_registros()
+    with etapa(no.nome):
+        no.executar()
+    return registros_desde(inicio)
+
+def executar(nos, caminho_estado=CAMINHO_ESTADO, forcar=False, processos=1, apenas=None):
+    """
+    Executa os nós em ordem de dependência, pulando os que não mudaram.
+    Como as entradas de um nó são as saídas dos anteriores, uma alteração refaz apenas os nós
+    que dependem dela; se um nó refeito escrever exatamente os mesmos arquivos, os seguintes são pulados.
+    Com `processos` > 1 os nós independentes (ex.: as métricas) rodam ao mesmo tempo em processos separados;
+    um nó só começa quando todos os nós que escrevem as suas entradas terminaram.
+    Com `apenas` só os nós com esses nomes são considerados; as entradas deles que vêm de outros nós
+    precisam já existir.
+    """
+    estado = carregar_estado(caminho_estado)
+    memo = {}
+    executados = []
+
+    def preparar(no):
+        # devolve a assinatura do nó, ou None se ele pode ser pulado
+        assinatura_atual = assinatura(no, memo)
+        if not forcar and atualizado(no, estado.get(no.nome), assinatura_atual, memo):
+            with etapa(no.nome) as registro:
+                registro["pulada"] = True
+            print("Etapa", no.nome, "sem alterações, pulando")
+            return None
+        return assinatura_atual
+
+    def concluir(no, assinatura_atual):
+        executados.append(no.nome)
+        # o estado é salvo a cada nó, para não perder o que já foi feito se um nó falhar
+        estado[no.nome] = {
+            "assinatura": assinatura_atual,
+            "saidas": {saida: hash_arquivo(saida, memo) for saida in no.saidas},
+        }
+        salvar_estado(estado, caminho_estado)
+
+    ordem = ordenar(nos)
+    if apenas is not None:
+        ordem = [no for no in ordem if no.nome in apenas]
+    if processos <= 1:
+        for no in ordem:
+            assinatura_atual = preparar(no)
+            if assinatura_atual is None:
+                continue
+            with etapa(no.nome):
+                no.executar()
+            concluir(no, assinatura_atual)
+        return executados
+
+    produtor = {saida: no.nome for no in ordem for saida in no.saidas}
+    dependencias = {no.nome: {produtor[entrada] for entrada in no.entradas if entrada in produtor} for no in ordem}
+    pendentes, terminados, em_execucao = list(ordem), set(), {}
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        while pendentes or em_execucao:
+            # envia todos os nós cujas dependências já terminaram (pular um nó pode liberar outros)
+            liberou = True
+            while liberou:
+                liberou = False
+                for no in [no for no in pendentes if dependencias[no.nome] <= terminados]:
+                    pendentes.remove(no)
+                    assinatura_atual = preparar(no)
+                    if assinatura_atual is None:
+                        terminados.add(no.nome)
+                        liberou = True
+                    else:
+                        em_execucao[executor.submit(_executar_em_processo, no)] = (no, assinatura_atual)
+
+            # junta os resultados dos nós que terminaram
+            prontos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                no, assinatura_atual = em_execucao.pop(futuro)
+                incorporar_registros(futuro.result())
+                concluir(no, assinatura_atual)
+                terminados.add(no.nome)
+
+    return executados
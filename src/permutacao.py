@@ -0,0 +1,115 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from importacao import importar_tardio
+from instrumentacao import medir
+
+stats = importar_tardio("scipy.stats")
+
+# Permutações geradas e avaliadas de uma vez (uma matriz permutações x valores por bloco)
+TAMANHO_BLOCO = 1000
+
+ALTERNATIVAS = ("bilateral", "maior", "menor")
+
+def correlacao_pearson(permutados, y):
+    """
+    Correlação de Pearson de cada linha de `permutados` com `y`. Permutar não muda a média nem o desvio
+    dos valores, então basta um produto de matrizes com os valores centrados.
+    """
+    x = permutados - permutados.mean(axis=1, keepdims=True)
+    y = np.asarray(y, dtype=float) - np.mean(y)
+    return (x @ y) / (np.sqrt((x * x).sum(axis=1)) * np.sqrt(y @ y))
+
+def _extremos(valores, observado, alternativa):
+    # quantas estatísticas são pelo menos tão extremas quanto a observada
+    if alternativa == "maior":
+        return int((valores >= observado).sum())
+    if alternativa == "menor":
+        return int((valores <= observado).sum())
+    return int((np.abs(valores) >= abs(observado)).sum())
+
+def intervalo_p_valor(extremos, permutacoes, confianca=0.99):
+    """
+    Intervalo de Clopper-Pearson da probabilidade de uma permutação ser tão extrema quanto a observada,
+    com `extremos` de `permutacoes` permutações.
+    """
+    alfa = 1 - confianca
+    inferior = stats.beta.ppf(alfa / 2, extremos, permutacoes - extremos + 1) if extremos > 0 else 0.0
+    superior = stats.beta.ppf(1 - alfa / 2, extremos + 1, permutacoes - extremos) if extremos < permutacoes else 1.0
+    return float(inferior), float(superior)
+
+def _bloco(estatistica, valores, argumentos, semente, tamanho):
+    # estatísticas de um bloco de permutações, com a sequência aleatória própria do bloco
+    rng = np.random.default_rng(semente)
+    permutados = rng.permuted(np.tile(valores, (tamanho, 1)), axis=1)
+    return estatistica(permutados, *argumentos)
+
+@medir
+def teste_permutacao(estatistica, valores, argumentos=(), n_permutacoes=1000, alternativa="bilateral", semente=0,
+                     processos=1, significancia=0.05, confianca=0.99, parada_antecipada=True, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Teste de permutação de `estatistica(permutados, *argumentos)`, que recebe uma matriz com uma permutação
+    de `valores` por linha e devolve a estatística de cada linha (deve ser uma função de módulo, para
+    poder ir para outros processos).
+
+    As permutações são geradas em blocos de `tamanho_bloco`, cada bloco com a sua sequência aleatória
+    derivada da semente (SeedSequence.spawn), e os blocos são divididos entre `processos` processos.
+    Os blocos entram no resultado sempre na mesma ordem, então o resultado só depende da semente, não do
+    número de processos. Com `parada_antecipada`, o teste para assim que o intervalo de confiança do
+    p-valor fica todo de um lado da `significancia`.
+
+    Devolve um dicionário com a estatística observada, o p-valor ((extremos + 1) / (permutações + 1)), o
+    intervalo de confiança dele, o número de permutações feitas e as estatísticas das permutações.
+    """
+    if alternativa not in ALTERNATIVAS:
+        raise ValueError(f"Alternativa desconhecida: {alternativa} (use {', '.join(ALTERNATIVAS)})")
+    valores = np.asarray(valores, dtype=float)
+    observado = float(estatistica(valores[None, :], *argumentos)[0])
+
+    tamanhos = [min(tamanho_bloco, n_permutacoes - inicio) for inicio in range(0, n_permutacoes, tamanho_bloco)]
+    sequencia = semente if isinstance(semente, np.random.SeedSequence) else np.random.SeedSequence(semente)
+    sementes = sequencia.spawn(len(tamanhos))
+
+    resultados = []
+    extremos = 0
+    feitas = 0
+
+    def acrescentar(estatisticas):
+        # junta o próximo bloco e diz se o teste já pode parar
+        nonlocal extremos, feitas
+        resultados.append(estatisticas)
+        extremos += _extremos(estatisticas, observado, alternativa)
+        feitas += len(estatisticas)
+        if not parada_antecipada:
+            return False
+        inferior, superior = intervalo_p_valor(extremos, feitas, confianca)
+        return superior < significancia or inferior > significancia
+
+    if processos <= 1:
+        for semente_bloco, tamanho in zip(sementes, tamanhos):
+            if acrescentar(_bloco(estatistica, valores, argumentos, semente_bloco, tamanho)):
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            # no máximo dois blocos por processo em andamento, para não gastar muito além da parada
+            pendentes = deque()
+            for semente_bloco, tamanho in zip(sementes, tamanhos):
+                pendentes.append(executor.submit(_bloco, estatistica, valores, argumentos, semente_bloco, tamanho))
+                if len(pendentes) < 2 * processos:
+                    continue
+                if acrescentar(pendentes.popleft().result()):
+                    break
+            else:
+                while pendentes and not acrescentar(pendentes.popleft().result()):
+                    pass
+            for futuro in pendentes:
+                futuro.cancel()
+
+    estatisticas = np.concatenate(resultados) if resultados else np.zeros(0)
+    return {
+        "observado": observado,
+        "p_valor": (extremos + 1) / (feitas + 1),
+        "intervalo": intervalo_p_valor(extremos, feitas, confianca) if feitas else (0.0, 1.0),
+        "permutacoes": feitas,
+        "estatisticas": estatisticas,
+    }
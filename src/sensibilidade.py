@@ -0,0 +1,129 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from grafo_binario import CAMINHO_GRAFO, GrafoBinario
+from instrumentacao import medir
+from modeling_data import CAMINHO_PESOS, CLASSE_PADRAO, LIMIARES_CLASSIFICACAO, carregar_pesos, codificar_pesos
+
+CAMINHO_NODES_CASOS = "datasets/output/dados/nodes-edges/nodes_casos.csv"
+CAMINHO_SENSIBILIDADE = "datasets/output/dados/sensibilidade/bairros_sensibilidade.csv"
+
+# Número máximo de pontuações (esquemas x casos) calculadas de uma vez
+MAXIMO_POR_BLOCO = 10_000_000
+
+@medir
+def gerar_esquemas(pesos, limiares, n_esquemas, variacao, rng):
+    """
+    Sorteia `n_esquemas` esquemas de classificação multiplicando cada peso e cada limiar por um fator
+    uniforme em [1 - variacao, 1 + variacao]. O esquema 0 é o original.
+    Devolve, para cada coluna, a matriz (esquemas x 1 + valores) com os pesos de cada valor da tabela
+    (a coluna 0 é o peso dos valores fora da tabela, sempre 0) e a matriz (esquemas x classes) dos limiares.
+    """
+    matrizes = {}
+    for coluna, pesos_coluna in pesos.items():
+        base = np.array([0.0] + list(pesos_coluna.values()))
+        fatores = rng.uniform(1 - variacao, 1 + variacao, (n_esquemas, len(base)))
+        fatores[0] = 1
+        matrizes[coluna] = base * fatores
+
+    base = np.array(list(limiares.values()), dtype=float)
+    fatores = rng.uniform(1 - variacao, 1 + variacao, (n_esquemas, len(base)))
+    fatores[0] = 1
+    # limiares em ordem crescente em cada esquema, para que as classes continuem na mesma ordem
+    return matrizes, np.sort(base * fatores, axis=1)
+
+@medir
+def contar_classes(df_casos, df_bairros, pesos, matrizes, matriz_limiares, maximo_por_bloco=MAXIMO_POR_BLOCO):
+    """
+    Pontua todos os casos em todos os esquemas com operações de matriz sobre as colunas codificadas e
+    conta os casos de cada classe em cada bairro: devolve um array (esquemas x classes x bairros), com as
+    classes da menos para a mais grave.
+    """
+    n_esquemas, n_limiares = matriz_limiares.shape
+    n_classes = n_limiares + 1
+    n_bairros = len(df_bairros)
+
+    # Para cada coluna, a posição (1 + índice na tabela de pesos, 0 fora dela) do valor de cada caso
+    posicoes = {coluna: {valor: i + 1 for i, valor in enumerate(pesos_coluna)} for coluna, pesos_coluna in pesos.items()}
+    indices = {coluna: vetor[codigos] for coluna, (codigos, vetor) in codificar_pesos(df_casos, posicoes).items()}
+
+    # Casos sem bairro (-1) ou com bairro fora da tabela não são contados
+    bairro = pd.Index(df_bairros["ID"]).get_indexer(df_casos["Bairro"])
+    validos = bairro >= 0
+
+    contagens = np.zeros(n_esquemas * n_classes * n_bairros, dtype=np.int64)
+    tamanho_bloco = max(1, maximo_por_bloco // n_esquemas)
+    deslocamento = np.arange(n_esquemas)[:, None] * n_classes
+    for inicio in range(0, len(df_casos), tamanho_bloco):
+        fim = inicio + tamanho_bloco
+        selecao = validos[inicio:fim]
+
+        # Pontuação (esquemas x casos): soma, coluna a coluna, dos pesos de cada esquema nas posições dos casos
+        pontuacao = sum(matrizes[coluna][:, indices[coluna][inicio:fim][selecao]] for coluna in matrizes)
+        # Classe: quantos limiares a pontuação alcança (0 = CLASSE_PADRAO)
+        classe = (pontuacao[:, None, :] >= matriz_limiares[:, :, None]).sum(axis=1)
+
+        chaves = (deslocamento + classe) * n_bairros + bairro[inicio:fim][selecao]
+        contagens += np.bincount(chaves.ravel(), minlength=len(contagens))
+
+    return contagens.reshape(n_esquemas, n_classes, n_bairros)
+
+@medir
+def resumir_sensibilidade(df_bairros, contagens, classes):
+    """
+    Estabilidade de cada bairro entre os esquemas: estatísticas do número de casos da classe mais grave
+    e a fração dos esquemas em que a classe predominante é a mesma do esquema original.
+    """
+    fatais = contagens[:, -1, :]
+    total = contagens[0].sum(axis=0)
+    predominante = contagens.argmax(axis=1)
+
+    df = df_bairros[["ID", "Bairro"]].copy()
+    df["N de casos Total"] = total
+    df["Casos Fatais Original"] = fatais[0]
+    df["Casos Fatais Media"] = fatais.mean(axis=0).round(2)
+    df["Casos Fatais Desvio"] = fatais.std(axis=0).round(2)
+    df["Casos Fatais Min"] = fatais.min(axis=0)
+    df["Casos Fatais Max"] = fatais.max(axis=0)
+    df["Classe Predominante Original"] = np.array(classes, dtype=object)[predominante[0]]
+    df["Estabilidade Classe Predominante"] = (predominante == predominante[0]).mean(axis=0).round(4)
+
+    # Bairros sem casos não têm classe predominante
+    df.loc[total == 0, ["Classe Predominante Original", "Estabilidade Classe Predominante"]] = np.nan
+    return df
+
+def sensibilidade(n_esquemas=500, variacao=0.2, semente=0, caminho_pesos=CAMINHO_PESOS, caminho=CAMINHO_SENSIBILIDADE):
+    df_casos = pd.read_csv(CAMINHO_NODES_CASOS)
+    df_bairros = GrafoBinario(CAMINHO_GRAFO).bairros()
+    pesos = carregar_pesos(caminho_pesos)
+
+    # Classes da menos para a mais grave, na ordem dos limiares
+    limiares = dict(sorted(LIMIARES_CLASSIFICACAO.items(), key=lambda item: item[1]))
+    classes = [CLASSE_PADRAO] + list(limiares)
+
+    rng = np.random.default_rng(semente)
+    matrizes, matriz_limiares = gerar_esquemas(pesos, limiares, n_esquemas, variacao, rng)
+    contagens = contar_classes(df_casos, df_bairros, pesos, matrizes, matriz_limiares)
+    df = resumir_sensibilidade(df_bairros, contagens, classes)
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    df.to_csv(caminho, index=False)
+    print("Sensibilidade dos bairros salva em", caminho)
+
+    fatais = contagens[:, -1, :].sum(axis=1)
+    print(f"Casos {classes[-1]} em {n_esquemas} esquemas (variação de {variacao:.0%}): "
+          f"original {fatais[0]}, média {fatais.mean():.1f}, mínimo {fatais.min()}, máximo {fatais.max()}")
+    instaveis = df[df["Estabilidade Classe Predominante"] < 0.9]
+    print(f"{len(instaveis)} bairro(s) com a classe predominante diferente da original em mais de 10% dos esquemas")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sensibilidade da classificação dos casos aos pesos e limiares")
+    parser.add_argument("--esquemas", type=int, default=500, help="número de esquemas de pesos e limiares sorteados (inclui o original)")
+    parser.add_argument("--variacao", type=float, default=0.2, help="variação relativa máxima de cada peso e limiar (0.2 = ±20%%)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do sorteio dos esquemas")
+    parser.add_argument("--pesos", default=CAMINHO_PESOS, help="tabela de pesos em csv")
+    parser.add_argument("--saida", default=CAMINHO_SENSIBILIDADE, help="caminho da tabela de resultados em csv")
+    args = parser.parse_args()
+    sensibilidade(args.esquemas, args.variacao, args.semente, args.pesos, args.saida)
@@ -0,0 +1,64 @@
+import os
+import shutil
+import sys
+import tempfile
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+
+# Alterações feitas numa cópia do código: (arquivo, trecho original, trecho alterado, etapas que precisam
+# ser refeitas, etapas que não podem ser afetadas)
+ALTERACOES = [
+    # função auxiliar em outro módulo do projeto
+    ("autocorrelacao.py", "return (z.shape[-1] / pesos.sum())", "return 2 * (z.shape[-1] / pesos.sum())",
+     ["morans_i"], ["data_prepocessing", "modeling_data"]),
+    # constante de módulo fora do corpo da função da etapa
+    ("modeling_data.py", '"ALTO RISCO DE FATALIDADE": 11, "POSSIVEL FATAL": 5', '"ALTO RISCO DE FATALIDADE": 7, "POSSIVEL FATAL": 3',
+     ["modeling_data"], ["data_prepocessing"]),
+    # módulo que nenhuma etapa importa
+    ("sensibilidade.py", "MAXIMO_POR_BLOCO = ", "MAXIMO_POR_BLOCO = 2 * ",
+     [], ["data_prepocessing", "modeling_data", "morans_i"]),
+]
+
+def verificar(alteracoes=ALTERACOES):
+    """
+    Confere que a assinatura das etapas (orquestrador.assinatura) muda quando o código que elas alcançam
+    muda, e só nesse caso: cada alteração é aplicada numa cópia de src e as assinaturas de antes e de
+    depois são comparadas. Devolve a lista de falhas (vazia se tudo estiver certo).
+    """
+    falhas = []
+    with tempfile.TemporaryDirectory() as copia:
+        for nome in os.listdir(PASTA):
+            if nome.endswith(".py"):
+                shutil.copyfile(os.path.join(PASTA, nome), os.path.join(copia, nome))
+        sys.path.insert(0, copia)
+        import main
+        from orquestrador import assinatura
+
+        def assinaturas():
+            return {no.nome: assinatura(no) for no in main.pipeline()}
+
+        for arquivo, original, alterado, refeitas, mantidas in alteracoes:
+            caminho = os.path.join(copia, arquivo)
+            with open(caminho, "rb") as f:
+                codigo = f.read()
+            if original.encode() not in codigo:
+                falhas.append(f"{arquivo}: trecho {original!r} não encontrado")
+                continue
+
+            antes = assinaturas()
+            with open(caminho, "wb") as f:
+                f.write(codigo.replace(original.encode(), alterado.encode(), 1))
+            depois = assinaturas()
+            with open(caminho, "wb") as f:
+                f.write(codigo)
+
+            falhas += [f"{arquivo}: a etapa {nome} não foi invalidada" for nome in refeitas if antes[nome] == depois[nome]]
+            falhas += [f"{arquivo}: a etapa {nome} foi invalidada sem motivo" for nome in mantidas if antes[nome] != depois[nome]]
+    return falhas
+
+if __name__ == "__main__":
+    falhas = verificar()
+    for falha in falhas:
+        print(falha)
+    print("Assinaturas das etapas:", "com falhas" if falhas else "ok")
+    sys.exit(1 if falhas else 0)